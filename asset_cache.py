@@ -0,0 +1,151 @@
+# asset_cache.py
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+
+# Where cached assets live and how large the cache may grow before old entries are evicted
+CACHE_DIR = os.getenv('ASSET_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'viral_video_maker', 'assets'))
+CACHE_MAX_BYTES = int(os.getenv('ASSET_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+
+# Estimated size of each cache directory, so a store does not walk the whole cache: set by a walk,
+# then grown by every store of this process. Stores of other processes are only counted at the
+# next walk, which happens once the estimate passes the limit
+_cache_bytes = {}
+_cache_bytes_lock = threading.Lock()
+
+def asset_key(kind, **inputs):
+    """
+    Builds the cache key for a generated asset from everything that went into generating it.
+
+    Args:
+        kind (str): The kind of asset, e.g. 'runway_clip' or 'elevenlabs_voiceover'.
+        **inputs: The generation inputs (prompt, model, voice, ...). They must be JSON serializable.
+
+    Returns:
+        str: A hex SHA-256 digest that changes whenever any of the inputs change.
+    """
+    payload = json.dumps({'kind': kind, 'inputs': inputs}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """
+    Returns the hex SHA-256 digest of a file's contents, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _entry_path(key, cache_dir=None):
+    cache_dir = cache_dir or CACHE_DIR
+    return os.path.join(cache_dir, key[:2], key)
+
+def _atomic_copy(source_path, dest_path):
+    """
+    Copies a file through a temporary file in the destination directory and renames it
+    into place, so readers never see a half-written file.
+    """
+    dest_dir = os.path.dirname(os.path.abspath(dest_path))
+    os.makedirs(dest_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=dest_dir, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file, open(source_path, 'rb') as source_file:
+            shutil.copyfileobj(source_file, tmp_file, 1024 * 1024)
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def fetch_asset(key, dest_path, cache_dir=None):
+    """
+    Copies a cached asset to `dest_path` if the cache holds it.
+
+    Returns:
+        str: `dest_path` on a cache hit, or None on a miss.
+    """
+    entry_path = _entry_path(key, cache_dir)
+    try:
+        _atomic_copy(entry_path, dest_path)
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        print(f"Error reading from the asset cache: {e}")
+        return None
+
+    # Touch the entry so eviction treats it as recently used
+    try:
+        os.utime(entry_path)
+    except OSError:
+        pass
+    return dest_path
+
+def store_asset(key, source_path, cache_dir=None, max_bytes=None):
+    """
+    Adds a generated file to the cache under `key`, then evicts the least recently
+    used entries if the cache may have grown past its size limit.
+
+    Returns:
+        str: The path of the cache entry, or None if it could not be stored.
+    """
+    entry_path = _entry_path(key, cache_dir)
+    try:
+        _atomic_copy(source_path, entry_path)
+        size = os.path.getsize(source_path)
+    except OSError as e:
+        print(f"Error writing to the asset cache: {e}")
+        return None
+
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    estimate_key = os.path.abspath(cache_dir or CACHE_DIR)
+    with _cache_bytes_lock:
+        total_bytes = _cache_bytes.get(estimate_key)
+        if total_bytes is not None:
+            total_bytes = _cache_bytes[estimate_key] = total_bytes + size
+    if total_bytes is None or total_bytes > max_bytes:
+        evict_assets(max_bytes=max_bytes, cache_dir=cache_dir)
+    return entry_path
+
+def evict_assets(max_bytes=None, cache_dir=None):
+    """
+    Deletes the least recently used cache entries until the cache fits in `max_bytes`.
+
+    Returns:
+        int: The number of entries deleted.
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+
+    entries = []
+    total_bytes = 0
+    for root, _, files in os.walk(cache_dir):
+        for name in files:
+            if name.startswith('.tmp-'):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_bytes += stat.st_size
+
+    deleted = 0
+    for _, size, path in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            deleted += 1
+        except FileNotFoundError:
+            # Another run evicted it first
+            pass
+        total_bytes -= size
+
+    with _cache_bytes_lock:
+        _cache_bytes[os.path.abspath(cache_dir)] = total_bytes
+    return deleted
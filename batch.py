@@ -0,0 +1,242 @@
+# batch.py
+import os
+import json
+import time
+import hashlib
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait
+
+import tracing
+from video_editor import assemble_video
+from workflow import build_video_pipeline
+from workspace import Workspace
+
+class JobQueue:
+    """
+    The state of every job in a batch, persisted as JSON so that a crashed or interrupted
+    batch picks up where it stopped. The file is rewritten atomically after every change.
+    """
+
+    def __init__(self, state_path):
+        self.state_path = state_path
+        self.lock = threading.Lock()
+        self.jobs = {}
+        if os.path.exists(state_path):
+            with open(state_path) as f:
+                self.jobs = json.load(f)
+
+    def _save(self):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.jobs, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def add(self, job_id, prompt):
+        with self.lock:
+            if job_id not in self.jobs:
+                self.jobs[job_id] = {'prompt': prompt, 'status': 'pending', 'attempts': 0}
+                self._save()
+
+    def update(self, job_id, **fields):
+        with self.lock:
+            self.jobs[job_id].update(fields)
+            self._save()
+
+    def unfinished(self, job_ids, retry_failed=False):
+        """
+        Returns the ids among `job_ids` of the jobs still to run, in the same order.
+        """
+        skip = ('done',) if retry_failed else ('done', 'failed')
+        return [job_id for job_id in job_ids if self.jobs[job_id]['status'] not in skip]
+
+def read_prompts(prompts_file):
+    """
+    Reads one topic or prompt per line, ignoring blank lines and lines starting with '#'.
+    """
+    with open(prompts_file) as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+def job_ids_for(prompts):
+    """
+    Returns an id for each prompt, from a hash of the prompt alone, so a job keeps its id (and
+    its saved state) when lines are added, removed or moved in the topics file. The second and
+    later copies of the same prompt get "-2", "-3", ... in the order they appear.
+    """
+    job_ids, seen = [], {}
+    for prompt in prompts:
+        digest = hashlib.sha1(prompt.encode('utf-8')).hexdigest()[:12]
+        seen[digest] = seen.get(digest, 0) + 1
+        job_ids.append(digest if seen[digest] == 1 else f"{digest}-{seen[digest]}")
+    return job_ids
+
+def _generate_assets(prompt, output_dir, use_prompts, max_in_flight, category=None):
+    """
+    Runs the API-bound stages (topic, script, voiceover, clips) of one video. A known
+    `category` skips the category stage.
+    """
+    pipeline = build_video_pipeline(
+        use_category=use_prompts, max_in_flight=max_in_flight, output_dir=output_dir, assemble=False
+    )
+    inputs = {'user_prompt': prompt} if use_prompts else {'topic': prompt}
+    if use_prompts and category:
+        inputs['category'] = category
+    return pipeline.run(**inputs), pipeline.failed_stage
+
+def run_batch(prompts_file, batch_dir="batch_output", use_prompts=False, api_workers=4, render_workers=None,
+              max_in_flight=3, retry_failed=False, use_tmpfs=False, keep_intermediates=False):
+    """
+    Makes one video per line of `prompts_file`.
+
+    API-bound stages of up to `api_workers` videos run at once in threads. As soon as a video's
+    assets are ready, its ffmpeg assembly is handed to a pool of `render_workers` processes
+    (default: half the cores), which frees the thread for the next video. Each assembly's
+    encoder gets an equal share of the cores.
+
+    Every video gets its own workspace under `batch_dir`, which only keeps final_video.mp4
+    once the video is done. Job state is kept in `batch_dir/jobs.json` under ids derived from
+    the prompts, and running the batch again skips the videos that are already done, even if
+    lines were added or moved in the meantime.
+
+    Args:
+        prompts_file (str): A text file with one topic (or, with use_prompts, one user prompt) per line.
+        batch_dir (str): Where the job state and the per-video directories are written.
+        use_prompts (bool): Treat the lines as user prompts and pick a category and trending topic for each.
+        api_workers (int): How many videos may be in their API-bound stages at once.
+        render_workers (int): How many ffmpeg assemblies may run at once.
+        max_in_flight (int): The maximum number of Runway tasks per video.
+        retry_failed (bool): Also run the jobs that failed in an earlier run.
+        use_tmpfs (bool): Write each video's intermediate files to tmpfs.
+        keep_intermediates (bool): Keep scripts, voiceovers and clips next to each final video.
+
+    Returns:
+        dict: The final state of every job by id.
+    """
+    os.makedirs(batch_dir, exist_ok=True)
+    queue = JobQueue(os.path.join(batch_dir, "jobs.json"))
+    prompts = read_prompts(prompts_file)
+    batch_ids = job_ids_for(prompts)
+    for job_id, prompt in zip(batch_ids, prompts):
+        queue.add(job_id, prompt)
+
+    # Jobs saved for lines no longer in the file are kept but not run
+    job_ids = queue.unfinished(batch_ids, retry_failed)
+    skipped = len(batch_ids) - len(job_ids)
+    print(f"--- Batch of {len(batch_ids)} videos: {len(job_ids)} to run, {skipped} already finished ---")
+
+    # Categorize every prompt in one pass up front; a video whose prompt could not be
+    # categorized tries again in its own category stage
+    categories = {}
+    if use_prompts and job_ids:
+        from category_selector import get_category_ids_from_prompts
+        prompts = [queue.jobs[job_id]['prompt'] for job_id in job_ids]
+        categories = dict(zip(job_ids, get_category_ids_from_prompts(prompts, max_workers=api_workers)))
+
+    # x264 starts more threads than there are cores unless told otherwise, so renders that each
+    # left it at its default would run cores * cores threads between them
+    cores = os.cpu_count() or 1
+    render_workers = render_workers or max(1, cores // 2)
+    render_threads = max(1, cores // render_workers)
+
+    render_futures = []
+    render_futures_lock = threading.Lock()
+    start_time = time.perf_counter()
+
+    # The render processes are started while the API threads run; forking then could copy a lock
+    # some thread holds (in logging, an SDK's HTTP pool, ...) into a child that would wait on it forever
+    render_context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=render_workers, mp_context=render_context) as render_pool:
+
+        def finish_render(job_id, workspace, render_start, future):
+            try:
+                video_path = future.result()
+            except Exception as e:
+                print(f"[{job_id}] Render crashed: {e}")
+                video_path = None
+            render_end = time.perf_counter()
+            render_seconds = round(render_end - render_start, 2)
+            # Spans recorded inside the render process are lost, so the render is traced from here
+            tracing.record_span('render', render_start, render_end, lane=f"render {job_id}",
+                                error=None if video_path else "assembly failed")
+            if video_path:
+                video_path = workspace.promote(video_path)
+            workspace.cleanup()
+            if video_path:
+                queue.update(job_id, status='done', video=video_path, render_seconds=render_seconds)
+                print(f"[{job_id}] ✅ Video ready at {video_path}")
+            else:
+                queue.update(job_id, status='failed', error="assembly failed", render_seconds=render_seconds)
+                print(f"[{job_id}] ❌ Assembly failed.")
+
+        def run_job(job_id):
+            job = queue.jobs[job_id]
+            workspace = Workspace(run_id=job_id, root=batch_dir, use_tmpfs=use_tmpfs,
+                                  keep_intermediates=keep_intermediates)
+            queue.update(job_id, status='generating', attempts=job['attempts'] + 1, error=None)
+            print(f"[{job_id}] Generating assets for: '{job['prompt']}'")
+
+            generate_start = time.perf_counter()
+            try:
+                artifacts, failed_stage = _generate_assets(job['prompt'], workspace, use_prompts, max_in_flight,
+                                                           category=categories.get(job_id))
+            except Exception as e:
+                artifacts, failed_stage = None, f"unexpected error: {e}"
+            generate_seconds = round(time.perf_counter() - generate_start, 2)
+
+            if not artifacts:
+                workspace.cleanup()
+                queue.update(job_id, status='failed', error=f"stage '{failed_stage}' failed",
+                             generate_seconds=generate_seconds)
+                print(f"[{job_id}] ❌ Failed at the '{failed_stage}' stage.")
+                return
+
+            queue.update(job_id, status='rendering', topic=artifacts['topic'], generate_seconds=generate_seconds)
+            render_start = time.perf_counter()
+            future = render_pool.submit(
+                assemble_video, artifacts['clips'], artifacts['voiceover'], None,
+                output_path=workspace.file("final_video.mp4"), script_text=artifacts['script']['text'],
+                threads=render_threads
+            )
+            future.add_done_callback(lambda f: finish_render(job_id, workspace, render_start, f))
+            with render_futures_lock:
+                render_futures.append(future)
+
+        with ThreadPoolExecutor(max_workers=api_workers) as api_pool:
+            list(api_pool.map(run_job, job_ids))
+        wait(render_futures)
+
+    elapsed = time.perf_counter() - start_time
+    done = sum(1 for job_id in job_ids if queue.jobs[job_id]['status'] == 'done')
+    failed = len(job_ids) - done
+    videos_per_hour = done / (elapsed / 3600) if elapsed > 0 else 0.0
+
+    tracing.write_chrome_trace(os.path.join(batch_dir, "trace.json"))
+    tracing.write_prometheus(os.path.join(batch_dir, "metrics.prom"))
+    tracing.export_metrics()
+
+    print("\n--- Batch summary ---")
+    print(f"Videos completed: {done}, failed: {failed}, skipped (already finished): {skipped}")
+    print(f"Wall time: {elapsed:.1f}s, throughput: {videos_per_hour:.1f} videos/hour")
+    print(f"Trace and metrics written to {batch_dir}/trace.json and {batch_dir}/metrics.prom")
+    return queue.jobs
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Render many videos from a file of topics or prompts.")
+    parser.add_argument("prompts_file", help="Text file with one topic (or prompt, with --prompts) per line.")
+    parser.add_argument("--batch-dir", default="batch_output", help="Where job state and videos are written.")
+    parser.add_argument("--prompts", action="store_true", help="Lines are user prompts, not topics.")
+    parser.add_argument("--api-workers", type=int, default=4, help="Videos in their API-bound stages at once.")
+    parser.add_argument("--render-workers", type=int, default=None, help="Concurrent ffmpeg assemblies (default: cores / 2).")
+    parser.add_argument("--max-in-flight", type=int, default=3, help="Runway tasks per video at once.")
+    parser.add_argument("--retry-failed", action="store_true", help="Also rerun jobs that failed before.")
+    parser.add_argument("--tmpfs", action="store_true", help="Write intermediate files to tmpfs.")
+    parser.add_argument("--keep-intermediates", action="store_true", help="Keep scripts, voiceovers and clips.")
+    args = parser.parse_args()
+
+    run_batch(
+        args.prompts_file, batch_dir=args.batch_dir, use_prompts=args.prompts,
+        api_workers=args.api_workers, render_workers=args.render_workers,
+        max_in_flight=args.max_in_flight, retry_failed=args.retry_failed,
+        use_tmpfs=args.tmpfs, keep_intermediates=args.keep_intermediates
+    )
@@ -0,0 +1,756 @@
+# benchmarks.py
+import os
+import re
+import sys
+import glob
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from contextlib import contextmanager
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# The committed sample assets every benchmark runs on
+SAMPLE_CLIPS = sorted(glob.glob(os.path.join(REPO_DIR, "runway_clip_*.mp4")))
+SAMPLE_AUDIO = os.path.join(REPO_DIR, "voiceover.mp3")
+SAMPLE_SCRIPT = os.path.join(REPO_DIR, "script.txt")
+
+@contextmanager
+def _scratch_dir():
+    """
+    Runs the body inside a temporary working directory, so modules that write fixed
+    file names (captions.srt, ...) do not touch the committed samples.
+    """
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            yield tmp_dir
+        finally:
+            os.chdir(previous_dir)
+
+def compare_videos(reference_path, candidate_path):
+    """
+    Compares two renders frame by frame with ffmpeg's psnr filter.
+
+    Returns:
+        dict: 'psnr' (average over all frames, in dB) and 'min_psnr' (worst frame).
+    """
+    result = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-i", reference_path, "-i", candidate_path,
+         "-lavfi", "[0:v][1:v]psnr", "-f", "null", "-"],
+        capture_output=True, text=True
+    )
+    match = re.search(r"PSNR .*average:(\S+) min:(\S+)", result.stderr)
+    if not match:
+        return {'psnr': None, 'min_psnr': None}
+    return {'psnr': float(match.group(1)), 'min_psnr': float(match.group(2))}
+
+def count_frames(video_path):
+    """
+    Decodes a video and returns its number of frames.
+    """
+    result = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-i", video_path, "-map", "0:v", "-f", "null", "-"],
+        capture_output=True, text=True
+    )
+    frames = re.findall(r"frame=\s*(\d+)", result.stderr)
+    return int(frames[-1]) if frames else 0
+
+def benchmark_parallel_render(segment_counts=None):
+    """
+    Renders the committed clips and voiceover once in a single pass and once per segment
+    count in parallel mode, and reports the speedup and how closely each output matches
+    the single-pass render.
+    """
+    from video_editor import assemble_video
+
+    cores = os.cpu_count() or 1
+    if not segment_counts:
+        segment_counts = sorted({2, max(2, cores)} | {2 ** k for k in range(1, cores.bit_length())})
+
+    with _scratch_dir() as tmp_dir:
+        reference_path = os.path.join(tmp_dir, "single_pass.mp4")
+        start_time = time.perf_counter()
+        if not assemble_video(SAMPLE_CLIPS, SAMPLE_AUDIO, SAMPLE_SCRIPT, output_path=reference_path):
+            print("Single-pass render failed.")
+            return
+        single_pass_seconds = time.perf_counter() - start_time
+        reference_frames = count_frames(reference_path)
+
+        rows = []
+        for segment_count in segment_counts:
+            output_path = os.path.join(tmp_dir, f"parallel_{segment_count}.mp4")
+            start_time = time.perf_counter()
+            if not assemble_video(SAMPLE_CLIPS, SAMPLE_AUDIO, SAMPLE_SCRIPT, output_path=output_path,
+                                  parallel_segments=segment_count):
+                print(f"Parallel render with {segment_count} segments failed.")
+                continue
+            seconds = time.perf_counter() - start_time
+            rows.append((segment_count, seconds, count_frames(output_path), compare_videos(reference_path, output_path)))
+
+    print(f"\nParallel render benchmark ({cores} cores, {len(SAMPLE_CLIPS)} clips)")
+    print(f"{'segments':>8} {'seconds':>8} {'speedup':>8} {'frames':>7} {'psnr dB':>8} {'min dB':>7}")
+    print(f"{'single':>8} {single_pass_seconds:8.2f} {1.0:8.2f} {reference_frames:7d} {'-':>8} {'-':>7}")
+    for segment_count, seconds, frames, quality in rows:
+        print(f"{segment_count:8d} {seconds:8.2f} {single_pass_seconds / seconds:8.2f} {frames:7d} "
+              f"{quality['psnr'] or 0:8.2f} {quality['min_psnr'] or 0:7.2f}")
+
+def benchmark_renditions(profiles=("master", "720p", "preview")):
+    """
+    Renders the committed samples as every profile in `profiles`: once as separate
+    assemble_video() runs, one per profile, and once as a single run that writes them all,
+    and compares the time and the size of each output.
+    """
+    from video_editor import assemble_video, rendition_path
+
+    with _scratch_dir() as tmp_dir:
+        start_time = time.perf_counter()
+        sequential_paths = []
+        for profile in profiles:
+            output_path = os.path.join(tmp_dir, f"sequential_{profile}.mp4")
+            if not assemble_video(SAMPLE_CLIPS, SAMPLE_AUDIO, SAMPLE_SCRIPT, output_path=output_path, profiles=[profile]):
+                print(f"Render of {profile} failed.")
+                return
+            sequential_paths.append(output_path)
+        sequential_seconds = time.perf_counter() - start_time
+
+        output_path = os.path.join(tmp_dir, "single_pass.mp4")
+        start_time = time.perf_counter()
+        if not assemble_video(SAMPLE_CLIPS, SAMPLE_AUDIO, SAMPLE_SCRIPT, output_path=output_path, profiles=list(profiles)):
+            print("Multi-rendition render failed.")
+            return
+        single_pass_seconds = time.perf_counter() - start_time
+        single_pass_paths = [output_path] + [rendition_path(output_path, profile) for profile in profiles[1:]]
+
+        sizes = [(os.path.getsize(a) / 1e6, os.path.getsize(b) / 1e6, compare_videos(a, b)['psnr'] or 0)
+                 for a, b in zip(sequential_paths, single_pass_paths)]
+
+    print(f"\nMulti-rendition benchmark ({os.cpu_count() or 1} cores, {len(SAMPLE_CLIPS)} clips, {', '.join(profiles)})")
+    print(f"{'mode':>12} {'seconds':>8} {'speedup':>8}")
+    print(f"{'sequential':>12} {sequential_seconds:8.2f} {1.0:8.2f}")
+    print(f"{'single pass':>12} {single_pass_seconds:8.2f} {sequential_seconds / single_pass_seconds:8.2f}")
+    print(f"{'profile':>12} {'seq MB':>8} {'pass MB':>8} {'psnr dB':>8}")
+    for profile, (sequential_mb, single_pass_mb, psnr) in zip(profiles, sizes):
+        print(f"{profile:>12} {sequential_mb:8.2f} {single_pass_mb:8.2f} {psnr:8.2f}")
+
+def benchmark_preview(runs=2, runway_seconds=2.0):
+    """
+    Makes videos through JobRunner, as the Streamlit app does, against the stub providers,
+    with and without the preview render, and reports the time from submission to the first
+    playable video and to the final one.
+    """
+    import statistics
+    from stub_servers import StubProviders
+
+    with _scratch_dir() as tmp_dir, \
+            StubProviders(runway_queue_seconds=runway_seconds / 5, runway_generation_seconds=runway_seconds * 4 / 5) as stubs:
+        os.environ.update(stubs.environment())
+        os.environ.update(ASSET_CACHE_DIR=os.path.join(tmp_dir, "cache"),
+                          RUNWAY_POLL_INTERVAL=str(max(0.1, runway_seconds / 10)))
+        from jobs import JobRunner
+
+        rows = []
+        for preview in (False, True):
+            runner = JobRunner(max_workers=1, use_tmpfs=False, preview=preview, reuse_similar_clips=False)
+            first_playable, finished = [], []
+            for run in range(runs):
+                job = runner.get(runner.submit("A video about the newest tech gadget"))
+                while job.status in ('queued', 'running'):
+                    time.sleep(0.05)
+                if job.status != 'done':
+                    print(f"Job failed at {job.failed_stage}: {job.error}")
+                    continue
+                first_playable.append(job.first_playable_seconds)
+                finished.append(job.finished_at - job.submitted_at)
+            runner.pool.shutdown()
+            if finished:
+                rows.append(("preview" if preview else "final only", statistics.median(first_playable),
+                             statistics.median(finished)))
+
+    print(f"\nPreview benchmark (stub providers, {runway_seconds:.1f}s per clip, median of {runs} videos)")
+    print(f"{'mode':>10} {'first playable s':>16} {'final video s':>13}")
+    for label, first_seconds, final_seconds in rows:
+        print(f"{label:>10} {first_seconds:16.2f} {final_seconds:13.2f}")
+
+def benchmark_caption_alignment(target_seconds=60, repeats=10):
+    """
+    Times caption alignment on a voiceover of about `target_seconds`, made by looping the
+    committed voiceover.mp3 (and repeating script.txt to match), end to end and per step.
+    """
+    import statistics
+    from caption_aligner import decode_audio, align_captions, align_captions_to_samples
+
+    with open(SAMPLE_SCRIPT) as f:
+        script_text = f.read()
+    sample_seconds = len(decode_audio(SAMPLE_AUDIO)) / 16000
+    loops = max(1, round(target_seconds / sample_seconds))
+
+    with _scratch_dir() as tmp_dir:
+        long_audio_path = os.path.join(tmp_dir, "long_voiceover.mp3")
+        subprocess.run(
+            ["ffmpeg", "-hide_banner", "-loglevel", "error", "-stream_loop", str(loops - 1),
+             "-i", SAMPLE_AUDIO, "-c", "copy", long_audio_path],
+            check=True
+        )
+        long_script = " ".join([script_text] * loops)
+
+        decode_times, align_times, total_times = [], [], []
+        for _ in range(repeats):
+            start_time = time.perf_counter()
+            samples = decode_audio(long_audio_path)
+            decode_times.append(time.perf_counter() - start_time)
+
+            start_time = time.perf_counter()
+            caption_blocks = align_captions_to_samples(long_script, samples)
+            align_times.append(time.perf_counter() - start_time)
+
+            start_time = time.perf_counter()
+            align_captions(long_script, long_audio_path)
+            total_times.append(time.perf_counter() - start_time)
+
+    audio_seconds = len(samples) / 16000
+    print(f"\nCaption alignment benchmark ({audio_seconds:.1f}s of audio, {len(caption_blocks)} caption blocks, "
+          f"median of {repeats} runs)")
+    print(f"  decode (ffmpeg pipe): {statistics.median(decode_times) * 1000:8.1f} ms")
+    print(f"  energy + alignment:   {statistics.median(align_times) * 1000:8.1f} ms")
+    print(f"  end to end:           {statistics.median(total_times) * 1000:8.1f} ms")
+
+def benchmark_end_to_end(concurrency_levels=(1, 2, 4), videos=4, render=True, latency=0.3, error_rate=0.0,
+                         rate_limit=None, runway_seconds=5.0):
+    """
+    Makes `videos` videos the way main.py does (topic, script, voiceover, clips and, with
+    `render`, the final assembly) at each concurrency level, against the local provider
+    stand-ins in stub_servers.py, and reports per-video latency and videos per hour.
+
+    Every video gets its own script and keywords from the stand-ins, the asset cache starts
+    empty and similar clips are not reused, so nothing is served from the cache.
+    """
+    import statistics
+    from concurrent.futures import ThreadPoolExecutor
+    from stub_servers import StubProviders, ProviderBehavior
+
+    def behavior():
+        return ProviderBehavior(latency=latency, jitter=latency / 2, error_rate=error_rate, rate_limit=rate_limit)
+
+    with tempfile.TemporaryDirectory(prefix="bench-e2e-") as tmp_dir, \
+            StubProviders(openai=behavior(), elevenlabs=behavior(), runway=behavior(), youtube=behavior(),
+                          runway_queue_seconds=runway_seconds / 5,
+                          runway_generation_seconds=runway_seconds * 4 / 5) as stubs:
+        # Set before the pipeline modules are imported, since they read these once
+        os.environ.update(stubs.environment())
+        os.environ.update(ASSET_CACHE_DIR=os.path.join(tmp_dir, "cache"),
+                          RUNWAY_POLL_INTERVAL=str(max(0.1, runway_seconds / 10)))
+        from workflow import build_video_pipeline
+        from workspace import Workspace
+
+        def make_video(level, index):
+            start_time = time.perf_counter()
+            with Workspace(run_id=f"c{level}-{index}", root=os.path.join(tmp_dir, "runs")) as workspace:
+                pipeline = build_video_pipeline(output_dir=workspace, assemble=render, reuse_similar_clips=False)
+                artifacts = pipeline.run()
+            return time.perf_counter() - start_time, artifacts is not None, pipeline.timings
+
+        rows = []
+        for level in concurrency_levels:
+            requests_before = stubs.stats()
+            start_time = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=level) as pool:
+                results = list(pool.map(lambda index: make_video(level, index), range(videos)))
+            wall_seconds = time.perf_counter() - start_time
+            requests_after = stubs.stats()
+            refused = {
+                key: sum(requests_after[name][key] - requests_before[name][key] for name in requests_after)
+                for key in ('requests', 'errors', 'throttled')
+            }
+            rows.append((level, wall_seconds, results, refused))
+
+    print(f"\nEnd-to-end benchmark against stub providers ({videos} videos per level, "
+          f"{'with' if render else 'without'} rendering, {latency:.2f}s API latency, "
+          f"{error_rate:.0%} errors, {runway_seconds:.1f}s per clip)")
+    print(f"{'workers':>7} {'ok':>4} {'wall s':>8} {'p50 s':>7} {'p95 s':>7} {'videos/h':>9} "
+          f"{'requests':>8} {'503s':>5} {'429s':>5}  slowest stages (median s)")
+    for level, wall_seconds, results, refused in rows:
+        latencies = sorted(seconds for seconds, ok, _ in results if ok)
+        done = len(latencies)
+        p50 = statistics.median(latencies) if latencies else 0.0
+        p95 = latencies[min(done - 1, round(0.95 * (done - 1)))] if latencies else 0.0
+        stage_names = {name for _, _, timings in results for name in timings}
+        stage_medians = sorted(
+            ((statistics.median(timings[name] for _, _, timings in results if name in timings), name)
+             for name in stage_names), reverse=True
+        )[:3]
+        stages = ", ".join(f"{name} {seconds:.1f}" for seconds, name in stage_medians)
+        print(f"{level:7d} {done:4d} {wall_seconds:8.1f} {p50:7.1f} {p95:7.1f} {done / (wall_seconds / 3600):9.1f} "
+              f"{refused['requests']:8d} {refused['errors']:5d} {refused['throttled']:5d}  {stages}")
+
+def benchmark_chunked_tts(target_seconds=60, max_workers=4, realtime_factor=0.3, latency=0.3):
+    """
+    Compares one whole-script ElevenLabs request with sentence-chunked parallel synthesis on a
+    script of about `target_seconds`, against the stub provider that takes `realtime_factor`
+    seconds per second of speech. Then edits one sentence and synthesizes the chunked script
+    again, to show that only the changed chunk is requested.
+    """
+    from stub_servers import StubProviders, ProviderBehavior, STUB_CHARACTERS_PER_SECOND
+
+    with open(SAMPLE_SCRIPT) as f:
+        sample_script = f.read().strip()
+    loops = max(1, round(target_seconds * STUB_CHARACTERS_PER_SECOND / len(sample_script)))
+    # Number the copies so every sentence is distinct
+    script_text = " ".join(f"Part {k + 1}. {sample_script}" for k in range(loops))
+
+    with tempfile.TemporaryDirectory(prefix="bench-tts-") as tmp_dir, \
+            StubProviders(elevenlabs=ProviderBehavior(latency=latency), tts_realtime_factor=realtime_factor) as stubs:
+        os.environ.update(stubs.environment())
+        os.environ['ASSET_CACHE_DIR'] = os.path.join(tmp_dir, "cache")
+        from elevenlabs_api import generate_voiceover, generate_voiceover_chunked, load_chunk_timings
+
+        rows = []
+        for label, synthesize, text in (
+                ("whole script", generate_voiceover, script_text),
+                ("chunked", lambda *a, **kw: generate_voiceover_chunked(*a, max_workers=max_workers, **kw), script_text),
+                ("chunked, 1 edit", lambda *a, **kw: generate_voiceover_chunked(*a, max_workers=max_workers, **kw),
+                 script_text.replace("Part 1.", "Part one.", 1))):
+            output_dir = os.path.join(tmp_dir, label.replace(" ", "_").replace(",", ""))
+            os.makedirs(output_dir)
+            requests_before = stubs.stats()['elevenlabs']['requests']
+            start_time = time.perf_counter()
+            audio_path = synthesize(text, output_dir=output_dir)
+            seconds = time.perf_counter() - start_time
+            timings = load_chunk_timings(audio_path) if audio_path else None
+            rows.append((label, seconds, stubs.stats()['elevenlabs']['requests'] - requests_before,
+                         len(timings) if timings else 1, timings[-1][1] if timings else None))
+
+    print(f"\nChunked TTS benchmark ({len(script_text)} characters, ~{len(script_text) / STUB_CHARACTERS_PER_SECOND:.0f}s "
+          f"of speech, {realtime_factor}s synthesis per second of speech, {max_workers} workers)")
+    print(f"{'mode':>16} {'seconds':>8} {'requests':>8} {'chunks':>7} {'audio s':>8}")
+    for label, seconds, requests_made, chunks, audio_seconds in rows:
+        audio = f"{audio_seconds:8.2f}" if audio_seconds else f"{'-':>8}"
+        print(f"{label:>16} {seconds:8.2f} {requests_made:8d} {chunks:7d} {audio}")
+
+def benchmark_script_streaming(tokens_per_second=40, runs=3, runway_seconds=5.0):
+    """
+    Runs the topic -> script -> clips part of the pipeline with and without stream_script,
+    against the stub providers writing `tokens_per_second`, and reports how long after the
+    script request started the first Runway task was submitted, when the script was complete
+    and when every clip was on disk.
+    """
+    import statistics
+    import tracing
+    from stub_servers import StubProviders
+
+    with tempfile.TemporaryDirectory(prefix="bench-script-") as tmp_dir, \
+            StubProviders(openai_tokens_per_second=tokens_per_second, runway_queue_seconds=runway_seconds / 5,
+                          runway_generation_seconds=runway_seconds * 4 / 5) as stubs:
+        os.environ.update(stubs.environment())
+        os.environ.update(ASSET_CACHE_DIR=os.path.join(tmp_dir, "cache"),
+                          RUNWAY_POLL_INTERVAL=str(max(0.1, runway_seconds / 10)))
+        from workflow import build_video_pipeline
+        from workspace import Workspace
+
+        rows = []
+        for stream_script in (False, True):
+            first_submissions, scripts, clips = [], [], []
+            for run in range(runs):
+                tracing.reset()
+                with Workspace(run_id=f"{'stream' if stream_script else 'whole'}-{run}",
+                               root=os.path.join(tmp_dir, "runs")) as workspace:
+                    pipeline = build_video_pipeline(output_dir=workspace, assemble=False, stream_script=stream_script,
+                                                    reuse_similar_clips=False)
+                    pipeline.run(topic="Why is everyone talking about the new tech gadget?")
+
+                spans = tracing.finished_spans()
+                script_span = next(s for s in spans if s.name == 'openai.script')
+                queue_starts = [s.start for s in spans if s.name == 'runway.queue']
+                first_submissions.append(min(queue_starts) - script_span.start)
+                scripts.append(script_span.end_time - script_span.start)
+                clips.append(pipeline.timings['clips'] + (0 if stream_script else pipeline.timings['script']))
+            rows.append(("streamed" if stream_script else "whole response", statistics.median(first_submissions),
+                         statistics.median(scripts), statistics.median(clips)))
+
+    print(f"\nScript streaming benchmark (stub LLM at {tokens_per_second} tokens/s, {runway_seconds:.1f}s per clip, "
+          f"median of {runs} runs)")
+    print(f"{'mode':>15} {'first clip submitted s':>22} {'script done s':>13} {'clips done s':>12}")
+    for label, first_submission, script_seconds, clip_seconds in rows:
+        print(f"{label:>15} {first_submission:22.2f} {script_seconds:13.2f} {clip_seconds:12.2f}")
+
+def benchmark_upload(files=4, megabytes=24, bandwidth_mbps=80, part_megabytes=8, concurrency=8, workers=4):
+    """
+    Uploads `files` random files of `megabytes` each to the local S3 stand-in, whose
+    connections each carry `bandwidth_mbps`: one after the other as single-request uploads,
+    then all at once as multipart uploads with `concurrency` parts in flight per file, then
+    again to show that unchanged files are skipped.
+    """
+    from stub_servers import StubS3
+
+    with tempfile.TemporaryDirectory(prefix="bench-upload-") as tmp_dir, \
+            StubS3(bandwidth=bandwidth_mbps * 1e6 / 8) as s3:
+        os.environ.update(s3.environment())
+        from uploader import upload_files
+
+        uploads = []
+        for k in range(files):
+            path = os.path.join(tmp_dir, f"video_{k}.mp4")
+            with open(path, 'wb') as f:
+                f.write(os.urandom(megabytes * 1024 * 1024))
+            uploads.append((path, f"videos/video_{k}.mp4"))
+        bucket = s3.environment()['S3_BUCKET_NAME']
+
+        rows = []
+        for label, prefix, options in (
+                ("sequential", "sequential/", dict(max_workers=1, max_concurrency=1, part_size=1024 ** 4)),
+                ("parallel multipart", "parallel/", dict(max_workers=workers, max_concurrency=concurrency,
+                                                         part_size=part_megabytes * 1024 * 1024)),
+                ("unchanged re-run", "parallel/", dict(max_workers=workers, max_concurrency=concurrency,
+                                                       part_size=part_megabytes * 1024 * 1024))):
+            start_time = time.perf_counter()
+            results = upload_files([(path, prefix + key) for path, key in uploads], bucket=bucket, **options)
+            seconds = time.perf_counter() - start_time
+            sent = sum(result['bytes'] for result in results)
+            rows.append((label, seconds, sent, sum(result['skipped'] for result in results)))
+
+        for path, key in uploads:
+            with open(path, 'rb') as f:
+                assert s3.objects[(bucket, "parallel/" + key)]['data'] == f.read(), f"{key} was corrupted"
+
+    print(f"\nUpload benchmark ({files} files of {megabytes} MB, {bandwidth_mbps} Mbit/s per connection)")
+    print(f"{'mode':>19} {'seconds':>8} {'MB sent':>8} {'MB/s':>7} {'skipped':>7}")
+    for label, seconds, sent, skipped in rows:
+        print(f"{label:>19} {seconds:8.2f} {sent / 1e6:8.1f} {sent / seconds / 1e6:7.1f} {skipped:7d}")
+
+def benchmark_rate_limits(calls=60, threads=16, quota=5.0, latency=0.05):
+    """
+    Makes `calls` category requests from `threads` threads to a stub OpenAI that allows
+    `quota` requests per second and answers 429 with Retry-After beyond it: without retries,
+    with retries alone, and with retries behind a token bucket set to the quota. Then takes the
+    stub down and shows the circuit breaker failing the remaining calls at once.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    import resilience
+    from stub_servers import StubProviders, ProviderBehavior
+
+    with StubProviders() as stubs:
+        os.environ.update(stubs.environment())
+        from clients import get_openai_client
+        client = get_openai_client()
+
+        def request():
+            resilience.call('openai', client.chat.completions.create, model="gpt-4o-mini", messages=[
+                {"role": "system", "content": "You pick the best YouTube category ID."},
+                {"role": "user", "content": "A video about cooking pasta"}
+            ])
+
+        def attempt(_):
+            try:
+                request()
+                return True
+            except Exception:
+                return False
+
+        rows = []
+        for label, behavior, options in (
+                ("no retries", ProviderBehavior(latency, rate_limit=quota), dict(attempts=1)),
+                ("retries", ProviderBehavior(latency, rate_limit=quota), dict(attempts=8)),
+                ("retries + bucket", ProviderBehavior(latency, rate_limit=quota),
+                 dict(attempts=8, rate_limit=quota, burst=int(quota))),
+                ("provider down", ProviderBehavior(latency, error_rate=1.0),
+                 dict(attempts=2, failures=5, reset_seconds=60))):
+            stubs.behaviors['openai'] = behavior
+            resilience.configure('openai', **options)
+            start_time = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                succeeded = sum(pool.map(attempt, range(calls)))
+            seconds = time.perf_counter() - start_time
+            refused = behavior.stats()
+            rows.append((label, seconds, succeeded, refused['requests'], refused['throttled'],
+                         resilience.stats()['openai']['rejected']))
+
+    print(f"\nRate limit benchmark ({calls} calls from {threads} threads, stub quota {quota:g} requests/s)")
+    print(f"{'mode':>17} {'seconds':>8} {'ok':>4} {'calls/s':>8} {'sent':>5} {'429s':>5} {'breaker':>7}")
+    for label, seconds, succeeded, sent, throttled, rejected in rows:
+        print(f"{label:>17} {seconds:8.2f} {succeeded:4d} {succeeded / seconds:8.2f} {sent:5d} {throttled:5d} {rejected:7d}")
+
+def benchmark_probe(repeats=20):
+    """
+    Probes the sample voiceover and clips with ffprobe (a process per file, as assembly used
+    to), with media_info's parsers and from media_info's cache, and checks they agree.
+    """
+    import ffmpeg
+    import media_info
+
+    paths = [SAMPLE_AUDIO] + SAMPLE_CLIPS
+
+    def best_of(function):
+        timings = []
+        for _ in range(repeats):
+            start_time = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start_time)
+        return min(timings)
+
+    def parse_all():
+        media_info.clear_cache()
+        for path in paths:
+            media_info.probe(path)
+
+    def cached_all():
+        for path in paths:
+            media_info.probe(path)
+
+    ffprobe_seconds = best_of(lambda: [ffmpeg.probe(path) for path in paths])
+    parse_seconds = best_of(parse_all)
+    cached_seconds = best_of(cached_all)
+
+    print(f"\nProbe benchmark ({len(paths)} files, best of {repeats})")
+    print(f"{'method':>10} {'total ms':>9} {'per file µs':>12}")
+    for label, seconds in (("ffprobe", ffprobe_seconds), ("parse", parse_seconds), ("cached", cached_seconds)):
+        print(f"{label:>10} {seconds * 1000:9.2f} {seconds / len(paths) * 1e6:12.0f}")
+
+    for path in paths:
+        info = media_info.probe(path)
+        reference = float(ffmpeg.probe(path)['format']['duration'])
+        print(f"  {os.path.basename(path)}: {info['duration']:.3f}s via {info['parser']} (ffprobe {reference:.3f}s)")
+
+# Rephrasings of stub_servers.STUB_KEYWORDS, the way another script might word them, and
+# prompts that look alike but show something else
+REPHRASED_KEYWORDS = [
+    "futuristic city with neon lights and flying cars",
+    "diverse group of people celebrating, slow motion",
+    "cat paws playing with yarn close-up",
+    "drone shot of a misty lake in the mountains at sunrise",
+    "a chef plates a colourful dish in a busy kitchen",
+]
+UNRELATED_KEYWORDS = [
+    "a futuristic robot with neon lights",
+    "people running in slow motion",
+    "a close-up of a dog's paws in the snow",
+    "a drone shot over a busy city at night",
+    "a busy street market at night",
+]
+
+def _synthetic_prompts(count, seed=0):
+    """
+    Returns `count` made-up clip prompts, combined from a few hundred words.
+    """
+    import random
+
+    styles = ["cinematic", "slow motion", "aerial", "close-up", "time-lapse", "handheld", "vintage", "neon-lit",
+              "golden hour", "black and white", "drone", "macro", "tracking shot of", "wide shot of", "moody"]
+    subjects = ["cat", "dog", "chef", "skateboarder", "astronaut", "robot", "dancer", "surfer", "barista", "child",
+                "horse", "eagle", "crowd", "scientist", "painter", "train", "sports car", "sailboat", "hot air balloon",
+                "jellyfish", "fox", "owl", "drummer", "gymnast", "farmer", "programmer", "street vendor", "tiger"]
+    actions = ["running", "jumping", "dancing", "cooking", "flying", "swimming", "painting", "laughing", "spinning",
+               "drifting", "climbing", "sleeping", "playing", "racing", "exploring", "celebrating", "typing"]
+    places = ["in a busy kitchen", "on a misty mountain", "in a neon city", "on a sunny beach", "in a snowy forest",
+              "in a desert", "under the ocean", "on the moon", "in a library", "at a night market", "in a rainforest",
+              "on a rooftop", "in a stadium", "at sunrise", "in the rain", "in a cozy cafe", "on a frozen lake"]
+    generator = random.Random(seed)
+    return [f"{generator.choice(styles)} {generator.choice(subjects)} {generator.choice(actions)} "
+            f"{generator.choice(places)}" for _ in range(count)]
+
+def benchmark_clip_library(sizes=(1000, 10000, 50000), lookups=200, runway_seconds=2.0):
+    """
+    Generates the stub keywords through the Runway stand-in with a clip library, then
+    rephrasings of them and look-alike prompts about something else, and counts the Runway
+    tasks each round needed. Then fills libraries of `sizes` made-up prompts and times loading
+    them from disk and looking prompts up, against scoring every entry one by one.
+    """
+    import statistics
+    import tracing
+    from stub_servers import StubProviders, STUB_KEYWORDS
+
+    with tempfile.TemporaryDirectory(prefix="bench-library-") as tmp_dir, \
+            StubProviders(runway_queue_seconds=runway_seconds / 5, runway_generation_seconds=runway_seconds * 4 / 5) as stubs:
+        os.environ.update(stubs.environment())
+        os.environ.update(ASSET_CACHE_DIR=os.path.join(tmp_dir, "cache"),
+                          RUNWAY_POLL_INTERVAL=str(max(0.1, runway_seconds / 10)))
+        from runway_api import generate_runway_clips
+        from clip_library import ClipLibrary, prompt_features
+
+        library = ClipLibrary(os.path.join(tmp_dir, "clip_library.jsonl"))
+        reuse_rows = []
+        for label, keywords in (("original", STUB_KEYWORDS), ("rephrased", REPHRASED_KEYWORDS),
+                                ("look-alike", UNRELATED_KEYWORDS)):
+            tracing.reset()
+            start_time = time.perf_counter()
+            clips = generate_runway_clips(keywords, max_in_flight=len(keywords), output_dir=os.path.join(tmp_dir, label),
+                                          clip_library=library)
+            seconds = time.perf_counter() - start_time
+            generated = sum(1 for s in tracing.finished_spans() if s.name == 'runway.queue')
+            reuse_rows.append((label, len(keywords), len(clips), generated, seconds))
+
+        scale_rows = []
+        for size in sizes:
+            path = os.path.join(tmp_dir, f"library_{size}.jsonl")
+            seed_library = ClipLibrary(path)
+            prompts = _synthetic_prompts(size)
+            with open(path, 'w') as f:
+                for n, prompt in enumerate(prompts):
+                    f.write(json.dumps({'prompt': prompt, 'key': f"key-{n}", 'settings': 's'}) + "\n")
+
+            start_time = time.perf_counter()
+            len(seed_library)
+            load_seconds = time.perf_counter() - start_time
+
+            queries = _synthetic_prompts(lookups, seed=1)
+            timings, matched = [], 0
+            for query in queries:
+                start_time = time.perf_counter()
+                matched += bool(seed_library.find(query, 's', limit=1))
+                timings.append(time.perf_counter() - start_time)
+
+            # The same lookups by scoring every prompt in turn, on a few queries
+            vectors = [prompt_features(prompt) for prompt in prompts]
+            scan_queries = queries[:3]
+            start_time = time.perf_counter()
+            agree = 0
+            for query in scan_queries:
+                features = prompt_features(query)
+                scores = [sum(weight * vector.get(feature, 0.0) for feature, weight in features.items())
+                          for vector in vectors]
+                best = max(range(size), key=scores.__getitem__)
+                found = seed_library.find(query, 's', limit=1)
+                agree += (found[0]['key'] == f"key-{best}") if found else scores[best] < seed_library.threshold
+            scan_ms = (time.perf_counter() - start_time) / len(scan_queries) * 1000
+            scale_rows.append((size, load_seconds, statistics.median(timings) * 1000, max(timings) * 1000, scan_ms,
+                               matched / lookups, f"{agree}/{len(scan_queries)}"))
+
+    print(f"\nClip library reuse against the stub Runway ({runway_seconds:.1f}s per clip)")
+    print(f"{'keywords':>11} {'prompts':>7} {'clips':>5} {'generated':>9} {'seconds':>8}")
+    for label, prompts, clips, generated, seconds in reuse_rows:
+        print(f"{label:>11} {prompts:7d} {clips:5d} {generated:9d} {seconds:8.2f}")
+
+    print(f"\nClip library lookups ({lookups} made-up prompts per size)")
+    print(f"{'entries':>8} {'load s':>7} {'p50 ms':>7} {'max ms':>7} {'scan ms':>8} {'hit rate':>8} {'same as scan':>12}")
+    for size, load_seconds, p50, slowest, scan_ms, hit_rate, agree in scale_rows:
+        print(f"{size:8d} {load_seconds:7.2f} {p50:7.2f} {slowest:7.2f} {scan_ms:8.1f} {hit_rate:8.0%} {agree:>12}")
+
+def measure_import_time(module_name):
+    """
+    Imports `module_name` in a fresh interpreter under `python -X importtime`.
+
+    Returns:
+        tuple: The total import time in ms and a (cumulative ms, module) pair for every module it pulled in.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        capture_output=True, text=True, cwd=REPO_DIR
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module_name} failed:\n{result.stderr}")
+
+    # Lines look like "import time: self [us] | cumulative | imported package". Children are listed
+    # before their parent and indented deeper, so the entry point's imports are the run of
+    # nested lines just above its own top-level line.
+    lines = re.findall(r"import time:\s+\d+ \|\s+(\d+) \|( +)(\S+)", result.stderr)
+    entry = max(i for i, (_, indent, name) in enumerate(lines) if name == module_name and len(indent) == 1)
+    start = entry
+    while start > 0 and len(lines[start - 1][1]) > 1:
+        start -= 1
+    modules = [(int(cumulative) / 1000, name) for cumulative, _, name in lines[start:entry + 1]]
+    total_ms = modules[-1][0]
+    return total_ms, modules
+
+def benchmark_startup(module_names=("main", "workflow"), budget_ms=None, repeats=5, top=10):
+    """
+    Measures the cold import time of the entry points (the best of `repeats` fresh
+    interpreters) and lists the modules that cost the most.
+
+    Returns:
+        bool: False if any entry point is over `budget_ms`.
+    """
+    within_budget = True
+    for module_name in module_names:
+        runs = [measure_import_time(module_name) for _ in range(repeats)]
+        total_ms, modules = min(runs, key=lambda run: run[0])
+
+        print(f"\nimport {module_name}: {total_ms:.1f} ms (best of {repeats})")
+        for cumulative, name in sorted(modules, reverse=True)[:top]:
+            print(f"  {cumulative:8.1f} ms  {name}")
+
+        if budget_ms is not None and total_ms > budget_ms:
+            print(f"  ❌ Over the {budget_ms:.0f} ms budget.")
+            within_budget = False
+    return within_budget
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks for the Viral Video Maker pipeline.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    render_parser = subparsers.add_parser("render", help="Single-pass vs segment-parallel video assembly.")
+    render_parser.add_argument("--segments", type=int, nargs="*", help="Segment counts to try (default: powers of two up to the core count).")
+
+    renditions_parser = subparsers.add_parser("renditions", help="Sequential vs single-pass multi-rendition renders.")
+    renditions_parser.add_argument("profiles", nargs="*", default=["master", "720p", "preview"], help="Output profiles.")
+
+    preview_parser = subparsers.add_parser("preview", help="Time to the first playable video with and without a preview.")
+    preview_parser.add_argument("--runs", type=int, default=2, help="Videos made in each mode.")
+
+    captions_parser = subparsers.add_parser("captions", help="Offline caption alignment on a ~60s voiceover.")
+    captions_parser.add_argument("--seconds", type=int, default=60, help="Approximate length of the test voiceover.")
+
+    e2e_parser = subparsers.add_parser("e2e", help="End-to-end videos per hour against local stub providers.")
+    e2e_parser.add_argument("--concurrency", type=int, nargs="*", default=[1, 2, 4], help="Videos made at once.")
+    e2e_parser.add_argument("--videos", type=int, default=4, help="Videos made at each concurrency level.")
+    e2e_parser.add_argument("--no-render", action="store_true", help="Stop before the ffmpeg assembly.")
+    e2e_parser.add_argument("--latency", type=float, default=0.3, help="Seconds before every stub API response.")
+    e2e_parser.add_argument("--error-rate", type=float, default=0.0, help="Share of stub API requests answered with 503.")
+    e2e_parser.add_argument("--rate-limit", type=float, help="Requests per second per provider before 429s.")
+    e2e_parser.add_argument("--runway-seconds", type=float, default=5.0, help="Queue plus generation time of a clip.")
+
+    tts_parser = subparsers.add_parser("tts", help="Whole-script vs sentence-chunked parallel TTS against a stub.")
+    tts_parser.add_argument("--seconds", type=int, default=60, help="Approximate length of the test script.")
+    tts_parser.add_argument("--workers", type=int, default=4, help="Concurrent chunk requests.")
+
+    script_parser = subparsers.add_parser("script", help="Time to the first Runway task with and without a streamed script.")
+    script_parser.add_argument("--tokens-per-second", type=float, default=40, help="How fast the stub LLM writes.")
+    script_parser.add_argument("--runs", type=int, default=3, help="Runs of each mode.")
+
+    upload_parser = subparsers.add_parser("upload", help="Sequential vs parallel multipart S3 uploads against a stub.")
+    upload_parser.add_argument("--files", type=int, default=4, help="Files uploaded.")
+    upload_parser.add_argument("--megabytes", type=int, default=24, help="Size of each file.")
+    upload_parser.add_argument("--bandwidth", type=float, default=80, help="Mbit/s each stub connection carries.")
+
+    limits_parser = subparsers.add_parser("ratelimit", help="Retries, token bucket and circuit breaker against a rate-limited stub.")
+    limits_parser.add_argument("--calls", type=int, default=60, help="Requests made in each mode.")
+    limits_parser.add_argument("--quota", type=float, default=5.0, help="Requests per second the stub allows.")
+
+    probe_parser = subparsers.add_parser("probe", help="ffprobe vs the native media_info parsers and cache.")
+    probe_parser.add_argument("--repeats", type=int, default=20, help="Timed runs of each method.")
+
+    library_parser = subparsers.add_parser("library", help="Similar-clip reuse and clip library lookups at scale.")
+    library_parser.add_argument("--sizes", type=int, nargs="*", default=[1000, 10000, 50000], help="Library sizes to time.")
+
+    startup_parser = subparsers.add_parser("startup", help="Cold import time of the CLI and pipeline entry points.")
+    startup_parser.add_argument("modules", nargs="*", default=["main", "workflow"], help="Modules to import.")
+    startup_parser.add_argument("--budget-ms", type=float, help="Exit with an error if an import takes longer.")
+
+    args = parser.parse_args()
+    if args.benchmark == "render":
+        benchmark_parallel_render(args.segments)
+    elif args.benchmark == "renditions":
+        benchmark_renditions(tuple(args.profiles))
+    elif args.benchmark == "preview":
+        benchmark_preview(args.runs)
+    elif args.benchmark == "captions":
+        benchmark_caption_alignment(args.seconds)
+    elif args.benchmark == "e2e":
+        benchmark_end_to_end(args.concurrency, args.videos, not args.no_render, args.latency, args.error_rate,
+                             args.rate_limit, args.runway_seconds)
+    elif args.benchmark == "tts":
+        benchmark_chunked_tts(args.seconds, args.workers)
+    elif args.benchmark == "script":
+        benchmark_script_streaming(args.tokens_per_second, args.runs)
+    elif args.benchmark == "upload":
+        benchmark_upload(args.files, args.megabytes, args.bandwidth)
+    elif args.benchmark == "ratelimit":
+        benchmark_rate_limits(args.calls, quota=args.quota)
+    elif args.benchmark == "probe":
+        benchmark_probe(args.repeats)
+    elif args.benchmark == "library":
+        benchmark_clip_library(tuple(args.sizes))
+    elif args.benchmark == "startup":
+        if not benchmark_startup(args.modules, args.budget_ms):
+            sys.exit(1)
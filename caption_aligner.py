@@ -0,0 +1,144 @@
+# caption_aligner.py
+import re
+
+import ffmpeg
+import numpy as np
+
+# Audio is analysed as 16 kHz mono in 20 ms frames
+SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.02
+
+# A gap counts as a pause when it is at least this long
+MIN_PAUSE_SECONDS = 0.2
+# Sentence boundaries move to the nearest pause within this much speech time
+MAX_SNAP_SECONDS = 0.75
+
+def decode_audio(audio_path, sample_rate=SAMPLE_RATE):
+    """
+    Decodes an audio file to mono float32 PCM in [-1, 1] through a single ffmpeg pipe.
+    """
+    pcm, _ = (
+        ffmpeg
+        .input(audio_path)
+        .output('pipe:', format='s16le', acodec='pcm_s16le', ac=1, ar=sample_rate)
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+    return np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+
+def frame_energy(samples, sample_rate=SAMPLE_RATE, frame_seconds=FRAME_SECONDS):
+    """
+    Returns the RMS energy of every frame in dB.
+    """
+    frame_length = int(sample_rate * frame_seconds)
+    frame_count = len(samples) // frame_length
+    frames = samples[:frame_count * frame_length].reshape(frame_count, frame_length)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-6))
+
+def detect_speech_regions(energy_db, frame_seconds=FRAME_SECONDS, min_pause_seconds=MIN_PAUSE_SECONDS):
+    """
+    Finds the stretches of speech between pauses.
+
+    The silence threshold adapts to the recording: it sits a third of the way from the
+    noise floor (10th percentile) to the speech level (95th percentile). Gaps shorter than
+    `min_pause_seconds` are treated as part of the speech around them.
+
+    Returns:
+        np.ndarray: An (N, 2) array of [start, end] times in seconds.
+    """
+    if len(energy_db) == 0:
+        return np.zeros((0, 2))
+    noise_floor, speech_level = np.percentile(energy_db, [10, 95])
+    is_speech = energy_db > noise_floor + (speech_level - noise_floor) / 3
+
+    # Indices where speech switches on and off
+    edges = np.diff(np.concatenate(([0], is_speech.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if len(starts) == 0:
+        return np.array([[0.0, len(energy_db) * frame_seconds]])
+
+    # Merge regions separated by gaps too short to be pauses
+    min_pause_frames = int(round(min_pause_seconds / frame_seconds))
+    keep_gap = (starts[1:] - ends[:-1]) >= min_pause_frames
+    merged_starts = np.concatenate(([starts[0]], starts[1:][keep_gap]))
+    merged_ends = np.concatenate((ends[:-1][keep_gap], [ends[-1]]))
+    return np.stack((merged_starts, merged_ends), axis=1) * frame_seconds
+
+def _split_sentences(script_text):
+    return [sentence for sentence in re.split(r'(?<=[.!?])\s+', script_text.strip()) if sentence]
+
+def _to_real_time(speech_times, regions, cumulative_starts, at_start):
+    """
+    Maps positions on the speech-only timeline (pauses removed) back to audio time. A position
+    that falls exactly between two regions maps to the start of the next region when it is the
+    start of a word (`at_start`), and to the end of the previous region otherwise.
+    """
+    side = 'right' if at_start else 'left'
+    index = np.clip(np.searchsorted(cumulative_starts, speech_times, side=side) - 1, 0, len(regions) - 1)
+    return regions[index, 0] + (speech_times - cumulative_starts[index])
+
+def align_captions_to_samples(script_text, samples, sample_rate=SAMPLE_RATE, words_per_block=5):
+    """
+    Times caption blocks against decoded audio.
+
+    Words are laid out over the detected speech in proportion to their length, so pauses
+    get no words. Sentence boundaries are then snapped to the nearest pause, and caption
+    blocks never run across a sentence boundary.
+
+    Returns:
+        list: (start_seconds, end_seconds, text) tuples, as video_editor.build_caption_blocks returns.
+    """
+    regions = detect_speech_regions(frame_energy(samples, sample_rate))
+    durations = regions[:, 1] - regions[:, 0]
+    cumulative_starts = np.concatenate(([0.0], np.cumsum(durations)[:-1]))
+    speech_total = durations.sum()
+    # Pauses sit where one region ends and the next starts on the speech timeline
+    pause_positions = cumulative_starts[1:]
+
+    sentences = [sentence.split() for sentence in _split_sentences(script_text)]
+    sentence_weights = np.array([sum(len(word) + 1 for word in words) for words in sentences], dtype=float)
+    boundaries = np.concatenate(([0.0], np.cumsum(sentence_weights))) / sentence_weights.sum() * speech_total
+
+    # Snap interior sentence boundaries to pauses
+    if len(pause_positions):
+        for k in range(1, len(boundaries) - 1):
+            nearest = pause_positions[np.argmin(np.abs(pause_positions - boundaries[k]))]
+            if abs(nearest - boundaries[k]) <= MAX_SNAP_SECONDS and boundaries[k - 1] < nearest < boundaries[k + 1]:
+                boundaries[k] = nearest
+
+    caption_blocks = []
+    for words, sentence_start, sentence_end in zip(sentences, boundaries[:-1], boundaries[1:]):
+        word_weights = np.array([len(word) + 1 for word in words], dtype=float)
+        word_edges = sentence_start + np.concatenate(([0.0], np.cumsum(word_weights))) / word_weights.sum() * (sentence_end - sentence_start)
+
+        block_edges = list(range(0, len(words), words_per_block)) + [len(words)]
+        block_starts = _to_real_time(word_edges[block_edges[:-1]], regions, cumulative_starts, at_start=True)
+        block_ends = _to_real_time(word_edges[block_edges[1:]], regions, cumulative_starts, at_start=False)
+        for i, (start, end) in enumerate(zip(block_starts, block_ends)):
+            caption_blocks.append((float(start), float(end), " ".join(words[block_edges[i]:block_edges[i + 1]])))
+    return caption_blocks
+
+def align_captions(script_text, audio_path, words_per_block=5):
+    """
+    Decodes `audio_path` once and times the script's caption blocks against its speech.
+    """
+    return align_captions_to_samples(script_text, decode_audio(audio_path), words_per_block=words_per_block)
+
+def align_captions_with_anchors(anchors, audio_path, words_per_block=5):
+    """
+    Times caption blocks when the start and end of every chunk of the script are known
+    exactly, as with a chunked voiceover (see elevenlabs_api.generate_voiceover_chunked).
+    Each chunk is aligned on its own slice of the audio, so errors cannot drift across chunks.
+
+    Args:
+        anchors (list): (start_seconds, end_seconds, text) for every chunk, in order.
+    """
+    samples = decode_audio(audio_path)
+    caption_blocks = []
+    for start, end, text in anchors:
+        chunk_samples = samples[int(round(start * SAMPLE_RATE)):int(round(end * SAMPLE_RATE))]
+        for block_start, block_end, block_text in align_captions_to_samples(
+                text, chunk_samples, words_per_block=words_per_block):
+            caption_blocks.append((start + block_start, start + block_end, block_text))
+    return caption_blocks
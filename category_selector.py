@@ -1,54 +1,298 @@
 # category_selector.py
 import os
+import re
 import json
-from openai import OpenAI
-from dotenv import load_dotenv
+import zlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-load_dotenv()
+import resilience
+from clients import get_openai_client
+from tracing import span
 
-def get_category_id_from_prompt(prompt):
+# List of available YouTube category IDs and their names
+# This is crucial for the model to pick a valid category
+YOUTUBE_CATEGORIES = {
+    '23': 'Comedy', '24': 'Entertainment', '22': 'People & Blogs',
+    '10': 'Music', '17': 'Sports', '20': 'Gaming',
+    '28': 'Science & Technology', '26': 'Howto & Style',
+    '27': 'Education', '1': 'Film & Animation',
+    '15': 'Pets & Animals', '25': 'News & Politics',
+    '2': 'Autos & Vehicles', '19': 'Travel & Events'
+}
+
+# What videos in each category are about; the local classifier starts from these and learns
+# from every prompt the LLM labels
+CATEGORY_DESCRIPTIONS = {
+    '23': "comedy funny hilarious jokes joke prank pranks sketch parody meme memes fails bloopers laugh "
+          "stand up comedian roast satire silly awkward",
+    '24': "entertainment celebrity celebrities gossip reality show tv challenge reaction viral trend "
+          "trending drama influencer red carpet awards hollywood",
+    '22': "vlog daily life day in my life personal story storytime family relationship friends "
+          "lifestyle routine morning routine confession motivation",
+    '10': "music song songs singer singing cover band concert album guitar piano drums playing an instrument "
+          "rap hip hop beat remix lyrics orchestra dance music video",
+    '17': "sports football soccer basketball baseball tennis golf athlete workout fitness gym running "
+          "match game highlights goal olympics boxing training skateboarding surfing",
+    '20': "gaming video game games gameplay gamer minecraft fortnite console playstation xbox nintendo "
+          "esports speedrun walkthrough streamer let's play level boss",
+    '28': "science technology tech gadget gadgets smartphone phone computer ai artificial intelligence robot "
+          "robots space rocket nasa experiment physics chemistry engineering software coding innovation",
+    '26': "how to tutorial diy craft crafts makeup beauty fashion style outfit hair skincare cooking recipe "
+          "recipes kitchen home decor cleaning hacks life hacks tips",
+    '27': "education learn learning lesson explained explainer history facts teach teacher study "
+          "students math language course lecture documentary knowledge why how does",
+    '1': "film animation movie movies cartoon animated short film trailer cinema director scene "
+         "visual effects stop motion anime pixar",
+    '15': "pets animals animal dog dogs puppy puppies cat cats kitten kittens bird birds wildlife zoo "
+          "horse fish cute paws nature wild",
+    '25': "news politics political election government president policy economy breaking news report "
+          "world events protest law debate war",
+    '2': "cars car vehicle vehicles auto automotive truck trucks motorcycle racing engine supercar "
+         "electric car road test drive review tesla",
+    '19': "travel trip vacation tour tourism destination city beach mountains hiking adventure festival "
+          "event events hotel flight backpacking road trip explore",
+}
+
+# Past prompts labeled by the LLM, one JSON object per line; they are added to the local model
+CATEGORY_EXAMPLES_PATH = os.getenv(
+    'CATEGORY_EXAMPLES_PATH',
+    os.path.join(os.path.expanduser('~'), '.cache', 'viral_video_maker', 'category_examples.jsonl')
+)
+
+# The local answer is used when the best category beats the runner-up by at least this much
+# cosine similarity; closer calls go to the LLM
+CONFIDENCE_THRESHOLD = 0.05
+
+# A new label is folded into its category's centroid at once, weighted with the IDF of the last
+# build; the whole model is rebuilt, refreshing the IDF, only after this many new labels
+REBUILD_EVERY = int(os.getenv('CATEGORY_REBUILD_EVERY', 50))
+
+# Features are hashed into this many columns, so the model needs no vocabulary
+HASHED_FEATURES = 2 ** 16
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+STOP_WORDS = frozenset(
+    "a an the and or of to in on at for with about from by is are was be my your our their his her its "
+    "this that these those it i we you they me video videos make making want show some".split()
+)
+
+def _features(text):
+    """
+    Returns the features of `text`: its words, their singular forms, word pairs and word stems.
+    """
+    words = [word for word in TOKEN_PATTERN.findall(text.lower()) if word not in STOP_WORDS]
+    features = list(words)
+    features += [word[:-1] for word in words if len(word) > 3 and word.endswith('s')]
+    # A short prefix ties 'cooking' to 'cook' and 'puppies' to 'puppy'
+    features += [f"{word[:5]}*" for word in words if len(word) > 5]
+    features += [f"{first} {second}" for first, second in zip(words, words[1:])]
+    return features
+
+def _hashed_counts(text):
+    # crc32 rather than hash(), which changes between processes
+    counts = {}
+    for feature in _features(text):
+        column = zlib.crc32(feature.encode('utf-8')) % HASHED_FEATURES
+        counts[column] = counts.get(column, 0) + 1
+    return counts
+
+class CategoryClassifier:
+    """
+    Picks a YouTube category for a prompt locally, in a few microseconds.
+
+    Prompts are turned into hashed TF-IDF vectors, and each category is the normalized
+    centroid of its documents: its description plus every labeled prompt. The score of a
+    category is the cosine similarity of the prompt with its centroid.
+    """
+
+    def __init__(self, descriptions=CATEGORY_DESCRIPTIONS, examples=()):
+        """
+        Args:
+            descriptions (dict): Category ID -> text describing the category.
+            examples (iterable): (prompt, category ID) pairs labeled earlier.
+        """
+        import numpy as np
+
+        self.category_ids = list(descriptions)
+        rows = {category_id: row for row, category_id in enumerate(self.category_ids)}
+        documents = [(text, rows[category_id]) for category_id, text in descriptions.items()]
+        documents += [(prompt, rows[category_id]) for prompt, category_id in examples if category_id in rows]
+
+        counts = [_hashed_counts(text) for text, _ in documents]
+        document_frequency = np.zeros(HASHED_FEATURES, dtype=np.float32)
+        for document in counts:
+            document_frequency[list(document)] += 1
+        self.idf = (np.log((1 + len(documents)) / (1 + document_frequency)) + 1).astype(np.float32)
+
+        # One column per category, summed over its documents' unit vectors and then normalized;
+        # the sums are kept for add_example()
+        self._rows = rows
+        self._sums = np.zeros((HASHED_FEATURES, len(self.category_ids)), dtype=np.float32)
+        for document, (_, row) in zip(counts, documents):
+            columns, weights = self._weights(document)
+            self._sums[columns, row] += weights
+        norms = np.linalg.norm(self._sums, axis=0)
+        self.centroids = self._sums / np.where(norms > 0, norms, 1)
+
+    def add_example(self, prompt, category_id):
+        """
+        Adds a labeled prompt to its category's centroid, weighted with the current IDF. Only
+        that category's column is recomputed, so this costs the same whatever the corpus size.
+        """
+        import numpy as np
+
+        row = self._rows.get(category_id)
+        counts = _hashed_counts(prompt)
+        if row is None or not counts:
+            return
+        columns, weights = self._weights(counts)
+        self._sums[columns, row] += weights
+        norm = np.linalg.norm(self._sums[:, row])
+        self.centroids[:, row] = self._sums[:, row] / (norm if norm > 0 else 1)
+
+    def _weights(self, counts):
+        # Sublinear TF times IDF, as a unit vector over the document's columns
+        import numpy as np
+
+        columns = np.fromiter(counts, dtype=np.int64, count=len(counts))
+        weights = (1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))) * self.idf[columns]
+        norm = np.linalg.norm(weights)
+        return columns, weights / norm if norm > 0 else weights
+
+    def _scores(self, prompts):
+        # Similarity of every prompt with every category, from the prompts' non-zero columns only
+        import numpy as np
+
+        prompt_rows, columns, weights = [], [], []
+        for row, prompt in enumerate(prompts):
+            counts = _hashed_counts(prompt)
+            if counts:
+                prompt_columns, prompt_weights = self._weights(counts)
+                prompt_rows.append(np.full(len(prompt_columns), row))
+                columns.append(prompt_columns)
+                weights.append(prompt_weights)
+
+        scores = np.zeros((len(prompts), len(self.category_ids)), dtype=np.float32)
+        if columns:
+            columns = np.concatenate(columns)
+            np.add.at(scores, np.concatenate(prompt_rows), self.centroids[columns] * np.concatenate(weights)[:, None])
+        return scores
+
+    def classify_many(self, prompts):
+        """
+        Classifies every prompt in one vectorized pass.
+
+        Returns:
+            list: A (category ID, confidence) pair per prompt. The confidence is how much more
+            similar the prompt is to that category than to the runner-up (0 when nothing matched).
+        """
+        import numpy as np
+
+        if not prompts:
+            return []
+        scores = self._scores(prompts)
+        best_two = np.sort(scores, axis=1)[:, -2:]
+        best = np.argmax(scores, axis=1)
+        confidence = best_two[:, 1] - best_two[:, 0]
+        return [(self.category_ids[row], float(margin)) for row, margin in zip(best, confidence)]
+
+    def classify(self, prompt):
+        """
+        Returns the (category ID, confidence) pair for one prompt.
+        """
+        return self.classify_many([prompt])[0]
+
+_classifier = None
+_examples = []
+_added_since_build = 0
+_classifier_lock = threading.Lock()
+
+def _load_examples():
+    examples = []
+    if os.path.exists(CATEGORY_EXAMPLES_PATH):
+        with open(CATEGORY_EXAMPLES_PATH) as f:
+            for line in f:
+                try:
+                    example = json.loads(line)
+                    examples.append((example['prompt'], example['category_id']))
+                except (ValueError, KeyError):
+                    continue
+    return examples
+
+def get_classifier():
+    """
+    Returns the shared local classifier, trained on the category descriptions and every
+    prompt in CATEGORY_EXAMPLES_PATH. It is rebuilt once REBUILD_EVERY new examples were added.
+    """
+    global _classifier, _examples, _added_since_build
+    with _classifier_lock:
+        if _classifier is None:
+            if not _examples:
+                _examples = _load_examples()
+            _classifier = CategoryClassifier(examples=_examples)
+            _added_since_build = 0
+        return _classifier
+
+def add_labeled_prompt(prompt, category_id):
+    """
+    Remembers a labeled prompt, so the local classifier answers similar prompts itself from now on.
+    """
+    global _classifier, _added_since_build
+    with _classifier_lock:
+        if not _examples:
+            _examples.extend(_load_examples())
+        _examples.append((prompt, category_id))
+        if _classifier is not None:
+            _added_since_build += 1
+            if _added_since_build >= REBUILD_EVERY:
+                # Rebuilt on next use, with IDF weights that include the new examples
+                _classifier = None
+            else:
+                _classifier.add_example(prompt, category_id)
+        try:
+            os.makedirs(os.path.dirname(CATEGORY_EXAMPLES_PATH), exist_ok=True)
+            with open(CATEGORY_EXAMPLES_PATH, 'a') as f:
+                f.write(json.dumps({'prompt': prompt, 'category_id': category_id}) + "\n")
+        except OSError as e:
+            print(f"Could not save the labeled prompt to {CATEGORY_EXAMPLES_PATH}: {e}")
+
+def _ask_openai_for_category(prompt):
     """
     Uses OpenAI to determine the most relevant YouTube category ID from a user's prompt.
     """
-    client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-
-    # List of available YouTube category IDs and their names
-    # This is crucial for the model to pick a valid category
-    youtube_categories = {
-        '23': 'Comedy', '24': 'Entertainment', '22': 'People & Blogs',
-        '10': 'Music', '17': 'Sports', '20': 'Gaming',
-        '28': 'Science & Technology', '26': 'Howto & Style',
-        '27': 'Education', '1': 'Film & Animation',
-        '15': 'Pets & Animals', '25': 'News & Politics',
-        '2': 'Autos & Vehicles', '19': 'Travel & Events'
-    }
+    client = get_openai_client()
 
     # The prompt instructs the model to return a single category ID
     prompt_for_category = f"""
     Based on the following user prompt, identify the most relevant YouTube video category ID from the list provided.
-    
+
     Prompt: "{prompt}"
-    
+
     Available Categories and IDs:
-    {json.dumps(youtube_categories, indent=2)}
-    
+    {json.dumps(YOUTUBE_CATEGORIES, indent=2)}
+
     Your response should be a single string containing only the category ID. Do not include any other text or explanation.
     """
-    
+
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are an assistant that identifies the best YouTube category ID for a given topic."},
-                {"role": "user", "content": prompt_for_category}
-            ]
-        )
-        
+        with span('openai.category', model="gpt-4o-mini") as current:
+            response = resilience.call(
+                'openai', client.chat.completions.create,
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": "You are an assistant that identifies the best YouTube category ID for a given topic."},
+                    {"role": "user", "content": prompt_for_category}
+                ],
+                trace=current
+            )
+
         category_id = response.choices[0].message.content.strip()
 
         # Simple validation to make sure the ID is in our list
-        if category_id in youtube_categories:
-            print(f"OpenAI selected category: '{youtube_categories[category_id]}' (ID: {category_id})")
+        if category_id in YOUTUBE_CATEGORIES:
+            print(f"OpenAI selected category: '{YOUTUBE_CATEGORIES[category_id]}' (ID: {category_id})")
+            add_labeled_prompt(prompt, category_id)
             return category_id
         else:
             print(f"OpenAI returned an invalid category ID: {category_id}")
@@ -58,9 +302,48 @@ def get_category_id_from_prompt(prompt):
         print(f"An error occurred with the OpenAI API: {e}")
         return None
 
+def get_category_id_from_prompt(prompt, min_confidence=CONFIDENCE_THRESHOLD):
+    """
+    Determines the most relevant YouTube category ID for a user's prompt.
+
+    The local classifier answers when it is confident enough; otherwise OpenAI is asked, and
+    its answer is remembered as a labeled example for the local classifier.
+
+    Args:
+        prompt (str): The user's prompt.
+        min_confidence (float): The lowest local confidence that is trusted. 0 never asks
+            OpenAI; anything above 1 always does.
+    """
+    return get_category_ids_from_prompts([prompt], min_confidence=min_confidence)[0]
+
+def get_category_ids_from_prompts(prompts, min_confidence=CONFIDENCE_THRESHOLD, max_workers=4):
+    """
+    Determines the YouTube category ID of many prompts at once, e.g. for a batch run. They are
+    classified locally in one pass, and the uncertain ones are sent to OpenAI in parallel.
+
+    Returns:
+        list: The category ID of each prompt, in order (None where OpenAI failed too).
+    """
+    with span('category.classify', prompts=len(prompts)) as current:
+        results = get_classifier().classify_many(prompts)
+        category_ids = [category_id if confidence >= min_confidence else None for category_id, confidence in results]
+        current.set(fallbacks=category_ids.count(None))
+
+    for category_id, confidence in results:
+        if confidence >= min_confidence:
+            print(f"Local classifier selected category: '{YOUTUBE_CATEGORIES[category_id]}' "
+                  f"(ID: {category_id}, confidence {confidence:.2f})")
+
+    uncertain = [index for index, category_id in enumerate(category_ids) if category_id is None]
+    if uncertain:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(uncertain))) as pool:
+            for index, category_id in zip(uncertain, pool.map(_ask_openai_for_category, [prompts[k] for k in uncertain])):
+                category_ids[index] = category_id
+    return category_ids
+
 if __name__ == '__main__':
     # Test the function
     test_prompt = "A video about a cat playing the piano"
     cat_id = get_category_id_from_prompt(test_prompt)
     if cat_id:
-        print(f"The recommended category ID is: {cat_id}")
\ No newline at end of file
+        print(f"The recommended category ID is: {cat_id}")
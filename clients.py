@@ -0,0 +1,175 @@
+# clients.py
+import os
+import json
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# The YouTube discovery document is fetched once and kept here, so later builds skip the network
+DISCOVERY_CACHE_PATH = os.getenv(
+    'YOUTUBE_DISCOVERY_CACHE',
+    os.path.join(os.path.expanduser('~'), '.cache', 'viral_video_maker', 'youtube_v3_discovery.json')
+)
+
+# resilience.call() retries within each provider's rate limit, so the SDKs must not retry too. The
+# ElevenLabs SDK can only be told so per request: every ElevenLabs call passes these options
+ELEVENLABS_REQUEST_OPTIONS = {'max_retries': 0}
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+# googleapiclient services wrap an httplib2.Http, which must not be shared between threads
+_thread_local = threading.local()
+_discovery_document = None
+_discovery_lock = threading.Lock()
+
+def _get_or_create(name, factory):
+    """
+    Returns the client registered under `name`, building it with `factory` on first use.
+    """
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = factory()
+                _clients[name] = client
+    return client
+
+def _base_url_option(variable):
+    """
+    Returns the base_url option from the environment variable `variable`, if it is set. Each client
+    talks to the real API unless it is, e.g. to the local stand-ins in stub_servers.py.
+    """
+    base_url = os.getenv(variable)
+    return {'base_url': base_url} if base_url else {}
+
+def get_openai_client():
+    """
+    Returns the shared OpenAI client, with its own retries turned off. Its HTTP connection pool
+    is reused by every call and thread.
+    """
+    def build():
+        from openai import OpenAI
+        return OpenAI(api_key=os.getenv('OPENAI_API_KEY'), max_retries=0, **_base_url_option('OPENAI_BASE_URL'))
+    return _get_or_create('openai', build)
+
+def get_elevenlabs_client():
+    """
+    Returns the shared ElevenLabs client, or None if ELEVENLABS_API_KEY is not set. Its calls
+    must pass request_options=ELEVENLABS_REQUEST_OPTIONS to turn off the SDK's retries.
+    """
+    api_key = os.getenv('ELEVENLABS_API_KEY')
+    if not api_key:
+        return None
+
+    def build():
+        from elevenlabs.client import ElevenLabs
+        return ElevenLabs(api_key=api_key, **_base_url_option('ELEVENLABS_BASE_URL'))
+    return _get_or_create('elevenlabs', build)
+
+def get_runway_client():
+    """
+    Returns the shared Runway ML client, with its own retries turned off, or None if
+    RUNWAYML_API_SECRET is not set.
+    """
+    api_key = os.getenv('RUNWAYML_API_SECRET')
+    if not api_key:
+        return None
+
+    def build():
+        from runwayml import RunwayML
+        return RunwayML(api_key=api_key, max_retries=0, **_base_url_option('RUNWAYML_BASE_URL'))
+    return _get_or_create('runway', build)
+
+def _load_discovery_document(api_key):
+    """
+    Returns the YouTube Data API v3 discovery document, reading it from the disk cache or,
+    the first time, fetching it with build() and saving it for later runs.
+
+    With YOUTUBE_API_URL set, the document is fetched from that API instead and not cached,
+    since it points every request at that API.
+    """
+    global _discovery_document
+    with _discovery_lock:
+        if _discovery_document is not None:
+            return _discovery_document
+
+        api_url = os.getenv('YOUTUBE_API_URL')
+        if api_url:
+            import requests
+            response = requests.get(f"{api_url.rstrip('/')}/discovery/v1/apis/youtube/v3/rest", timeout=10)
+            response.raise_for_status()
+            _discovery_document = response.json()
+            return _discovery_document
+
+        if os.path.exists(DISCOVERY_CACHE_PATH):
+            with open(DISCOVERY_CACHE_PATH) as f:
+                _discovery_document = json.load(f)
+            return _discovery_document
+
+        from googleapiclient.discovery import build
+        service = build('youtube', 'v3', developerKey=api_key, cache_discovery=False)
+        _discovery_document = service._rootDesc
+
+        os.makedirs(os.path.dirname(DISCOVERY_CACHE_PATH), exist_ok=True)
+        tmp_path = f"{DISCOVERY_CACHE_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(_discovery_document, f)
+        os.replace(tmp_path, DISCOVERY_CACHE_PATH)
+        return _discovery_document
+
+def get_youtube_client(api_key):
+    """
+    Returns a YouTube Data API v3 service for `api_key`.
+
+    Services are built from the cached discovery document and kept per thread, because the
+    httplib2 connection underneath them is not thread-safe.
+    """
+    services = getattr(_thread_local, 'youtube_services', None)
+    if services is None:
+        services = _thread_local.youtube_services = {}
+
+    service = services.get(api_key)
+    if service is None:
+        from googleapiclient.discovery import build_from_document
+        service = build_from_document(_load_discovery_document(api_key), developerKey=api_key)
+        services[api_key] = service
+    return service
+
+def get_s3_client():
+    """
+    Returns the shared boto3 S3 client, configured from the AWS_* environment variables.
+    With S3_ENDPOINT_URL set, it talks to that S3-compatible service with path-style URLs.
+
+    Its connection pool holds S3_MAX_POOL_CONNECTIONS connections, enough for several
+    multipart uploads with all their parts in flight.
+    """
+    def build():
+        import boto3
+        from botocore.config import Config
+
+        endpoint_url = os.getenv('S3_ENDPOINT_URL')
+        config = Config(
+            max_pool_connections=int(os.getenv('S3_MAX_POOL_CONNECTIONS', 50)),
+            s3={'addressing_style': 'path'} if endpoint_url else None
+        )
+        return boto3.client(
+            's3',
+            region_name=os.getenv('AWS_REGION'),
+            aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+            aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+            endpoint_url=endpoint_url,
+            config=config
+        )
+    return _get_or_create('s3', build)
+
+def get_twelvelabs_client():
+    """
+    Returns the shared Twelve Labs client.
+    """
+    def build():
+        from twelvelabs import TwelveLabs
+        return TwelveLabs(api_key=os.getenv('TWELVE_LABS_API_KEY'))
+    return _get_or_create('twelvelabs', build)
@@ -0,0 +1,248 @@
+# clip_library.py
+import os
+import re
+import json
+import time
+import zlib
+import threading
+from array import array
+
+from asset_cache import CACHE_DIR
+
+# Every generated clip's prompt is recorded here, next to the asset cache that holds the clip itself
+CLIP_LIBRARY_PATH = os.getenv('CLIP_LIBRARY_PATH', os.path.join(os.path.dirname(CACHE_DIR), 'clip_library.jsonl'))
+
+# A clip is reused for a new prompt whose cosine similarity to the clip's prompt is at least this.
+# Close paraphrases score 0.85 and up, while prompts that share their setting but not their subject
+# ("people celebrating in slow motion" / "people running in slow motion") reach about 0.75
+SIMILARITY_THRESHOLD = float(os.getenv('CLIP_LIBRARY_THRESHOLD', 0.8))
+
+# Prompts are turned into vectors of hashed features: each word, weighted 1, and the character
+# trigrams of each word, weighted CHAR_NGRAM_WEIGHT, which also match other forms of a word
+# (plating / plates, colorful / colourful). Features are hashed into 2 ** FEATURE_BITS buckets
+FEATURE_BITS = 20
+CHAR_NGRAM_WEIGHT = 0.25
+
+# Words that say nothing about what a clip shows
+STOP_WORDS = frozenset("""
+    a an the of with in on at to and or for from by over under into onto as its it is are this that
+    shot video clip footage scene
+""".split())
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+def prompt_words(prompt):
+    """
+    Returns the words of a prompt that describe its content: lowercased, without stop words and
+    possessives, and with a plural 's' taken off.
+    """
+    words = []
+    for word in _WORD_PATTERN.findall(prompt.lower().replace("'s", "")):
+        if word in STOP_WORDS:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        words.append(word)
+    return words
+
+def prompt_features(prompt):
+    """
+    Returns the hashed n-gram vector of a prompt, normalized to unit length.
+
+    Returns:
+        dict: Feature bucket -> weight, for the buckets that are not zero.
+    """
+    mask = (1 << FEATURE_BITS) - 1
+    features = {}
+    for word in prompt_words(prompt):
+        feature = zlib.crc32(b'w:' + word.encode()) & mask
+        features[feature] = features.get(feature, 0.0) + 1.0
+        padded = f"<{word}>".encode()
+        for i in range(len(padded) - 2):
+            feature = zlib.crc32(b'c:' + padded[i:i + 3]) & mask
+            features[feature] = features.get(feature, 0.0) + CHAR_NGRAM_WEIGHT
+
+    norm = sum(weight * weight for weight in features.values()) ** 0.5
+    return {feature: weight / norm for feature, weight in features.items()} if norm else {}
+
+def prompt_similarity(prompt_a, prompt_b):
+    """
+    Returns the cosine similarity of two prompts' vectors, from 0 to 1.
+    """
+    features_a, features_b = prompt_features(prompt_a), prompt_features(prompt_b)
+    return sum(weight * features_b.get(feature, 0.0) for feature, weight in features_a.items())
+
+class ClipLibrary:
+    """
+    The prompts of every clip generated so far, searchable by similarity, so that a clip can be
+    reused for a prompt that only rephrases an earlier one.
+
+    Entries are appended to a JSON Lines file that every run and process shares, and each call
+    first reads the lines other processes have added since. The clips themselves stay in the asset
+    cache under their cache keys; an entry whose clip was evicted is removed with remove().
+
+    Lookups go through an inverted index from each feature to the entries that have it, with
+    their weights, so only the entries that share a word or a trigram with the prompt are scored,
+    in one NumPy pass. Thread-safe.
+    """
+
+    def __init__(self, path=CLIP_LIBRARY_PATH, threshold=SIMILARITY_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self._entries = []  # entry id -> {'prompt', 'key', 'settings'}, or None once removed
+        self._ids = {}  # cache key -> entry id
+        self._settings = array('i')  # entry id -> settings code, -1 once removed
+        self._settings_codes = {}  # settings -> settings code
+        self._postings = {}  # feature -> (array of entry ids, array of their weights)
+        self._offset = 0  # bytes of the file read so far
+
+    def __len__(self):
+        with self._lock:
+            self._sync()
+            return len(self._ids)
+
+    def _index(self, record):
+        entry_id = len(self._entries)
+        self._entries.append({'prompt': record['prompt'], 'key': record['key'], 'settings': record['settings']})
+        self._ids[record['key']] = entry_id
+        self._settings.append(self._settings_codes.setdefault(record['settings'], len(self._settings_codes)))
+        for feature, weight in prompt_features(record['prompt']).items():
+            posting = self._postings.get(feature)
+            if posting is None:
+                posting = self._postings[feature] = (array('i'), array('f'))
+            posting[0].append(entry_id)
+            posting[1].append(weight)
+
+    def _unindex(self, key):
+        entry_id = self._ids.pop(key)
+        self._entries[entry_id] = None
+        # Its postings stay; the settings code keeps it from ever matching
+        self._settings[entry_id] = -1
+
+    def _apply(self, record):
+        if record.get('removed'):
+            if record['key'] in self._ids:
+                self._unindex(record['key'])
+        elif record['key'] not in self._ids:
+            self._index(record)
+
+    def _sync(self):
+        """
+        Reads the lines added to the file since the last call, by this process or another.
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size < self._offset:
+                    # The file was replaced; start over from it
+                    self._clear()
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+
+        # A line another process is still writing is read on the next call
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            try:
+                self._apply(json.loads(line))
+            except (ValueError, KeyError):
+                continue
+        self._offset += end
+
+    def _append(self, record):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # One short write in append mode, so lines from several processes do not interleave
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def add(self, prompt, key, settings=''):
+        """
+        Records a generated clip.
+
+        Args:
+            prompt (str): The prompt the clip was generated from.
+            key (str): The clip's asset cache key.
+            settings (str): Everything else the clip was generated with (model, duration, ...).
+                Clips are only reused for the same settings.
+
+        Returns:
+            bool: False if the library already had this clip.
+        """
+        with self._lock:
+            self._sync()
+            if key in self._ids:
+                return False
+            record = {'prompt': prompt, 'key': key, 'settings': settings, 'added': time.time()}
+            self._append(record)
+            self._index(record)
+            return True
+
+    def remove(self, key):
+        """
+        Forgets a clip, e.g. one that is no longer in the asset cache.
+        """
+        with self._lock:
+            self._sync()
+            if key in self._ids:
+                self._append({'key': key, 'removed': True})
+                self._unindex(key)
+
+    def find(self, prompt, settings='', exclude=(), limit=5):
+        """
+        Looks up the clips whose prompts are at least `threshold` similar to `prompt`.
+
+        Args:
+            prompt (str): The prompt a clip is needed for.
+            settings (str): The generation settings the clip must have been made with.
+            exclude (collection): Cache keys not to return, e.g. of clips already in the video.
+            limit (int): The maximum number of matches returned.
+
+        Returns:
+            list: Dicts with the 'prompt', 'key', 'settings' and 'similarity' of each match, best first.
+        """
+        import numpy as np
+
+        features = prompt_features(prompt)
+        with self._lock:
+            self._sync()
+            code = self._settings_codes.get(settings)
+            postings = [(self._postings[feature], weight) for feature, weight in features.items()
+                        if feature in self._postings]
+            if code is None or not postings:
+                return []
+
+            entry_ids = np.concatenate([np.array(ids, dtype=np.int32) for (ids, _), _ in postings])
+            weights = np.concatenate([np.array(weights, dtype=np.float32) * weight
+                                      for (_, weights), weight in postings])
+            # Dot products with every entry that shares a feature; the rest score 0
+            scores = np.bincount(entry_ids, weights=weights, minlength=len(self._entries))
+            scores[np.array(self._settings, dtype=np.int32) != code] = 0.0
+
+            candidates = np.flatnonzero(scores >= self.threshold - 1e-6)
+            matches = []
+            for entry_id in candidates[np.argsort(-scores[candidates], kind='stable')]:
+                entry = self._entries[entry_id]
+                if entry['key'] in exclude:
+                    continue
+                matches.append({**entry, 'similarity': min(1.0, float(scores[entry_id]))})
+                if len(matches) >= limit:
+                    break
+            return matches
+
+_libraries = {}
+_libraries_lock = threading.Lock()
+
+def get_clip_library(path=None):
+    """
+    Returns the shared ClipLibrary of the file at `path` (CLIP_LIBRARY_PATH by default).
+    """
+    path = os.path.abspath(path or CLIP_LIBRARY_PATH)
+    with _libraries_lock:
+        library = _libraries.get(path)
+        if library is None:
+            library = _libraries[path] = ClipLibrary(path)
+        return library
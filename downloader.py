@@ -0,0 +1,217 @@
+# downloader.py
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from tracing import start_span
+
+# Size of the pieces written to disk while streaming a download
+CHUNK_SIZE = 1024 * 1024
+
+# HTTP statuses worth retrying; anything else in the 4xx/5xx range fails straight away
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session(pool_size=10):
+    """
+    Returns the process-wide requests.Session, creating it on first use.
+    The session keeps up to `pool_size` connections per host alive so that
+    consecutive and parallel downloads reuse them instead of reconnecting.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+def _content_range(response):
+    """
+    Returns the (first byte, total size) of a response's Content-Range header, e.g. (0, 100) for
+    "bytes 0-49/100" and (None, 100) for "bytes */100". Either is None if it is missing or unknown.
+    """
+    unit, _, spec = response.headers.get("Content-Range", "").partition(" ")
+    byte_range, _, total = spec.partition("/")
+    if unit != "bytes":
+        return None, None
+    first = byte_range.partition("-")[0]
+    return (int(first) if first.isdigit() else None), (int(total) if total.isdigit() else None)
+
+def _validator(response):
+    """
+    Returns what identifies the version of a resource in a response: its ETag, or its Last-Modified date.
+    """
+    return response.headers.get("ETag") or response.headers.get("Last-Modified")
+
+def _read_part_info(info_path):
+    try:
+        with open(info_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _discard_partial(partial_path, info_path):
+    for path in (partial_path, info_path):
+        if os.path.exists(path):
+            os.remove(path)
+
+def download_file(url, file_path, session=None, chunk_size=CHUNK_SIZE, max_retries=3, backoff=1.0):
+    """
+    Streams a URL to disk in fixed-size chunks.
+
+    The data is written to `<file_path>.part` and moved into place once complete.
+    If a partial file is left over from an earlier attempt, the download resumes
+    from where it stopped with an HTTP Range request. The URL and the resource's
+    ETag (or Last-Modified date) are kept in `<file_path>.part.json`, and a partial
+    file is only resumed if both still match; otherwise it is downloaded again.
+
+    Args:
+        url (str): The URL to download.
+        file_path (str): Where to save the file.
+        session (requests.Session): The session to use. Defaults to the shared pooled session.
+        chunk_size (int): Number of bytes written per chunk.
+        max_retries (int): How many times to retry after a network error or a retryable status.
+        backoff (float): Base delay in seconds; it doubles after every failed attempt.
+
+    Returns:
+        dict: 'path', 'bytes', 'seconds' and 'throughput' (bytes per second), or None if it fails.
+    """
+    session = session or get_session()
+    partial_path = f"{file_path}.part"
+    info_path = f"{partial_path}.json"
+    bytes_downloaded = 0
+    start_time = time.perf_counter()
+    trace = start_span('download', file=os.path.basename(file_path))
+
+    for attempt in range(max_retries + 1):
+        if attempt:
+            trace.add('retries')
+            time.sleep(backoff * 2 ** (attempt - 1))
+
+        info = _read_part_info(info_path) if os.path.exists(partial_path) else None
+        if os.path.exists(partial_path) and (info is None or info.get("url") != url):
+            # Left over from another URL, or from a version we cannot tell
+            _discard_partial(partial_path, info_path)
+            info = None
+        offset = os.path.getsize(partial_path) if info else 0
+        headers = {}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            if info.get("validator"):
+                # The server sends the whole resource instead if it changed since
+                headers["If-Range"] = info["validator"]
+
+        try:
+            with session.get(url, stream=True, headers=headers, timeout=(10, 60)) as response:
+                if response.status_code == 416 and offset:
+                    if _content_range(response)[1] != offset:
+                        print(f"  - Partial download of {url} does not match the resource, starting over...")
+                        _discard_partial(partial_path, info_path)
+                        continue
+                    # The partial file already holds the whole resource
+                elif response.status_code in (200, 206):
+                    if response.status_code == 206:
+                        validator = _validator(response)
+                        if (_content_range(response)[0] != offset
+                                or (validator and info.get("validator") and validator != info["validator"])):
+                            print(f"  - Resumed download of {url} does not continue the partial file, starting over...")
+                            _discard_partial(partial_path, info_path)
+                            continue
+                        mode = "ab"
+                    else:
+                        # A 200 means the server ignored the Range header or the resource changed, so start over
+                        mode = "wb"
+                        with open(info_path, "w") as f:
+                            json.dump({"url": url, "validator": _validator(response)}, f)
+                    with open(partial_path, mode) as f:
+                        for chunk in response.iter_content(chunk_size=chunk_size):
+                            f.write(chunk)
+                            bytes_downloaded += len(chunk)
+                elif response.status_code in RETRYABLE_STATUS_CODES:
+                    print(f"  - Download of {url} returned status {response.status_code}, retrying...")
+                    continue
+                else:
+                    print(f"  - Failed to download {url}. Status code: {response.status_code}")
+                    trace.set(bytes=bytes_downloaded).end(error=f"status {response.status_code}")
+                    return None
+
+            os.replace(partial_path, file_path)
+            _discard_partial(partial_path, info_path)
+            elapsed = time.perf_counter() - start_time
+            stats = {
+                "path": file_path,
+                "bytes": bytes_downloaded,
+                "seconds": elapsed,
+                "throughput": bytes_downloaded / elapsed if elapsed > 0 else 0.0,
+            }
+            print(f"  - Downloaded to {file_path} "
+                  f"({bytes_downloaded / 1e6:.2f} MB in {elapsed:.2f}s, {stats['throughput'] / 1e6:.2f} MB/s)")
+            trace.set(bytes=bytes_downloaded, resumed_from=offset).end()
+            return stats
+
+        except requests.RequestException as e:
+            print(f"  - Error downloading {url} (attempt {attempt + 1}/{max_retries + 1}): {e}")
+
+    print(f"  - Giving up on {url} after {max_retries + 1} attempts.")
+    trace.set(bytes=bytes_downloaded).end(error="retries exhausted")
+    return None
+
+def download_files(downloads, max_workers=4, **kwargs):
+    """
+    Downloads several files in parallel over the shared session.
+
+    Args:
+        downloads (list): (url, file_path) pairs.
+        max_workers (int): The maximum number of downloads running at once.
+        **kwargs: Passed on to download_file().
+
+    Returns:
+        list: The download_file() result for each pair, in the same order (None for failures).
+    """
+    if not downloads:
+        return []
+    session = get_session(pool_size=max(10, max_workers))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(download_file, url, file_path, session=session, **kwargs)
+                   for url, file_path in downloads]
+        return [future.result() for future in futures]
+
+if __name__ == '__main__':
+    # Serve the committed clips from a local server and download them back,
+    # including one resumed from a partial file.
+    import filecmp
+    import glob
+    import tempfile
+
+    from stub_servers import serve_directory
+
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    server, base_url = serve_directory(repo_dir)
+
+    clips = sorted(os.path.basename(p) for p in glob.glob(os.path.join(repo_dir, "runway_clip_*.mp4")))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Leave half of the first clip behind to force a resume
+        with open(os.path.join(repo_dir, clips[0]), "rb") as src:
+            data = src.read()
+        partial_path = os.path.join(tmp_dir, clips[0]) + ".part"
+        with open(partial_path, "wb") as part:
+            part.write(data[:len(data) // 2])
+        with open(f"{partial_path}.json", "w") as info:
+            json.dump({"url": f"{base_url}/{clips[0]}", "validator": None}, info)
+
+        results = download_files([(f"{base_url}/{name}", os.path.join(tmp_dir, name)) for name in clips])
+        for name, result in zip(clips, results):
+            ok = result is not None and filecmp.cmp(os.path.join(repo_dir, name), result["path"], shallow=False)
+            print(f"{name}: {'OK' if ok else 'MISMATCH'}")
+
+    server.shutdown()
@@ -1,51 +1,83 @@
 import os
-from elevenlabs.client import ElevenLabs
-from dotenv import load_dotenv
+import re
+import json
+from concurrent.futures import ThreadPoolExecutor
 
-def generate_voiceover(script_text, voice_id="ZT9u07TYPVl83ejeLakq"):
+from asset_cache import asset_key, fetch_asset, store_asset
+import resilience
+from clients import get_elevenlabs_client, ELEVENLABS_REQUEST_OPTIONS
+from tracing import span
+
+# Chunked synthesis asks for raw 16-bit mono PCM, so the chunks can be joined sample-exactly
+PCM_OUTPUT_FORMAT = 'pcm_24000'
+PCM_SAMPLE_RATE = 24000
+PCM_SAMPLE_BYTES = 2
+
+# Consecutive sentences are sent together up to this many characters
+MAX_CHUNK_CHARS = 250
+
+def _save_script(script_text, output_dir):
+    # We also save the script to a text file for the FFmpeg captions step
+    script_file_path = os.path.join(output_dir, "script.txt")
+    with open(script_file_path, 'w') as f:
+        f.write(script_text)
+    print(f"Script saved to {script_file_path} for captions.")
+
+def generate_voiceover(script_text, voice_id="ZT9u07TYPVl83ejeLakq", model_id="eleven_multilingual_v2", output_dir="."):
     """
     Generates a high-quality voiceover from script text and saves it as an MP3.
+    A voiceover already generated for the same text, voice and model is reused from the asset cache.
 
     Args:
         script_text (str): The full text of the video script.
         voice_id (str): The ID of the ElevenLabs voice to use. Default is "Bella".
+        model_id (str): The ElevenLabs model to synthesize with.
+        output_dir (str or Workspace): The directory the MP3 and script are written to.
 
     Returns:
         str: The local file path to the saved voiceover MP3 file, or None if it fails.
     """
-    load_dotenv()
-    elevenlabs_api_key = os.getenv('ELEVENLABS_API_KEY')
-    if not elevenlabs_api_key:
+    audio_file_path = os.path.join(output_dir, "voiceover.mp3")
+    cache_key = asset_key('elevenlabs_voiceover', text=script_text, voice_id=voice_id, model_id=model_id)
+    if fetch_asset(cache_key, audio_file_path):
+        print(f"Reusing cached voiceover, saved to {audio_file_path}")
+        _save_script(script_text, output_dir)
+        return audio_file_path
+
+    # The shared ElevenLabs client, built on first use with your API key
+    client = get_elevenlabs_client()
+    if not client:
         print("Error: ELEVENLABS_API_KEY not found.")
         return None
 
-    # Initialize the ElevenLabs client with your API key
-    client = ElevenLabs(api_key=elevenlabs_api_key)
-
     print("Generating voiceover with ElevenLabs...")
 
     try:
-        # CORRECTED: The parameter name is 'voice_id' instead of 'voice'
-        audio_stream = client.text_to_speech.convert(
-            text=script_text,
-            voice_id=voice_id,
-            model_id="eleven_multilingual_v2"
-        )
-        
-        audio_file_path = "voiceover.mp3"
-        
-        # Stream the audio to a file
-        with open(audio_file_path, "wb") as f:
-            for chunk in audio_stream:
-                f.write(chunk)
-                
+        with span('elevenlabs.tts', characters=len(script_text)) as current:
+            def synthesize():
+                # CORRECTED: The parameter name is 'voice_id' instead of 'voice'
+                audio_stream = client.text_to_speech.convert(
+                    text=script_text,
+                    voice_id=voice_id,
+                    model_id=model_id,
+                    request_options=ELEVENLABS_REQUEST_OPTIONS
+                )
+
+                # Stream the audio to a file; the request is only sent once the stream is read,
+                # and a retry rewrites the file from the start
+                with open(audio_file_path, "wb") as f:
+                    for chunk in audio_stream:
+                        if 'first_byte_seconds' not in current.attributes:
+                            current.set(first_byte_seconds=round(current.seconds, 3))
+                        f.write(chunk)
+                        current.add('bytes', len(chunk))
+
+            resilience.call('elevenlabs', synthesize, trace=current)
+
         print(f"Voiceover saved to {audio_file_path}")
-        
-        # We also save the script to a text file for the FFmpeg captions step
-        script_file_path = "script.txt"
-        with open(script_file_path, 'w') as f:
-            f.write(script_text)
-        print(f"Script saved to {script_file_path} for captions.")
+        store_asset(cache_key, audio_file_path)
+
+        _save_script(script_text, output_dir)
 
         return audio_file_path
         
@@ -53,6 +85,160 @@ def generate_voiceover(script_text, voice_id="ZT9u07TYPVl83ejeLakq"):
         print(f"An error occurred with the ElevenLabs API: {e}")
         return None
 
+def split_into_chunks(script_text, max_chunk_chars=MAX_CHUNK_CHARS):
+    """
+    Splits a script at sentence boundaries into chunks of up to `max_chunk_chars` characters.
+    A single sentence longer than that becomes a chunk of its own.
+    """
+    sentences = [sentence for sentence in re.split(r'(?<=[.!?])\s+', script_text.strip()) if sentence]
+    chunks = []
+    for sentence in sentences:
+        if chunks and len(chunks[-1]) + 1 + len(sentence) <= max_chunk_chars:
+            chunks[-1] = f"{chunks[-1]} {sentence}"
+        else:
+            chunks.append(sentence)
+    return chunks
+
+def timings_path_for(audio_file_path):
+    """
+    Returns where the chunk timings of a chunked voiceover are saved.
+    """
+    return f"{os.path.splitext(audio_file_path)[0]}_timings.json"
+
+def load_chunk_timings(audio_file_path):
+    """
+    Returns the (start_seconds, end_seconds, text) chunk timings saved next to a chunked
+    voiceover, or None if there are none.
+    """
+    try:
+        with open(timings_path_for(audio_file_path)) as f:
+            return [tuple(timing) for timing in json.load(f)]
+    except FileNotFoundError:
+        return None
+
+def _synthesize_chunk(client, chunks, index, voice_id, model_id, output_dir):
+    """
+    Writes the raw PCM of one chunk to `voiceover_chunk_<index>.pcm`, from the asset cache or
+    from ElevenLabs, and returns its path (None if synthesis fails).
+
+    The neighbouring chunks are sent as context so the intonation carries across the joins.
+    They are left out of the cache key on purpose: editing one sentence then only re-synthesizes
+    the chunk that contains it, and its neighbours keep audio made with the old context.
+    """
+    text = chunks[index]
+    chunk_path = os.path.join(output_dir, f"voiceover_chunk_{index:03d}.pcm")
+    cache_key = asset_key('elevenlabs_pcm_chunk', text=text, voice_id=voice_id, model_id=model_id,
+                          output_format=PCM_OUTPUT_FORMAT)
+    if fetch_asset(cache_key, chunk_path):
+        return chunk_path
+
+    # The audio is streamed to a temporary file and only moved into place once complete, so a
+    # chunk that fails partway never leaves a truncated .pcm behind
+    tmp_path = f"{chunk_path}.{os.getpid()}.tmp"
+    try:
+        with span('elevenlabs.tts_chunk', chunk=index, characters=len(text)) as current:
+            def synthesize():
+                audio_stream = client.text_to_speech.convert(
+                    voice_id=voice_id,
+                    text=text,
+                    model_id=model_id,
+                    output_format=PCM_OUTPUT_FORMAT,
+                    previous_text=" ".join(chunks[:index])[-MAX_CHUNK_CHARS:] or None,
+                    next_text=" ".join(chunks[index + 1:])[:MAX_CHUNK_CHARS] or None,
+                    request_options=ELEVENLABS_REQUEST_OPTIONS
+                )
+                with open(tmp_path, "wb") as f:
+                    for chunk in audio_stream:
+                        f.write(chunk)
+                        current.add('bytes', len(chunk))
+
+            resilience.call('elevenlabs', synthesize, trace=current)
+        os.replace(tmp_path, chunk_path)
+    except Exception as e:
+        print(f"An error occurred with the ElevenLabs API on chunk {index + 1}/{len(chunks)}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+
+    store_asset(cache_key, chunk_path)
+    return chunk_path
+
+def _encode_mp3(pcm_paths, audio_file_path):
+    """
+    Joins the PCM chunks back to back and encodes them to MP3 in one pass, so there are no
+    gaps or encoder padding between chunks.
+    """
+    import ffmpeg
+
+    pieces = []
+    for pcm_path in pcm_paths:
+        with open(pcm_path, 'rb') as f:
+            pieces.append(f.read())
+    (
+        ffmpeg
+        .input('pipe:', format='s16le', ac=1, ar=PCM_SAMPLE_RATE)
+        .output(audio_file_path, acodec='libmp3lame', audio_bitrate='128k')
+        .overwrite_output()
+        .run(input=b''.join(pieces), capture_stdout=True, capture_stderr=True)
+    )
+
+def generate_voiceover_chunked(script_text, voice_id="ZT9u07TYPVl83ejeLakq", model_id="eleven_multilingual_v2",
+                               output_dir=".", max_workers=4, max_chunk_chars=MAX_CHUNK_CHARS):
+    """
+    Generates the voiceover like generate_voiceover(), but split at sentence boundaries into
+    chunks that are synthesized concurrently by up to `max_workers` requests.
+
+    Each chunk is cached on its own, so after an edit only the changed chunks are synthesized
+    again. The chunks come back as raw PCM, so their exact start and end times are known from
+    their sample counts. They are saved as JSON next to the MP3 (see load_chunk_timings), for
+    create_srt_from_script() to use as caption anchors.
+
+    Returns:
+        str: The local file path to the saved voiceover MP3 file, or None if it fails.
+    """
+    client = get_elevenlabs_client()
+    if not client:
+        print("Error: ELEVENLABS_API_KEY not found.")
+        return None
+
+    chunks = split_into_chunks(script_text, max_chunk_chars)
+    if not chunks:
+        print("Error: The script is empty.")
+        return None
+    print(f"Generating voiceover with ElevenLabs in {len(chunks)} chunks...")
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as pool:
+        pcm_paths = list(pool.map(
+            lambda index: _synthesize_chunk(client, chunks, index, voice_id, model_id, output_dir),
+            range(len(chunks))
+        ))
+
+    try:
+        if not all(pcm_paths):
+            return None
+
+        timings = []
+        position = 0.0
+        for pcm_path, text in zip(pcm_paths, chunks):
+            seconds = os.path.getsize(pcm_path) / (PCM_SAMPLE_RATE * PCM_SAMPLE_BYTES)
+            timings.append((position, position + seconds, text))
+            position += seconds
+
+        audio_file_path = os.path.join(output_dir, "voiceover.mp3")
+        _encode_mp3(pcm_paths, audio_file_path)
+        with open(timings_path_for(audio_file_path), 'w') as f:
+            json.dump(timings, f, indent=2)
+    except Exception as e:
+        print(f"An error occurred while joining the voiceover chunks: {e}")
+        return None
+    finally:
+        for pcm_path in filter(None, pcm_paths):
+            os.remove(pcm_path)
+
+    print(f"Voiceover saved to {audio_file_path} ({position:.2f}s in {len(chunks)} chunks)")
+    _save_script(script_text, output_dir)
+    return audio_file_path
+
 if __name__ == '__main__':
     test_script = "Hey there, space enthusiasts! Your brain has more neurons than there are stars in the Milky Way. Keep exploring and never stop learning!"
     generated_audio_path = generate_voiceover(test_script)
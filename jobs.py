@@ -0,0 +1,186 @@
+# jobs.py
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+from workflow import build_video_pipeline
+from workspace import Workspace
+
+# Finished jobs are forgotten this long after they end, so a long-running server does not grow forever
+FINISHED_JOB_TTL_SECONDS = 3600
+
+class Job:
+    """
+    One video being made in the background. The worker thread fills in `artifacts` as each
+    one becomes available, and the UI reads a consistent copy of it with snapshot().
+
+    Artifacts:
+        'topic' (str), 'script' (dict), 'voiceover' (bytes of the MP3), 'clips' (keyword index ->
+        JPEG thumbnail bytes), 'preview' (path of the promoted low-resolution preview, shown until
+        the final video is ready), 'video' (path of the promoted final video).
+
+    `first_playable_seconds` is how long after submission the first watchable video (the
+    preview, or the final video without one) was ready.
+    """
+
+    def __init__(self, job_id, user_prompt):
+        self.id = job_id
+        self.user_prompt = user_prompt
+        self.status = 'queued'  # queued -> running -> done | failed
+        self.running_stages = []
+        self.artifacts = {'clips': {}}
+        self.failed_stage = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self.first_playable_seconds = None
+        self._lock = threading.Lock()
+
+    def update(self, **fields):
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+
+    def start_stage(self, description):
+        with self._lock:
+            self.running_stages.append(description)
+
+    def finish_stage(self, description):
+        with self._lock:
+            self.running_stages.remove(description)
+
+    def add_artifact(self, name, value):
+        with self._lock:
+            self.artifacts[name] = value
+
+    def add_clip(self, index, thumbnail):
+        with self._lock:
+            self.artifacts['clips'][index] = thumbnail
+
+    def snapshot(self):
+        """
+        Returns the job's current state as a plain dict that the caller can read without locking.
+        """
+        with self._lock:
+            return {
+                'id': self.id,
+                'user_prompt': self.user_prompt,
+                'status': self.status,
+                'running_stages': list(self.running_stages),
+                'artifacts': {**self.artifacts, 'clips': dict(self.artifacts['clips'])},
+                'failed_stage': self.failed_stage,
+                'error': self.error,
+                'submitted_at': self.submitted_at,
+                'finished_at': self.finished_at,
+                'first_playable_seconds': self.first_playable_seconds,
+            }
+
+class JobRunner:
+    """
+    Runs video jobs on a shared pool of worker threads, so the caller (a Streamlit script run,
+    which is rerun and cancelled at will) never blocks on the pipeline. Jobs from every session
+    queue on the same pool; at most `max_workers` videos are made at once.
+    """
+
+    def __init__(self, max_workers=2, use_tmpfs=True, **pipeline_options):
+        """
+        Args:
+            max_workers (int): How many videos may be made at once.
+            use_tmpfs (bool): Write each job's intermediate files to tmpfs.
+            **pipeline_options: Passed on to build_video_pipeline().
+        """
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="video-job")
+        self.use_tmpfs = use_tmpfs
+        self.pipeline_options = pipeline_options
+        self.jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, user_prompt):
+        """
+        Queues a video for `user_prompt` and returns the new job's id straight away.
+        """
+        self._forget_finished_jobs()
+        job = Job(uuid.uuid4().hex[:12], user_prompt)
+        with self._lock:
+            self.jobs[job.id] = job
+        self.pool.submit(self._run, job)
+        return job.id
+
+    def get(self, job_id):
+        """
+        Returns the job with this id, or None if it is unknown or was forgotten.
+        """
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def queue_position(self, job_id):
+        """
+        Returns how many queued jobs were submitted before this one (0 once it is running).
+        """
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.status != 'queued':
+                return 0
+            return sum(1 for other in self.jobs.values()
+                       if other.status == 'queued' and other.submitted_at < job.submitted_at)
+
+    def _forget_finished_jobs(self):
+        cutoff = time.time() - FINISHED_JOB_TTL_SECONDS
+        with self._lock:
+            for job_id in [job_id for job_id, job in self.jobs.items()
+                           if job.finished_at and job.finished_at < cutoff]:
+                del self.jobs[job_id]
+
+    def _run(self, job):
+        from video_editor import extract_thumbnail
+
+        job.update(status='running')
+
+        def on_stage_start(name, description):
+            job.start_stage(description)
+
+        def on_clip_ready(index, clip_path):
+            job.add_clip(index, extract_thumbnail(clip_path))
+
+        def on_playable():
+            # Time from submission (queueing included) to the first video the user can watch
+            if job.first_playable_seconds is None:
+                seconds = time.time() - job.submitted_at
+                job.update(first_playable_seconds=seconds)
+                end = time.perf_counter()
+                tracing.record_span('job.first_playable', end - seconds, end, lane=f"job {job.id}")
+
+        try:
+            # The workspace's scratch files are deleted when the job ends, which is why the
+            # voiceover and the thumbnails are kept in memory and only the videos are promoted
+            with Workspace(use_tmpfs=self.use_tmpfs) as workspace:
+                def on_stage_done(name, description, result):
+                    job.finish_stage(description)
+                    if name == 'voiceover':
+                        with open(result, 'rb') as f:
+                            job.add_artifact('voiceover', f.read())
+                    elif name in ('category', 'topic', 'script'):
+                        job.add_artifact(name, result)
+                    elif name == 'preview' and result['path']:
+                        job.add_artifact('preview', workspace.promote(result['path']))
+                        on_playable()
+
+                pipeline = build_video_pipeline(
+                    use_category=True, output_dir=workspace, on_clip_ready=on_clip_ready, **self.pipeline_options
+                )
+                artifacts = pipeline.run(
+                    on_stage_start=on_stage_start, on_stage_done=on_stage_done, user_prompt=job.user_prompt
+                )
+                if artifacts:
+                    job.add_artifact('video', workspace.promote(artifacts['video']))
+                    on_playable()
+            if artifacts:
+                job.update(status='done', running_stages=[], finished_at=time.time())
+            else:
+                job.update(status='failed', failed_stage=pipeline.failed_stage, running_stages=[],
+                           finished_at=time.time())
+        except Exception as e:
+            job.update(status='failed', error=str(e), running_stages=[], finished_at=time.time())
+        tracing.export_metrics()
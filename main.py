@@ -1,58 +1,42 @@
 # main.py
-import os
-import json
-import ffmpeg
+import tracing
+from workflow import build_video_pipeline
+from workspace import Workspace
 
-# Import all our custom modules
-from youtube_scraper import get_trending_topic
-from openai_script import generate_video_script # Corrected import name
-from elevenlabs_api import generate_voiceover
-from runway_api import generate_runway_clips
-from video_editor import assemble_video
+def on_stage_start(name, description):
+    print(f"{description}...")
+
+def on_stage_done(name, description, result):
+    if name == 'topic':
+        print(f"✅ Found trending topic: '{result}'")
+    elif name == 'script':
+        print(f"✅ Script generated successfully. Keywords: {result['keywords']}")
+    elif name == 'voiceover':
+        print(f"✅ Voiceover saved to '{result}'")
+    elif name == 'clips':
+        print(f"✅ Generated {len(result)} clips: {result}")
 
 if __name__ == '__main__':
     print("--- Starting Viral Video Maker Workflow ---")
 
-    # 1. Get a trending topic from YouTube
-    trending_topic = get_trending_topic()
-    if not trending_topic:
-        print("❌ Failed to find a trending topic.")
-        exit()
-    print(f"✅ Found trending topic: '{trending_topic}'")
-
-    # 2. Generate a script and visual keywords from OpenAI
-    print("Generating video script and keywords...")
-    script_text, keywords = generate_video_script(trending_topic)
-    if not script_text or not keywords:
-        print("❌ Failed to generate script.")
-        exit()
-    print(f"✅ Script generated successfully. Keywords: {keywords}")
+    # Every run writes into its own workspace; only the final video is kept afterwards
+    with Workspace() as workspace:
+        # Voiceover and clip generation both only need the script, so the pipeline runs them side by side
+        pipeline = build_video_pipeline(output_dir=workspace)
+        artifacts = pipeline.run(on_stage_start=on_stage_start, on_stage_done=on_stage_done)
 
-    # 3. Generate voiceover from the script using ElevenLabs
-    print("Generating voiceover...")
-    audio_path = generate_voiceover(script_text)
-    if not audio_path:
-        print("❌ Failed to generate voiceover.")
-        exit()
-    print(f"✅ Voiceover saved to '{audio_path}'")
-    
-    # 4. Generate multiple video clips from the keywords using Runway ML
-    # Pass the entire list of keywords to the function
-    print("Generating video clips from keywords...")
-    video_paths = generate_runway_clips(keywords)
-    
-    if not video_paths:
-        print("❌ No video clips were generated. Exiting.")
-        exit()
+        print("\nStage timings:")
+        pipeline.print_timings()
 
-    print(f"✅ Generated {len(video_paths)} clips: {video_paths}")
+        # Open trace.json in chrome://tracing or ui.perfetto.dev to see where the time went
+        trace_path = workspace.promote(tracing.write_chrome_trace(workspace.file("trace.json")))
+        metrics_path = workspace.promote(tracing.write_prometheus(workspace.file("metrics.prom")))
+        tracing.export_metrics()
+        print(f"Trace written to {trace_path}, metrics to {metrics_path}")
 
-    # 5. Assemble the final video with audio and captions
-    print("Assembling final video...")
-    final_video_path = assemble_video(video_paths, audio_path, "script.txt")
-    
-    if final_video_path:
-        print("\n--- ✅ Project Completed! ✅ ---")
-        print(f"Your final video is ready at: {final_video_path}")
-    else:
-        print("\n--- ❌ Project Failed at the Final Assembly Stage. ---")
\ No newline at end of file
+        if artifacts:
+            final_video_path = workspace.promote(artifacts['video'])
+            print("\n--- ✅ Project Completed! ✅ ---")
+            print(f"Your final video is ready at: {final_video_path}")
+        else:
+            print(f"\n--- ❌ Project Failed at the '{pipeline.failed_stage}' stage. ---")
@@ -0,0 +1,348 @@
+# media_info.py
+import os
+import mmap
+import struct
+import threading
+from fractions import Fraction
+from collections import OrderedDict
+
+from tracing import span
+
+# Probe results are kept for this many files, and reused while a file's size and mtime are unchanged
+CACHE_MAX_ENTRIES = 4096
+
+# MPEG audio frame header tables, indexed by the header's version bits (0: MPEG 2.5, 2: MPEG 2, 3: MPEG 1)
+_MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+_MP3_BITRATES = {  # kbit/s by (MPEG 1?, layer), for bitrate indexes 1-14
+    (True, 1): (32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+# MP4 boxes that only contain other boxes, on the way to the ones that are read
+_MP4_CONTAINERS = {b'moov', b'trak', b'mdia', b'minf', b'stbl'}
+
+_cache = OrderedDict()  # absolute path -> (size, mtime_ns, info)
+_cache_lock = threading.Lock()
+
+class UnsupportedMedia(ValueError):
+    """
+    Raised by the parsers for a file they cannot read, so probe() falls back to ffprobe.
+    """
+
+def _mp3_frame_header(data, offset):
+    """
+    Decodes the MPEG audio frame header at `offset`.
+
+    Returns:
+        dict: The header fields and 'length' (bytes of the frame), or None if there is no valid header there.
+    """
+    if offset + 4 > len(data):
+        return None
+    header, = struct.unpack_from('>I', data, offset)
+    if header >> 21 != 0x7FF:
+        return None
+    version = (header >> 19) & 3
+    layer = 4 - ((header >> 17) & 3)
+    bitrate_index = (header >> 12) & 15
+    rate_index = (header >> 10) & 3
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    mpeg1 = version == 3
+    sample_rate = _MP3_SAMPLE_RATES[version][rate_index]
+    bitrate = _MP3_BITRATES[(mpeg1, layer)][bitrate_index - 1] * 1000
+    padding = (header >> 9) & 1
+    if layer == 1:
+        samples, length = 384, (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 576 if layer == 3 and not mpeg1 else 1152
+        length = samples // 8 * bitrate // sample_rate + padding
+    return {
+        'mpeg1': mpeg1, 'layer': layer, 'bitrate': bitrate, 'sample_rate': sample_rate,
+        'channels': 1 if (header >> 6) & 3 == 3 else 2, 'samples': samples, 'length': length,
+    }
+
+def _parse_mp3(data):
+    """
+    Reads an MP3's duration from its first frame: the frame count of a Xing/Info or VBRI
+    header when there is one (VBR files and LAME's CBR files), otherwise the audio size over
+    the bitrate. Encoder delay and padding from a LAME tag are taken off, as decoders do.
+    """
+    offset = 0
+    # Skip ID3v2 tags: "ID3", version, flags and a syncsafe size
+    while data[offset:offset + 3] == b'ID3' and offset + 10 <= len(data):
+        size = 0
+        for byte in data[offset + 6:offset + 10]:
+            size = (size << 7) | (byte & 0x7F)
+        offset += 10 + size + (10 if data[offset + 5] & 0x10 else 0)
+
+    # The first frame is a header followed by another header right where its frame ends
+    limit = min(len(data), offset + 64 * 1024)
+    frame = None
+    while offset < limit:
+        offset = data.find(b'\xff', offset, limit)
+        if offset < 0:
+            break
+        frame = _mp3_frame_header(data, offset)
+        if frame:
+            following = _mp3_frame_header(data, offset + frame['length'])
+            if following and following['sample_rate'] == frame['sample_rate'] \
+                    or offset + frame['length'] == len(data):
+                break
+        frame = None
+        offset += 1
+    if frame is None:
+        raise UnsupportedMedia("no MPEG audio frame found")
+
+    sample_rate, samples = frame['sample_rate'], frame['samples']
+    side_info = (32 if frame['channels'] == 2 else 17) if frame['mpeg1'] else (17 if frame['channels'] == 2 else 9)
+    xing = offset + 4 + side_info
+    total_samples = None
+    if data[xing:xing + 4] in (b'Xing', b'Info'):
+        flags, = struct.unpack_from('>I', data, xing + 4)
+        if flags & 1:
+            frames, = struct.unpack_from('>I', data, xing + 8)
+            total_samples = frames * samples
+            # The LAME tag (or ffmpeg's) after the Xing fields holds the encoder delay and padding (12 bits each)
+            lame = xing + 8 + 4 * bool(flags & 1) + 4 * bool(flags & 2) + 100 * bool(flags & 4) + 4 * bool(flags & 8)
+            if data[lame:lame + 4] in (b'LAME', b'Lavf', b'Lavc'):
+                delay_padding = int.from_bytes(data[lame + 21:lame + 24], 'big')
+                total_samples -= (delay_padding >> 12) + (delay_padding & 0xFFF)
+    elif data[offset + 36:offset + 40] == b'VBRI':
+        frames, = struct.unpack_from('>I', data, offset + 36 + 14)
+        total_samples = frames * samples
+
+    if total_samples is not None:
+        duration = max(0, total_samples) / sample_rate
+    else:
+        end = len(data) - (128 if data[-128:-125] == b'TAG' else 0)
+        duration = (end - offset) * 8 / frame['bitrate']
+
+    return {
+        'format': 'mp3', 'duration': duration, 'video': None,
+        'audio': {'codec': 'mp3', 'sample_rate': sample_rate, 'channels': frame['channels'], 'duration': duration},
+    }
+
+def _mp4_boxes(data, start, end):
+    """
+    Yields (type, payload start, payload end) for the boxes between `start` and `end`.
+    """
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, offset)
+        header = 8
+        if size == 1:
+            size, = struct.unpack_from('>Q', data, offset + 8)
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            raise UnsupportedMedia(f"truncated {box_type!r} box")
+        yield box_type, offset + header, offset + size
+        offset += size
+
+def _mp4_track(data, start, end):
+    """
+    Reads one 'trak' box: its handler type, the media timescale and duration, the first
+    sample description and the sample durations.
+    """
+    track = {}
+    stack = [(start, end)]
+    while stack:
+        for box_type, payload, box_end in _mp4_boxes(data, *stack.pop()):
+            if box_type in _MP4_CONTAINERS:
+                stack.append((payload, box_end))
+            elif box_type == b'mdhd':
+                if data[payload] == 1:
+                    track['timescale'], track['duration'] = struct.unpack_from('>IQ', data, payload + 20)
+                else:
+                    track['timescale'], track['duration'] = struct.unpack_from('>II', data, payload + 12)
+            elif box_type == b'hdlr':
+                # The one in 'mdia' comes first; QuickTime files have a data handler in 'minf' too
+                track.setdefault('handler', data[payload + 8:payload + 12])
+            elif box_type == b'stsd':
+                entry = payload + 8
+                track['codec'] = data[entry + 4:entry + 8].decode('latin-1')
+                # The sample entry's fields, after its size and type
+                track['entry'] = entry + 8
+            elif box_type == b'stts':
+                count, = struct.unpack_from('>I', data, payload + 4)
+                track['stts'] = struct.unpack_from(f'>{2 * count}I', data, payload + 8)
+    return track
+
+# Sample entry names to the codec names ffprobe reports
+_MP4_CODECS = {'avc1': 'h264', 'avc3': 'h264', 'hvc1': 'hevc', 'hev1': 'hevc', 'mp4a': 'aac', 'av01': 'av1',
+               'vp09': 'vp9', 'Opus': 'opus'}
+
+def _parse_mp4(data):
+    """
+    Reads the duration from an MP4/MOV's 'mvhd' box and the size, frame rate and sample
+    rate of its first video and audio tracks from their 'tkhd'/'mdia' boxes. Fragmented
+    files keep their samples in 'moof' boxes instead, so they are left to ffprobe.
+    """
+    boxes = {box_type: (payload, end) for box_type, payload, end in _mp4_boxes(data, 0, len(data))}
+    moov = boxes.get(b'moov')
+    if moov is None:
+        raise UnsupportedMedia("no moov box")
+    if b'moof' in boxes:
+        raise UnsupportedMedia("fragmented MP4")
+
+    info = {'format': 'mp4', 'duration': None, 'video': None, 'audio': None}
+    for box_type, payload, end in _mp4_boxes(data, *moov):
+        if box_type == b'mvex':
+            raise UnsupportedMedia("fragmented MP4")
+        if box_type == b'mvhd':
+            if data[payload] == 1:
+                timescale, duration = struct.unpack_from('>IQ', data, payload + 20)
+            else:
+                timescale, duration = struct.unpack_from('>II', data, payload + 12)
+            if not timescale or not duration:
+                # Streamed files leave the duration to their fragments
+                raise UnsupportedMedia("no duration in mvhd")
+            info['duration'] = duration / timescale
+        elif box_type == b'trak':
+            track = _mp4_track(data, payload, end)
+            if not track.get('timescale') or 'entry' not in track:
+                continue
+            duration = track['duration'] / track['timescale']
+            codec = _MP4_CODECS.get(track['codec'], track['codec'])
+
+            if track.get('handler') == b'vide' and info['video'] is None:
+                stts = track.get('stts', ())
+                frames = sum(stts[0::2])
+                deltas = set(stts[1::2])
+                if len(deltas) == 1:
+                    # Constant frame rate: exact, e.g. 30000/1001
+                    fps = Fraction(track['timescale'], deltas.pop())
+                elif frames and track['duration']:
+                    fps = Fraction(frames * track['timescale'], track['duration']).limit_denominator(1001)
+                else:
+                    raise UnsupportedMedia("no frame rate in the video track")
+                width, height = struct.unpack_from('>HH', data, track['entry'] + 24)
+                info['video'] = {'codec': codec, 'width': width, 'height': height, 'fps': fps,
+                                 'frames': frames, 'duration': duration}
+            elif track.get('handler') == b'soun' and info['audio'] is None:
+                channels, = struct.unpack_from('>H', data, track['entry'] + 16)
+                info['audio'] = {'codec': codec, 'sample_rate': track['timescale'], 'channels': channels,
+                                 'duration': duration}
+
+    if info['duration'] is None:
+        raise UnsupportedMedia("no mvhd box")
+    return info
+
+def _ffprobe(path):
+    """
+    Probes a file with ffprobe and returns the same fields as the parsers.
+    """
+    import ffmpeg
+
+    with span('ffmpeg.probe', path=os.path.basename(path)):
+        probe = ffmpeg.probe(path)
+
+    duration = probe['format'].get('duration')
+    info = {'format': probe['format'].get('format_name'), 'duration': float(duration) if duration else None,
+            'video': None, 'audio': None}
+    for stream in probe['streams']:
+        stream_duration = float(stream['duration']) if stream.get('duration') else info['duration']
+        if stream['codec_type'] == 'video' and info['video'] is None:
+            frames = int(stream['nb_frames']) if stream.get('nb_frames') else None
+            # The average rate is 0/0 for some streams (e.g. VFR or streamed files); fall back
+            # to the base rate, then to the frame count over the duration
+            rates = [Fraction(rate) for rate in (stream.get('avg_frame_rate'), stream.get('r_frame_rate'))
+                     if rate and not rate.endswith('/0')]
+            if frames and stream_duration:
+                rates.append(Fraction(frames / stream_duration).limit_denominator(1001))
+            info['video'] = {'codec': stream.get('codec_name'), 'width': stream.get('width'),
+                             'height': stream.get('height'), 'fps': next((rate for rate in rates if rate), None),
+                             'frames': frames, 'duration': stream_duration}
+        elif stream['codec_type'] == 'audio' and info['audio'] is None:
+            info['audio'] = {'codec': stream.get('codec_name'),
+                             'sample_rate': int(stream['sample_rate']) if stream.get('sample_rate') else None,
+                             'channels': stream.get('channels'), 'duration': stream_duration}
+    return info
+
+def _parse(path):
+    """
+    Parses a file in place through mmap, choosing the parser from its first bytes.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise UnsupportedMedia("empty file")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[4:8] in (b'ftyp', b'moov', b'mdat', b'free', b'wide'):
+                return _parse_mp4(data)
+            if data[:3] == b'ID3' or (data[0] == 0xFF and data[1] & 0xE0 == 0xE0) \
+                    or path.lower().endswith('.mp3'):
+                return _parse_mp3(data)
+    raise UnsupportedMedia("unknown format")
+
+def probe(path):
+    """
+    Returns a media file's duration and its first video and audio stream's properties.
+
+    MP3 and MP4/MOV files are parsed in Python without reading more than their headers;
+    anything else, or a file the parsers reject, goes to ffprobe. Results are cached per
+    path and reused while the file's size and mtime are unchanged.
+
+    Returns:
+        dict: 'format', 'duration' (seconds), 'video' ({'codec', 'width', 'height', 'fps'
+        (a Fraction, or None if even ffprobe finds no rate), 'frames', 'duration'} or None), 'audio' ({'codec', 'sample_rate',
+        'channels', 'duration'} or None) and 'parser' ('mp3', 'mp4' or 'ffprobe'). It is
+        shared with later callers, so treat it as read-only.
+
+    Raises:
+        ffmpeg.Error: If ffprobe cannot read the file either.
+    """
+    key = os.path.abspath(path)
+    stat = os.stat(key)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            _cache.move_to_end(key)
+            return cached[2]
+
+    try:
+        info = _parse(key)
+        info['parser'] = info['format']
+    except (UnsupportedMedia, struct.error, IndexError, ValueError, ZeroDivisionError):
+        info = _ffprobe(key)
+        info['parser'] = 'ffprobe'
+
+    with _cache_lock:
+        _cache[key] = (stat.st_size, stat.st_mtime_ns, info)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return info
+
+def get_duration(path):
+    """
+    Returns a media file's duration in seconds.
+    """
+    return probe(path)['duration']
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+if __name__ == '__main__':
+    import sys
+    import glob
+    import time
+
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    paths = sys.argv[1:] or [os.path.join(repo_dir, "voiceover.mp3")] + sorted(glob.glob(os.path.join(repo_dir, "runway_clip_*.mp4")))
+    for path in paths:
+        clear_cache()
+        start_time = time.perf_counter()
+        info = probe(path)
+        parse_us = (time.perf_counter() - start_time) * 1e6
+        start_time = time.perf_counter()
+        probe(path)
+        cached_us = (time.perf_counter() - start_time) * 1e6
+        print(f"{os.path.basename(path)}: {info['duration']:.3f}s via {info['parser']} in {parse_us:.0f}µs "
+              f"({cached_us:.0f}µs cached), video={info['video']}, audio={info['audio']}")
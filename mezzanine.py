@@ -0,0 +1,100 @@
+# mezzanine.py
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from asset_cache import asset_key, fetch_asset, file_digest, store_asset
+
+# The canonical intermediate format every clip is converted to. Clips in this format can be
+# joined with the concat demuxer without re-encoding, and every GOP starts on a whole second.
+MEZZANINE_PROFILE = {
+    'width': 768,
+    'height': 1280,
+    'fps': 24,
+    'pix_fmt': 'yuv420p',
+    'timescale': 12288,
+    'gop': 24,
+    'vcodec': 'libx264',
+    'preset': 'veryfast',
+    'crf': 16,
+}
+
+def _encode_mezzanine(source_path, output_path, threads):
+    import ffmpeg
+
+    profile = MEZZANINE_PROFILE
+    video = (
+        ffmpeg
+        .input(source_path)
+        .video
+        .filter('scale', profile['width'], profile['height'], force_original_aspect_ratio='decrease')
+        .filter('pad', profile['width'], profile['height'], '(ow-iw)/2', '(oh-ih)/2')
+        .filter('setsar', 1)
+        .filter('fps', profile['fps'])
+    )
+    mezzanine = (
+        ffmpeg
+        .output(
+            video, output_path,
+            vcodec=profile['vcodec'], preset=profile['preset'], crf=profile['crf'],
+            pix_fmt=profile['pix_fmt'], g=profile['gop'], keyint_min=profile['gop'], sc_threshold=0,
+            video_track_timescale=profile['timescale'], threads=threads, an=None
+        )
+        .overwrite_output()
+    )
+    ffmpeg.run(mezzanine, capture_stdout=True, capture_stderr=True)
+    return output_path
+
+def normalize_clip(source_path, output_path, threads=0):
+    """
+    Converts a clip to the mezzanine format, or copies the cached conversion of a clip
+    with the same contents.
+
+    Args:
+        source_path (str): The clip to convert.
+        output_path (str): Where to write the normalized clip.
+        threads (int): Encoder threads (0 lets x264 decide).
+
+    Returns:
+        str: `output_path`, or None if the conversion failed.
+    """
+    import ffmpeg
+
+    cache_key = asset_key('mezzanine', source=file_digest(source_path), profile=MEZZANINE_PROFILE)
+    if fetch_asset(cache_key, output_path):
+        print(f"  - Reusing cached mezzanine for {source_path}")
+        return output_path
+
+    try:
+        _encode_mezzanine(source_path, output_path, threads)
+    except ffmpeg.Error as e:
+        print(f"  - FFmpeg Error normalizing {source_path}:")
+        print((e.stderr or b'').decode('utf8'))
+        return None
+
+    store_asset(cache_key, output_path)
+    print(f"  - Normalized {source_path} -> {output_path}")
+    return output_path
+
+def normalize_clips(video_clip_paths, output_dir, max_workers=None):
+    """
+    Normalizes several clips in parallel.
+
+    Returns:
+        list: The normalized clip paths in the same order, or None if any clip failed.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    cores = os.cpu_count() or 1
+    max_workers = max_workers or min(len(video_clip_paths), cores) or 1
+    threads = max(1, cores // max_workers)
+
+    print(f"Normalizing {len(video_clip_paths)} clips...")
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [
+            pool.submit(normalize_clip, clip, os.path.join(output_dir, f"mezzanine_{i+1}.mp4"), threads)
+            for i, clip in enumerate(video_clip_paths)
+        ]
+        normalized_paths = [future.result() for future in futures]
+
+    if not all(normalized_paths):
+        return None
+    return normalized_paths
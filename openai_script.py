@@ -1,76 +1,325 @@
 import os
 import json
 import re
-from openai import OpenAI
-from dotenv import load_dotenv
+import time
+import queue
+import threading
 
-load_dotenv()
+import resilience
+from clients import get_openai_client
+from tracing import span
+
+# Regex to remove bracketed text (e.g., "[Cut to close-ups...]")
+BRACKET_PATTERN = re.compile(r'\[.*?\]', re.DOTALL)
+
+# Regex to remove text in parentheses (e.g., "(Upbeat music plays...)")
+PARENTHESES_PATTERN = re.compile(r'\(.*?\)', re.DOTALL)
+
+# Regex to remove NARRATOR (V.O.), Narrator:, and similar tags
+NARRATOR_PATTERN = re.compile(r'\b(NARRATOR|Narrator)\s*(:|\(V\.O\.\))?\s*', re.IGNORECASE)
+
+# Regex to remove most common emojis
+EMOJI_PATTERN = re.compile(
+    "["
+    "\U0001F600-\U0001F64F"  # Emoticons
+    "\U0001F300-\U0001F5FF"  # Symbols & Pictographs
+    "\U0001F680-\U0001F6FF"  # Transport & Map Symbols
+    "\U0001F1E0-\U0001F1FF"  # Flags (iOS)
+    "\U00002702-\U000027B0"
+    "\U000024C2-\U0001F251"
+    "]+", flags=re.UNICODE)
+
+def _remove_non_dialogue(text):
+    clean_text = BRACKET_PATTERN.sub(r'', text)
+    clean_text = PARENTHESES_PATTERN.sub(r'', clean_text)
+    clean_text = NARRATOR_PATTERN.sub(r'', clean_text)
+    return EMOJI_PATTERN.sub(r'', clean_text)
+
+def _dialogue_lines(lines):
+    # Filter out empty lines and lines that are too short to be dialogue
+    return [line.strip() for line in lines if len(line.strip()) > 5]
 
 def clean_script_text(text):
     """
     Removes emojis, bracketed text, parentheses, and other non-dialogue elements from the script.
     """
-    # Regex to remove bracketed text (e.g., "[Cut to close-ups...]")
-    bracket_pattern = re.compile(r'\[.*?\]', re.DOTALL)
-    clean_text = bracket_pattern.sub(r'', text)
-
-    # Regex to remove text in parentheses (e.g., "(Upbeat music plays...)")
-    parentheses_pattern = re.compile(r'\(.*?\)', re.DOTALL)
-    clean_text = parentheses_pattern.sub(r'', clean_text)
-    
-    # Regex to remove NARRATOR (V.O.), Narrator:, and similar tags
-    narrator_pattern = re.compile(r'\b(NARRATOR|Narrator)\s*(:|\(V\.O\.\))?\s*', re.IGNORECASE)
-    clean_text = narrator_pattern.sub(r'', clean_text)
-
-    # Regex to remove most common emojis
-    emoji_pattern = re.compile(
-        "["
-        "\U0001F600-\U0001F64F"  # Emoticons
-        "\U0001F300-\U0001F5FF"  # Symbols & Pictographs
-        "\U0001F680-\U0001F6FF"  # Transport & Map Symbols
-        "\U0001F1E0-\U0001F1FF"  # Flags (iOS)
-        "\U00002702-\U000027B0"
-        "\U000024C2-\U0001F251"
-        "]+", flags=re.UNICODE)
-    
-    clean_text = emoji_pattern.sub(r'', clean_text)
+    clean_text = _remove_non_dialogue(text)
 
     # Remove short, standalone lines that are likely titles or labels
-    lines = clean_text.split('\n')
-    # Filter out empty lines and lines that are too short to be dialogue
-    cleaned_lines = [line.strip() for line in lines if len(line.strip()) > 5]
-    
+    cleaned_lines = _dialogue_lines(clean_text.split('\n'))
+
     return " ".join(cleaned_lines).strip()
 
-def generate_video_script(topic):
+class ScriptCleaner:
     """
-    Generates a video script and visual keywords using the OpenAI API.
+    Runs clean_script_text() over a script that arrives in pieces.
+
+    Text is cleaned as soon as no bracket, parenthesis or narrator tag that is still open can
+    reach past it, and each line is kept or dropped as soon as it ends, so close() returns
+    exactly what clean_script_text() returns for the whole script.
     """
-    client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
 
+    def __init__(self):
+        self._raw = ''   # text that may still change when more arrives
+        self._line = ''  # cleaned text of the line in progress
+        self.lines = []
+
+    @staticmethod
+    def _cleans_on_its_own(prefix):
+        # A prefix can be cleaned separately if none of the patterns could match across its end
+        text = BRACKET_PATTERN.sub(r'', prefix)
+        if '[' in text:
+            return False
+        text = PARENTHESES_PATTERN.sub(r'', text)
+        if '(' in text:
+            return False
+        return all(match.end() < len(text) for match in NARRATOR_PATTERN.finditer(text))
+
+    def _add_clean_text(self, clean_text):
+        *finished, self._line = (self._line + clean_text).split('\n')
+        self.lines.extend(_dialogue_lines(finished))
+
+    def feed(self, text):
+        """
+        Adds the next piece of the script.
+        """
+        self._raw += text
+        # Only cut right after whitespace, so a narrator tag's word boundary is the same either way
+        for cut in range(len(self._raw), 0, -1):
+            if not self._raw[cut - 1].isspace():
+                continue
+            if (self._raw.rfind('[', 0, cut) > self._raw.rfind(']', 0, cut)
+                    or self._raw.rfind('(', 0, cut) > self._raw.rfind(')', 0, cut)):
+                continue
+            # Try only the latest plausible cut; a later piece will allow another one
+            if self._cleans_on_its_own(self._raw[:cut]):
+                self._add_clean_text(_remove_non_dialogue(self._raw[:cut]))
+                self._raw = self._raw[cut:]
+            break
+
+    def close(self):
+        """
+        Cleans whatever is left and returns the cleaned script.
+        """
+        self._add_clean_text(_remove_non_dialogue(self._raw) + '\n')
+        self._raw = ''
+        return " ".join(self.lines).strip()
+
+# Characters that stand for themselves after a backslash in a JSON string
+JSON_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+class StreamingJSONObjectParser:
+    """
+    Parses a JSON object whose text arrives in pieces, such as a streamed chat completion,
+    and reports its top-level values while they are still arriving.
+
+    feed() returns a list of events:
+        ('text', key, piece)  the next decoded piece of a string value
+        ('item', key, value)  a complete string element of an array value
+        ('end', key, None)    the value of `key` is complete
+    Values that are not strings or arrays of strings are skipped, apart from their 'end'.
+    """
+
+    def __init__(self):
+        self.done = False
+        self._state = 'start'
+        self._key = None
+        self._string = []       # decoded characters of the string being read
+        self._in_string = None  # what the string being read is: 'key', 'value' or 'item'
+        self._escape = None     # None, '' right after a backslash, or the hex digits of a \u escape
+        self._surrogate = None  # the first half of a UTF-16 surrogate pair
+        self._depth = 0         # nesting depth while skipping a nested object or array
+        self._skip_string = False
+        self._skip_escape = False
+        self._skip_return = None
+
+    def feed(self, text):
+        events = []
+        for char in text:
+            if self._in_string:
+                self._string_char(char, events)
+            elif self._state == 'skip':
+                self._skip_char(char, events)
+            elif not char.isspace() or self._state == 'scalar':
+                self._structure_char(char, events)
+        # Hand out the part of a string value decoded so far
+        if self._in_string == 'value' and self._string:
+            events.append(('text', self._key, ''.join(self._string)))
+            self._string = []
+        return events
+
+    def _string_char(self, char, events):
+        if self._escape is not None:
+            if self._escape == '' and char != 'u':
+                self._escape = None
+                self._add_char(JSON_ESCAPES.get(char, char))
+            elif self._escape == '':
+                self._escape = 'u'
+            else:
+                self._escape += char
+                if len(self._escape) == 5:
+                    code = int(self._escape[1:], 16)
+                    self._escape = None
+                    if 0xD800 <= code < 0xDC00:
+                        self._flush_surrogate()
+                        self._surrogate = code
+                    elif 0xDC00 <= code < 0xE000 and self._surrogate is not None:
+                        high, self._surrogate = self._surrogate, None
+                        self._add_char(chr(0x10000 + (high - 0xD800) * 0x400 + code - 0xDC00))
+                    else:
+                        self._add_char(chr(code))
+        elif char == '\\':
+            self._escape = ''
+        elif char == '"':
+            self._end_string(events)
+        else:
+            self._add_char(char)
+
+    def _flush_surrogate(self):
+        # A first half that is not followed by its second half is kept as it is, like json.loads() does
+        if self._surrogate is not None:
+            self._string.append(chr(self._surrogate))
+            self._surrogate = None
+
+    def _add_char(self, char):
+        self._flush_surrogate()
+        self._string.append(char)
+
+    def _end_string(self, events):
+        self._flush_surrogate()
+        value = ''.join(self._string)
+        self._string = []
+        kind, self._in_string = self._in_string, None
+        if kind == 'key':
+            self._key = value
+            self._state = 'colon'
+        elif kind == 'value':
+            if value:
+                events.append(('text', self._key, value))
+            events.append(('end', self._key, None))
+            self._state = 'after_value'
+        else:
+            events.append(('item', self._key, value))
+            self._state = 'array'
+
+    def _skip_char(self, char, events):
+        if self._skip_string:
+            if self._skip_escape:
+                self._skip_escape = False
+            elif char == '\\':
+                self._skip_escape = True
+            elif char == '"':
+                self._skip_string = False
+        elif char == '"':
+            self._skip_string = True
+        elif char in '[{':
+            self._depth += 1
+        elif char in ']}':
+            self._depth -= 1
+            if self._depth == 0:
+                self._state = self._skip_return
+                if self._state == 'after_value':
+                    events.append(('end', self._key, None))
+
+    def _start_skip(self, return_state):
+        self._state = 'skip'
+        self._depth = 1
+        self._skip_return = return_state
+
+    def _structure_char(self, char, events):
+        state = self._state
+        if state == 'start':
+            if char != '{':
+                raise ValueError(f"Expected a JSON object, got {char!r}.")
+            self._state = 'key'
+        elif state == 'key':
+            if char == '"':
+                self._in_string = 'key'
+            elif char == '}':
+                self._state = 'done'
+                self.done = True
+            elif char != ',':
+                raise ValueError(f"Expected a key, got {char!r}.")
+        elif state == 'colon':
+            if char != ':':
+                raise ValueError(f"Expected ':', got {char!r}.")
+            self._state = 'value'
+        elif state == 'value':
+            if char == '"':
+                self._in_string = 'value'
+            elif char == '[':
+                self._state = 'array'
+            elif char == '{':
+                self._start_skip('after_value')
+            else:
+                self._state = 'scalar'
+        elif state == 'scalar':
+            if char in ',}':
+                events.append(('end', self._key, None))
+                self._state = 'after_value'
+                self._structure_char(char, events)
+        elif state == 'array':
+            if char == '"':
+                self._in_string = 'item'
+            elif char == ']':
+                events.append(('end', self._key, None))
+                self._state = 'after_value'
+            elif char in '[{':
+                self._start_skip('array')
+        elif state == 'after_value':
+            if char == ',':
+                self._state = 'key'
+            elif char == '}':
+                self._state = 'done'
+                self.done = True
+            else:
+                raise ValueError(f"Expected ',' or '}}', got {char!r}.")
+
+def _script_messages(topic):
+    # `keywords` comes first, so that a streamed response hands them out before the long script
     prompt = f"""
     You are a viral video producer. Your task is to create a compelling, 30-second video script about the topic: "{topic}". 
     The video should have a strong hook, a clear narrative, and a call to action. 
     
-    Structure the response in a JSON object with the following keys:
-    - `script`: A full script for a 30-second video.
+    Structure the response in a JSON object with the following keys, in this order:
     - `keywords`: A comma-separated list of 5 descriptive phrases for video generation. Each phrase should be highly specific and visually detailed, not a single word.
+    - `script`: A full script for a 30-second video.
     
     Example of good keywords:
     "a futuristic cityscape with flying cars and neon lights"
     "a diverse group of people celebrating in slow motion"
     "a close-up shot of a cat's paws playing with a ball of yarn"
     """
-    
+    return [
+        {"role": "system", "content": "You are a professional video script writer."},
+        {"role": "user", "content": prompt}
+    ]
+
+def _save_script(script_text, output_dir):
+    script_file_path = os.path.join(output_dir, "script.txt")
+    with open(script_file_path, 'w') as f:
+        f.write(script_text)
+    print(f"Script saved to {script_file_path}")
+
+def generate_video_script(topic, output_dir="."):
+    """
+    Generates a video script and visual keywords using the OpenAI API.
+    The cleaned script is also saved to script.txt in `output_dir`.
+    """
+    client = get_openai_client()
+
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            response_format={"type": "json_object"},
-            messages=[
-                {"role": "system", "content": "You are a professional video script writer."},
-                {"role": "user", "content": prompt}
-            ]
-        )
+        with span('openai.script', model="gpt-4o-mini") as current:
+            response = resilience.call(
+                'openai', client.chat.completions.create,
+                model="gpt-4o-mini",
+                response_format={"type": "json_object"},
+                messages=_script_messages(topic),
+                trace=current
+            )
+            usage = getattr(response, 'usage', None)
+            if usage is not None:
+                current.set(total_tokens=usage.total_tokens)
         
         script_json = response.choices[0].message.content
         script_data = json.loads(script_json)
@@ -83,11 +332,7 @@ def generate_video_script(topic):
         
         # Call the improved cleaning function before saving the script
         cleaned_script_text = clean_script_text(script_text)
-        
-        script_file_path = "script.txt"
-        with open(script_file_path, 'w') as f:
-            f.write(cleaned_script_text)
-        print(f"Script saved to {script_file_path}")
+        _save_script(cleaned_script_text, output_dir)
 
         return cleaned_script_text, keywords
 
@@ -95,6 +340,122 @@ def generate_video_script(topic):
         print(f"An error occurred with the OpenAI API or during JSON parsing: {e}")
         return None, None
 
+class ScriptStream:
+    """
+    A video script that is still being generated; see stream_video_script().
+
+    The response is read on a background thread. Each keyword phrase is handed to keywords()
+    as soon as it is complete and the script is cleaned as it arrives, so clip generation can
+    start long before the response ends.
+    """
+
+    def __init__(self, topic, output_dir="."):
+        self.topic = topic
+        self.output_dir = output_dir
+        self._keywords = queue.Queue()
+        self._result = (None, None)
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="script-stream", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def keywords(self):
+        """
+        Yields each keyword phrase as soon as it is complete, and returns once the response
+        has ended. Meant for a single consumer, such as generate_runway_clips().
+        """
+        while True:
+            phrase = self._keywords.get()
+            if phrase is None:
+                return
+            yield phrase
+
+    def result(self):
+        """
+        Waits for the whole response and returns (cleaned script text, keywords), like
+        generate_video_script(), or (None, None) if it failed.
+        """
+        self._done.wait()
+        return self._result
+
+    def _run(self):
+        try:
+            self._result = self._generate()
+        except Exception as e:
+            print(f"An error occurred with the OpenAI API or during JSON parsing: {e}")
+        finally:
+            self._keywords.put(None)
+            self._done.set()
+
+    def _generate(self):
+        client = get_openai_client()
+        parser = StreamingJSONObjectParser()
+        cleaner = ScriptCleaner()
+        keywords = []
+        keywords_text = ''  # the keywords string after its last complete phrase
+
+        with span('openai.script', model="gpt-4o-mini", stream=True) as current:
+            start_time = time.perf_counter()
+
+            def add_keyword(phrase):
+                phrase = phrase.strip()
+                if phrase:
+                    if not keywords:
+                        current.set(first_keyword_seconds=time.perf_counter() - start_time)
+                    keywords.append(phrase)
+                    self._keywords.put(phrase)
+
+            # Only opening the stream is retried; a response that breaks off midway fails the script
+            response = resilience.call(
+                'openai', client.chat.completions.create,
+                model="gpt-4o-mini",
+                response_format={"type": "json_object"},
+                messages=_script_messages(self.topic),
+                stream=True,
+                stream_options={"include_usage": True},
+                trace=current
+            )
+            for chunk in response:
+                if getattr(chunk, 'usage', None) is not None:
+                    current.set(total_tokens=chunk.usage.total_tokens)
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                if 'first_token_seconds' not in current.attributes:
+                    current.set(first_token_seconds=time.perf_counter() - start_time)
+
+                for event, key, value in parser.feed(chunk.choices[0].delta.content):
+                    if key == 'script' and event == 'text':
+                        cleaner.feed(value)
+                    elif key == 'keywords' and event == 'text':
+                        *phrases, keywords_text = (keywords_text + value).split(',')
+                        for phrase in phrases:
+                            add_keyword(phrase)
+                    elif key == 'keywords' and event == 'item':
+                        add_keyword(value)
+                    elif key == 'keywords' and event == 'end':
+                        add_keyword(keywords_text)
+                        keywords_text = ''
+
+        if not parser.done:
+            raise ValueError("The response ended before its JSON object was complete.")
+
+        cleaned_script_text = cleaner.close()
+        _save_script(cleaned_script_text, self.output_dir)
+        return cleaned_script_text, keywords
+
+def stream_video_script(topic, output_dir="."):
+    """
+    Starts generating a video script and visual keywords with a streamed OpenAI response,
+    and returns at once.
+
+    Returns:
+        ScriptStream: Iterate keywords() to get each phrase as soon as it is complete; result()
+        waits for the whole script and returns what generate_video_script() does.
+    """
+    return ScriptStream(topic, output_dir=output_dir).start()
+
 if __name__ == '__main__':
     trending_topic = "Why is everyone talking about the new tech gadget?" 
     
@@ -0,0 +1,140 @@
+# pipeline.py
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from tracing import span
+
+class Pipeline:
+    """
+    Runs a set of stages declared as a DAG.
+
+    Each stage is a function whose keyword arguments are named after the stages (or run
+    inputs) it depends on; it receives their results by value and its own return value
+    becomes the artifact named after the stage. Every stage whose dependencies are
+    available is started at once, so independent stages run concurrently.
+
+    A stage fails when it raises or returns a falsy value. No new stages are started after
+    a failure, the ones already running are allowed to finish, and run() returns None.
+    """
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self.stages = {}
+        self.timings = {}
+        self.failed_stage = None
+
+    def add_stage(self, name, func, depends_on=(), description=None):
+        """
+        Declares a stage.
+
+        Args:
+            name (str): The stage name, which is also the name of the artifact it produces.
+            func (callable): Called with one keyword argument per dependency.
+            depends_on (iterable): Names of the stages or run inputs this stage needs.
+            description (str): A human readable label passed to the progress callbacks.
+        """
+        if name in self.stages:
+            raise ValueError(f"Stage '{name}' is already defined.")
+        self.stages[name] = {
+            'func': func,
+            'depends_on': tuple(depends_on),
+            'description': description or name,
+        }
+        return self
+
+    def _check_graph(self, inputs):
+        # Every dependency must be a stage or an input, and the stages must not form a cycle
+        for name, stage in self.stages.items():
+            for dep in stage['depends_on']:
+                if dep not in self.stages and dep not in inputs:
+                    raise ValueError(f"Stage '{name}' depends on unknown stage or input '{dep}'.")
+
+        visiting, done = set(), set(inputs)
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Pipeline has a dependency cycle through '{name}'.")
+            visiting.add(name)
+            for dep in self.stages[name]['depends_on']:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    def run(self, on_stage_start=None, on_stage_done=None, **inputs):
+        """
+        Runs every stage, as many at a time as their dependencies and max_workers allow.
+        Progress callbacks are called from the thread that called run().
+
+        Args:
+            on_stage_start (callable): Called with (name, description) when a stage starts.
+            on_stage_done (callable): Called with (name, description, result) when a stage succeeds.
+            **inputs: Initial artifacts that stages can depend on by name.
+
+        Returns:
+            dict: All artifacts (inputs and stage results) by name, or None if a stage failed.
+        """
+        self._check_graph(inputs)
+        self.timings = {}
+        self.failed_stage = None
+
+        artifacts = dict(inputs)
+        remaining = [name for name in self.stages if name not in artifacts]
+        running = {}  # future -> (stage name, start time)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while running or (remaining and self.failed_stage is None):
+                if self.failed_stage is None:
+                    for name in list(remaining):
+                        stage = self.stages[name]
+                        if not all(dep in artifacts for dep in stage['depends_on']):
+                            continue
+                        remaining.remove(name)
+                        if on_stage_start:
+                            on_stage_start(name, stage['description'])
+                        kwargs = {dep: artifacts[dep] for dep in stage['depends_on']}
+                        running[pool.submit(self._run_stage, name, stage['func'], kwargs)] = (name, time.perf_counter())
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, start_time = running.pop(future)
+                    self.timings[name] = time.perf_counter() - start_time
+                    description = self.stages[name]['description']
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"Stage '{name}' raised an error: {e}")
+                        result = None
+
+                    if not result:
+                        print(f"Stage '{name}' ({description}) failed.")
+                        if self.failed_stage is None:
+                            self.failed_stage = name
+                        continue
+
+                    artifacts[name] = result
+                    if on_stage_done:
+                        on_stage_done(name, description, result)
+
+        if self.failed_stage is not None:
+            return None
+        return artifacts
+
+    @staticmethod
+    def _run_stage(name, func, kwargs):
+        with span(f"stage.{name}") as current:
+            result = func(**kwargs)
+            if not result:
+                current.set(failed=True)
+            return result
+
+    def print_timings(self):
+        """
+        Prints how long each stage took, slowest first.
+        """
+        for name, seconds in sorted(self.timings.items(), key=lambda item: -item[1]):
+            print(f"  {name:<12} {seconds:8.2f}s")
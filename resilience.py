@@ -0,0 +1,361 @@
+# resilience.py
+import os
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+
+# HTTP statuses worth retrying; anything else in the 4xx/5xx range fails straight away
+RETRYABLE_STATUS_CODES = (408, 409, 429, 500, 502, 503, 504)
+
+# A failed call is tried this many times in all, waiting a random time of up to
+# RETRY_BASE_SECONDS * 2 ** attempt (at most RETRY_MAX_SECONDS) between tries, and never less
+# than the provider asked for with Retry-After. A call asked to wait longer than
+# RETRY_MAX_SECONDS gives up instead
+RETRY_ATTEMPTS = int(os.getenv('PROVIDER_RETRY_ATTEMPTS', 5))
+RETRY_BASE_SECONDS = float(os.getenv('PROVIDER_RETRY_BASE_SECONDS', 0.5))
+RETRY_MAX_SECONDS = 30.0
+
+# After this many failures in a row a provider's circuit opens: calls fail at once for
+# BREAKER_RESET_SECONDS, then one trial call decides whether it closes again. 429s are the
+# quota talking, not an outage, so they do not count as failures
+BREAKER_FAILURES = int(os.getenv('PROVIDER_BREAKER_FAILURES', 5))
+BREAKER_RESET_SECONDS = float(os.getenv('PROVIDER_BREAKER_RESET_SECONDS', 30))
+
+class CircuitOpenError(RuntimeError):
+    """
+    Raised instead of calling a provider whose circuit breaker is open.
+    """
+
+    def __init__(self, provider, retry_in):
+        super().__init__(f"{provider} is failing; not calling it for another {retry_in:.1f}s")
+        self.provider = provider
+        self.retry_in = retry_in
+
+class TokenBucket:
+    """
+    Spaces out calls so they never exceed `rate` per second, allowing bursts of `burst`.
+
+    Callers reserve a token and sleep until it is theirs, so waiting threads go in order
+    instead of all waking up at once. pause() holds every caller back, e.g. for a Retry-After,
+    and works with no rate at all.
+    """
+
+    def __init__(self, rate=None, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate or 1))
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()  # the time `tokens` was counted at; later while paused
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        if now > self.updated:
+            if self.rate:
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def acquire(self):
+        """
+        Blocks until the caller may make a call.
+
+        Returns:
+            float: The seconds spent waiting.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = self.updated - now
+            if self.rate:
+                self.tokens -= 1
+                wait += max(0.0, -self.tokens) / self.rate
+        if wait > 0:
+            time.sleep(wait)
+        return max(0.0, wait)
+
+    def pause(self, seconds):
+        """
+        Lets no new call through for `seconds`, and then only at the normal rate.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.updated = max(self.updated, now + seconds)
+            self.tokens = min(self.tokens, 0.0)
+
+class CircuitBreaker:
+    """
+    Counts consecutive failures of a provider and, past `failures`, stops calling it for
+    `reset_seconds` (open). After that a single trial call is let through (half-open): if it
+    succeeds the circuit closes, otherwise it opens again. A trial that never reports back
+    is replaced by another one `reset_seconds` after it started.
+    """
+
+    def __init__(self, failures=BREAKER_FAILURES, reset_seconds=BREAKER_RESET_SECONDS):
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self.state = 'closed'  # closed -> open -> half_open -> closed | open
+        self.consecutive_failures = 0
+        self.opened_at = None  # when the circuit opened, or when the current trial started
+        self._lock = threading.Lock()
+
+    def before_call(self, provider):
+        """
+        Raises CircuitOpenError if the provider must not be called now.
+        """
+        with self._lock:
+            if self.state == 'closed':
+                return
+            now = time.monotonic()
+            retry_in = self.opened_at + self.reset_seconds - now
+            if retry_in <= 0:
+                # Let this one call through as the trial
+                self.state = 'half_open'
+                self.opened_at = now
+                return
+            raise CircuitOpenError(provider, max(0.0, retry_in))
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.consecutive_failures = 0
+
+    def record_inconclusive(self):
+        """
+        Records a call that says nothing about the provider's health, such as a 429. A trial
+        that ends this way opens the circuit again until the next trial.
+        """
+        with self._lock:
+            if self.state == 'half_open':
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def record_failure(self):
+        """
+        Returns:
+            bool: True if this failure opened the circuit.
+        """
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == 'half_open' or (self.state == 'closed' and self.consecutive_failures >= self.failures):
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+class Provider:
+    """
+    The rate limit, circuit breaker and counters of one provider, shared by every thread.
+    """
+
+    def __init__(self, name, rate_limit=None, burst=None, attempts=RETRY_ATTEMPTS,
+                 failures=BREAKER_FAILURES, reset_seconds=BREAKER_RESET_SECONDS):
+        self.name = name
+        self.bucket = TokenBucket(rate_limit, burst)
+        self.breaker = CircuitBreaker(failures, reset_seconds)
+        self.attempts = attempts
+        self.counts = {'calls': 0, 'attempts': 0, 'retries': 0, 'throttled': 0, 'failed': 0, 'rejected': 0}
+        self._lock = threading.Lock()
+
+    def count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def stats(self):
+        with self._lock:
+            return {**self.counts, 'state': self.breaker.state}
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+def _env_float(variable):
+    value = os.getenv(variable)
+    return float(value) if value else None
+
+def get_provider(name):
+    """
+    Returns the shared Provider called `name`, configured from <NAME>_RATE_LIMIT and
+    <NAME>_BURST on first use (no rate limit if unset).
+    """
+    with _providers_lock:
+        provider = _providers.get(name)
+        if provider is None:
+            burst = _env_float(f"{name.upper()}_BURST")
+            provider = _providers[name] = Provider(
+                name, rate_limit=_env_float(f"{name.upper()}_RATE_LIMIT"), burst=int(burst) if burst else None
+            )
+        return provider
+
+def configure(name, **options):
+    """
+    Replaces the provider called `name` with a new one built with `options` (see Provider),
+    e.g. configure('runway', rate_limit=2). Counters start again from zero.
+    """
+    with _providers_lock:
+        _providers[name] = Provider(name, **options)
+        return _providers[name]
+
+def reset():
+    """
+    Forgets every provider, so they are configured from the environment again.
+    """
+    with _providers_lock:
+        _providers.clear()
+
+def stats():
+    """
+    Returns each provider's counters and circuit state.
+    """
+    with _providers_lock:
+        providers = dict(_providers)
+    return {name: provider.stats() for name, provider in providers.items()}
+
+def _error_status(error):
+    """
+    Returns the HTTP status of a provider SDK error, or None if it has none.
+    """
+    status = getattr(error, 'status_code', None)  # openai, runwayml, elevenlabs
+    if status is None and getattr(error, 'resp', None) is not None:  # googleapiclient
+        status = getattr(error.resp, 'status', None)
+    if status is None and getattr(error, 'response', None) is not None:  # requests, httpx
+        status = getattr(error.response, 'status_code', None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def _retry_after(error):
+    """
+    Returns the seconds a provider asked to wait in the Retry-After header of an error, or None.
+    """
+    headers = getattr(error, 'headers', None)
+    if headers is None and getattr(error, 'response', None) is not None:
+        headers = getattr(error.response, 'headers', None)
+    if headers is None and getattr(error, 'resp', None) is not None:
+        headers = error.resp
+    if not headers:
+        return None
+
+    value = None
+    for name in ('retry-after-ms', 'Retry-After-Ms', 'retry-after', 'Retry-After'):
+        if headers.get(name) is not None:
+            value = headers.get(name)
+            break
+    if value is None:
+        return None
+    try:
+        seconds = float(value)
+        return seconds / 1000 if name.lower() == 'retry-after-ms' else seconds
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def _is_connection_error(error):
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    # The SDKs' own connection and timeout errors (APIConnectionError, httpx.ConnectError, ...)
+    return any('Connection' in cls.__name__ or 'Timeout' in cls.__name__ for cls in type(error).__mro__)
+
+def _is_connection_setup_error(error):
+    """
+    True if a request failed before it could reach the provider: the connection was refused or
+    timed out while being set up, so the provider cannot have acted on it.
+    """
+    while error is not None:
+        if isinstance(error, ConnectionRefusedError):
+            return True
+        # httpx.ConnectError/ConnectTimeout, requests' and urllib3's ConnectTimeout/NewConnectionError,
+        # found behind the SDKs' own APIConnectionError as its cause
+        if any(cls.__name__ in ('ConnectError', 'ConnectTimeout', 'NewConnectionError')
+               for cls in type(error).__mro__):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+def call(provider, function, *args, trace=None, idempotent=True, **kwargs):
+    """
+    Calls `function(*args, **kwargs)`, a request to `provider`, within its rate limit and
+    circuit breaker, and retries it after a network error or a retryable status.
+
+    Retries wait a random time with exponential backoff (full jitter), and at least what the
+    provider asked for in Retry-After; if that is more than RETRY_MAX_SECONDS, the call gives
+    up instead of retrying too early. A 429 also pauses the provider's other callers for that time, so
+    the whole process backs off together instead of piling more requests on the quota.
+
+    Args:
+        provider (str): The provider's name, e.g. 'openai'.
+        function (callable): Makes the request.
+        trace (Span): A span to count the retries on.
+        idempotent (bool): Whether the request may be sent again after any retryable failure.
+            A request that is not (e.g. one that starts a paid job) is only retried after a 429
+            or an error setting up the connection, when the provider cannot have acted on it.
+
+    Returns:
+        The function's result.
+
+    Raises:
+        CircuitOpenError: If the provider's circuit is open.
+        Exception: The function's last error once retries are used up, or its first error
+            that is not worth retrying.
+    """
+    provider = get_provider(provider) if isinstance(provider, str) else provider
+    provider.count('calls')
+
+    for attempt in range(provider.attempts):
+        try:
+            provider.breaker.before_call(provider.name)
+        except CircuitOpenError:
+            provider.count('rejected')
+            raise
+        provider.bucket.acquire()
+        provider.count('attempts')
+
+        try:
+            result = function(*args, **kwargs)
+        except Exception as e:
+            status = _error_status(e)
+            transient = status in RETRYABLE_STATUS_CODES if status is not None else _is_connection_error(e)
+            if idempotent:
+                retryable = transient
+            else:
+                retryable = status == 429 if status is not None else _is_connection_setup_error(e)
+            retry_after = _retry_after(e)
+            # Every outcome is recorded, so a trial call never leaves the circuit half-open
+            if status == 429:
+                provider.count('throttled')
+                provider.bucket.pause(retry_after if retry_after is not None else RETRY_BASE_SECONDS)
+                provider.breaker.record_inconclusive()
+            elif transient or (status is not None and status >= 500):
+                if provider.breaker.record_failure():
+                    print(f"  - {provider.name} failed {provider.breaker.consecutive_failures} times in a row; "
+                          f"not calling it for {provider.breaker.reset_seconds:.0f}s")
+            elif status is not None:
+                # A client error: the provider is up and answering
+                provider.breaker.record_success()
+            else:
+                provider.breaker.record_inconclusive()
+
+            if not retryable or attempt + 1 >= provider.attempts:
+                provider.count('failed')
+                raise
+            if retry_after is not None and retry_after > RETRY_MAX_SECONDS:
+                # Retrying any sooner would only be refused again
+                print(f"  - {provider.name} returned {status or type(e).__name__} and asked to wait "
+                      f"{retry_after:.0f}s, longer than {RETRY_MAX_SECONDS:.0f}s; giving up on this call")
+                provider.count('failed')
+                raise
+            provider.count('retries')
+            if trace is not None:
+                trace.add('retries')
+
+            # Retry-After is a floor: callers that were all told the same short wait still spread out
+            delay = max(retry_after or 0.0, random.uniform(0, min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** attempt)))
+            print(f"  - {provider.name} returned {status or type(e).__name__}, retrying in {delay:.1f}s "
+                  f"(attempt {attempt + 2}/{provider.attempts})...")
+            time.sleep(delay)
+            continue
+
+        provider.breaker.record_success()
+        return result
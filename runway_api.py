@@ -1,77 +1,332 @@
 import os
-import requests
+import time
+import queue
 import base64
-from runwayml import RunwayML, TaskFailedError
-from dotenv import load_dotenv
+import random
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
-load_dotenv()
+import resilience
+from asset_cache import asset_key, fetch_asset, store_asset
+from clients import get_runway_client
+from tracing import start_span
 
-def generate_runway_clips(visual_keywords_list, duration=5):
+# We'll use the 'gen3a_turbo' model as it's a powerful and cost-effective option
+RUNWAY_MODEL = 'gen3a_turbo'
+RUNWAY_RATIO = '768:1280'
+
+# Create a 1x1 pixel transparent PNG as a placeholder prompt image
+PLACEHOLDER_IMAGE_URL = "https://placehold.co/1x1.png"
+
+# Runway task states that mean the task will not change any more
+FAILED_TASK_STATUSES = ('FAILED', 'CANCELLED')
+# Runway task states of a task that is still waiting for capacity, before generation starts
+QUEUED_TASK_STATUSES = ('PENDING', 'THROTTLED')
+
+# Seconds between polls of the pending tasks
+POLL_INTERVAL = float(os.getenv('RUNWAY_POLL_INTERVAL', 5))
+
+def _download_and_cache(url, file_path, cache_key, session, quality_gate=None, on_cached=None):
+    """
+    Downloads a finished clip, checks it with `quality_gate` if one is given, and adds it to
+    the asset cache, then calls `on_cached` if it was stored. Rejected clips are deleted and
+    never cached.
+
+    Returns:
+        tuple: The local path (None if the download failed or the clip was rejected) and the
+        list of problems the quality gate found.
+    """
+    from downloader import download_file
+    result = download_file(url, file_path, session=session)
+    if not result:
+        return None, []
+    if quality_gate:
+        problems = quality_gate.check(file_path)
+        if problems:
+            os.remove(file_path)
+            return None, problems
+    if store_asset(cache_key, file_path) and on_cached:
+        on_cached()
+    return file_path, []
+
+def _fetch_similar_clip(clip_library, keywords, settings, file_path, exclude):
+    """
+    Copies the cached clip of the most similar prompt in `clip_library` to `file_path`.
+    Library entries whose clip was evicted from the asset cache are removed on the way.
+
+    Returns:
+        dict: The library match that was used, or None if there is none.
+    """
+    for match in clip_library.find(keywords, settings, exclude=exclude):
+        if fetch_asset(match['key'], file_path):
+            return match
+        clip_library.remove(match['key'])
+    return None
+
+def _report_clip(on_clip_ready, index, future):
+    # Done-callback of a clip download; failed downloads and rejected clips are not reported
+    if not future.exception() and future.result()[0]:
+        on_clip_ready(index, future.result()[0])
+
+def _keyword_feed(visual_keywords):
+    """
+    Returns a queue that receives (index, keywords) for every prompt and then None. Lists are
+    queued at once; any other iterable is read on a background thread as its items arrive.
+    """
+    feed = queue.Queue()
+
+    def fill():
+        try:
+            for item in enumerate(visual_keywords):
+                feed.put(item)
+        finally:
+            feed.put(None)
+
+    if isinstance(visual_keywords, (list, tuple)):
+        fill()
+    else:
+        threading.Thread(target=fill, name="runway-keywords", daemon=True).start()
+    return feed
+
+def generate_runway_clips(visual_keywords_list, duration=5, max_in_flight=3, poll_interval=POLL_INTERVAL, output_dir=".",
+                          on_clip_ready=None, quality_gate=None, max_regenerations=1, clip_library=None):
     """
     Generates multiple short video clips using Runway ML based on a list of keywords.
 
+    Clips that were already generated from the same prompt and settings are copied
+    from the asset cache instead of being generated again. With a `clip_library`, so are
+    clips generated from a prompt similar enough to the new one (see clip_library.py), as long
+    as the video does not already use them.
+
+    Up to `max_in_flight` Runway tasks run at the same time. A single scheduler loop
+    polls every pending task and starts downloading each clip as soon as its task
+    succeeds, so downloads overlap with the generation of the remaining clips.
+
+    Keywords may also arrive over time: pass a generator, such as ScriptStream.keywords(),
+    and each prompt is submitted as soon as it is yielded, while earlier tasks are polled.
+
+    With a `quality_gate` (a clip_quality.ClipQualityGate), every new clip is checked right
+    after its download, in the download thread. A black or frozen clip is generated again with
+    a new seed, up to `max_regenerations` times, and then dropped. Near-duplicates of an
+    earlier clip are dropped at the end.
+
     Args:
-        visual_keywords_list (list): A list of strings with keywords for each clip.
+        visual_keywords_list (iterable): Strings with keywords for each clip.
         duration (int): The duration of each video clip in seconds.
+        max_in_flight (int): The maximum number of Runway tasks running at once.
+        poll_interval (float): Seconds to wait between polls of the pending tasks.
+        output_dir (str or Workspace): The directory the clips are downloaded to.
+        on_clip_ready (callable): Called with (keyword index, local path) as soon as each clip is
+            on disk, possibly from a download thread, so callers can show clips before all are done.
+        quality_gate (ClipQualityGate): Checks the clips before they are used and cached.
+        max_regenerations (int): How many times a rejected clip is generated again.
+        clip_library (ClipLibrary): Looked up for a similar clip before generating one, and
+            told about every new clip.
 
     Returns:
-        list: A list of local file paths for the downloaded video clips.
+        list: A list of local file paths for the downloaded video clips, in keyword order.
+
+    Raises:
+        ValueError: If `max_in_flight` is below 1, since no task could ever start.
     """
-    runway_key = os.getenv('RUNWAYML_API_SECRET')
-    if not runway_key:
-        print("Error: Runway API key not found.")
-        return []
+    if max_in_flight < 1:
+        raise ValueError(f"max_in_flight must be at least 1, got {max_in_flight}.")
+    local_clip_paths = {}  # keyword index -> local path of the clip
+    prompts = {}  # keyword index -> keywords
+    queued = []
+    feed = _keyword_feed(visual_keywords_list)
+    more_keywords = True
 
-    client = RunwayML(api_key=runway_key)
+    client = None
+    session = None
+    pending_tasks = {}  # task id -> (keyword index, cache key)
+    task_spans = {}  # task id -> the 'runway.queue' span, then the 'runway.generate' span
+    downloads = {}  # keyword index -> future of the download
+    checking = []  # (keyword index, cache key, future) of downloads the quality gate may still reject
+    seeds = {}  # keyword index -> seed of its next generation, once a clip was rejected
+    used_keys = set()  # cache keys of the clips in this video, which the library must not offer again
+    # The clip library only offers clips made with the same settings
+    settings = asset_key(
+        'runway_clip_settings', prompt_image=PLACEHOLDER_IMAGE_URL, model=RUNWAY_MODEL, duration=duration,
+        ratio=RUNWAY_RATIO
+    )
+    next_poll = None
 
-    # Create a 1x1 pixel transparent PNG as a placeholder prompt image
-    placeholder_image_url = "https://placehold.co/1x1.png"
+    with ThreadPoolExecutor(max_workers=max(1, max_in_flight)) as download_pool:
+        while more_keywords or queued or pending_tasks or checking:
+            # Clips the quality gate rejected are generated again with a new seed
+            for entry in [entry for entry in checking if entry[2].done()]:
+                checking.remove(entry)
+                i, cache_key, future = entry
+                problems = [] if future.exception() else future.result()[1]
+                if not problems:
+                    continue
+                attempt = len(seeds.setdefault(i, [])) + 1
+                if attempt > max_regenerations:
+                    print(f"  - Dropping the clip for: '{prompts[i]}' ({', '.join(problems)}).")
+                    continue
+                print(f"  - Rejected the clip for: '{prompts[i]}' ({', '.join(problems)}), generating it again...")
+                seeds[i].append(random.randrange(2 ** 32))
+                queued.append((i, prompts[i], cache_key))
 
-    clip_urls = []
-    print("Starting video generation with Runway ML...")
+            # Take the keywords that have arrived. With a free slot to fill there is no waiting,
+            # with tasks pending the wait ends when their next poll is due, with clips being
+            # checked it lasts a poll interval, and otherwise until the next keyword comes
+            if queued and len(pending_tasks) < max_in_flight:
+                timeout = 0
+            elif pending_tasks:
+                timeout = max(0, next_poll - time.monotonic())
+            elif checking:
+                timeout = poll_interval
+            else:
+                timeout = None
+            while more_keywords:
+                try:
+                    item = feed.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                timeout = 0
+                if item is None:
+                    more_keywords = False
+                    break
 
-    for keywords in visual_keywords_list:
-        print(f"  - Generating clip for: '{keywords}'...")
-        try:
-            # We'll use the 'gen3a_turbo' model as it's a powerful and cost-effective option
-            task = client.image_to_video.create(
-                model='gen3a_turbo',
-                prompt_image=placeholder_image_url,
-                prompt_text=keywords,
-                duration=duration,
-                ratio='768:1280'
-            ).wait_for_task_output()
-            
-            # The task object now contains the final output directly
-            video_url = task.output[0]
-            clip_urls.append(video_url)
-            print(f"  - Clip generated successfully. URL: {video_url}")
-
-        except TaskFailedError as e:
-            print(f"  - Video generation failed for this prompt.")
-            print(f"  - Error details: {e.task_details}")
-        except Exception as e:
-            print(f"An unexpected error occurred with the Runway API: {e}")
-
-    # Now, download the generated clips to the local machine
-    local_clip_paths = []
-    if clip_urls:
-        print("\nDownloading generated clips...")
-        for i, url in enumerate(clip_urls):
-            file_path = f"runway_clip_{i+1}.mp4"
-            try:
-                response = requests.get(url, stream=True)
-                if response.status_code == 200:
-                    with open(file_path, "wb") as f:
-                        f.write(response.content)
-                    local_clip_paths.append(file_path)
-                    print(f"  - Downloaded to {file_path}")
+                i, keywords = item
+                prompts[i] = keywords
+                cache_key = asset_key(
+                    'runway_clip',
+                    prompt_text=keywords,
+                    prompt_image=PLACEHOLDER_IMAGE_URL,
+                    model=RUNWAY_MODEL,
+                    duration=duration,
+                    ratio=RUNWAY_RATIO
+                )
+                file_path = os.path.join(output_dir, f"runway_clip_{i+1}.mp4")
+                used_keys.add(cache_key)
+                cached_path = fetch_asset(cache_key, file_path)
+                match = None
+                if cached_path:
+                    print(f"  - Reusing cached clip for: '{keywords}' -> {cached_path}")
+                    if clip_library is not None:
+                        # Clips cached before the library existed join it as they are used
+                        clip_library.add(keywords, cache_key, settings)
+                elif clip_library is not None:
+                    match = _fetch_similar_clip(clip_library, keywords, settings, file_path, used_keys)
+                if match:
+                    used_keys.add(match['key'])
+                    cached_path = file_path
+                    print(f"  - Reusing the clip of '{match['prompt']}' for: '{keywords}' "
+                          f"(similarity {match['similarity']:.2f}) -> {cached_path}")
+                if cached_path:
+                    local_clip_paths[i] = cached_path
+                    if on_clip_ready:
+                        on_clip_ready(i, cached_path)
                 else:
-                    print(f"  - Failed to download clip from {url}. Status code: {response.status_code}")
-            except Exception as e:
-                print(f"  - Error downloading clip: {e}")
+                    queued.append((i, keywords, cache_key))
+
+            if queued and client is None:
+                client = get_runway_client()
+                if not client:
+                    print("Error: Runway API key not found.")
+                    return []
+                print("Starting video generation with Runway ML...")
+                # Downloads share one pooled session so consecutive clips reuse connections
+                from downloader import get_session
+                session = get_session()
+
+            # Fill the free slots with new tasks
+            while queued and len(pending_tasks) < max_in_flight:
+                i, keywords, cache_key = queued.pop(0)
+                print(f"  - Generating clip for: '{keywords}'...")
+                queue_span = start_span('runway.queue', lane=f"runway clip {i+1}", prompt=keywords)
+                # A regenerated clip keeps its cache key, so the accepted clip is what gets reused
+                seed_option = {'seed': seeds[i][-1]} if seeds.get(i) else {}
+                try:
+                    # Sending the create again after a lost response would start a second paid
+                    # generation, so it is only retried when Runway cannot have accepted it
+                    task = resilience.call(
+                        'runway', client.image_to_video.create,
+                        idempotent=False,
+                        model=RUNWAY_MODEL,
+                        prompt_image=PLACEHOLDER_IMAGE_URL,
+                        prompt_text=keywords,
+                        duration=duration,
+                        ratio=RUNWAY_RATIO,
+                        trace=queue_span,
+                        **seed_option
+                    )
+                    pending_tasks[task.id] = (i, cache_key)
+                    task_spans[task.id] = queue_span
+                except Exception as e:
+                    print(f"An unexpected error occurred with the Runway API: {e}")
+                    queue_span.end(error=e)
+
+            if not pending_tasks:
+                next_poll = None
+                if checking and not queued and not more_keywords:
+                    # Only clip checks are left; wait for one of them
+                    wait([future for _, _, future in checking], return_when=FIRST_COMPLETED)
+                continue
+
+            if next_poll is None:
+                next_poll = time.monotonic() + poll_interval
+            if more_keywords and time.monotonic() < next_poll:
+                # Not due yet; keep taking keywords until it is
+                continue
+            time.sleep(max(0, next_poll - time.monotonic()))
+            next_poll = time.monotonic() + poll_interval
+
+            for task_id, (i, cache_key) in list(pending_tasks.items()):
+                try:
+                    task = resilience.call('runway', client.tasks.retrieve, task_id, trace=task_spans[task_id])
+                except Exception as e:
+                    print(f"An unexpected error occurred with the Runway API: {e}")
+                    del pending_tasks[task_id]
+                    task_spans.pop(task_id).end(error=e)
+                    continue
+
+                # Split the task's time into waiting for capacity and generating
+                task_span = task_spans[task_id].add('polls')
+                if task_span.name == 'runway.queue' and task.status not in QUEUED_TASK_STATUSES:
+                    task_span.end()
+                    task_span = task_spans[task_id] = start_span('runway.generate', lane=task_span.lane)
+
+                if task.status == 'SUCCEEDED':
+                    del pending_tasks[task_id]
+                    task_spans.pop(task_id).end()
+                    # The task object now contains the final output directly
+                    video_url = task.output[0]
+                    print(f"  - Clip generated successfully. URL: {video_url}")
+                    file_path = os.path.join(output_dir, f"runway_clip_{i+1}.mp4")
+                    on_cached = None
+                    if clip_library is not None:
+                        on_cached = functools.partial(clip_library.add, prompts[i], cache_key, settings)
+                    downloads[i] = download_pool.submit(
+                        _download_and_cache, video_url, file_path, cache_key, session, quality_gate, on_cached
+                    )
+                    if quality_gate:
+                        checking.append((i, cache_key, downloads[i]))
+                    if on_clip_ready:
+                        downloads[i].add_done_callback(functools.partial(_report_clip, on_clip_ready, i))
+                elif task.status in FAILED_TASK_STATUSES:
+                    del pending_tasks[task_id]
+                    task_spans.pop(task_id).end(error=task.status)
+                    print(f"  - Video generation failed for: '{prompts[i]}'.")
+                    print(f"  - Error details: {getattr(task, 'failure', task.status)}")
+
+        for i, future in downloads.items():
+            file_path, _ = future.result()
+            if file_path:
+                local_clip_paths[i] = file_path
 
-    return local_clip_paths
+    # Return the clips in keyword order, skipping the ones that failed
+    clip_paths = [local_clip_paths[i] for i in sorted(local_clip_paths)]
+    if quality_gate and len(clip_paths) > 1:
+        duplicates = quality_gate.duplicates(clip_paths)
+        for path in duplicates:
+            print(f"  - Dropping {path}, a near-duplicate of an earlier clip.")
+        clip_paths = [path for path in clip_paths if path not in duplicates]
+    return clip_paths
 
 if __name__ == '__main__':
     keywords_from_openai = ["futuristic cyberpunk city"]
@@ -79,4 +334,4 @@ if __name__ == '__main__':
     if downloaded_clips:
         print("\nAll Runway clips are ready for assembly:", downloaded_clips)
     else:
-        print("\nNo Runway clips were generated or downloaded.")
\ No newline at end of file
+        print("\nNo Runway clips were generated or downloaded.")
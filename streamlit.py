@@ -1,16 +1,86 @@
 # streamlit_app.py
 import streamlit as st
-import os
-import json
-import ffmpeg
-
-# Import all our custom modules
-from youtube_scraper import get_trending_topic
-from openai_script import generate_video_script
-from elevenlabs_api import generate_voiceover
-from runway_api import generate_runway_clips
-from video_editor import assemble_video
-from category_selector import get_category_id_from_prompt
+
+from jobs import JobRunner
+
+# How many videos are made at once across every session, and how often running jobs are polled
+MAX_CONCURRENT_JOBS = 2
+POLL_SECONDS = 1.0
+
+# Messages shown when a stage fails
+FAILURE_MESSAGES = {
+    'category': "❌ Failed to identify a suitable YouTube category. Please try a different prompt.",
+    'topic': "❌ Failed to find a trending topic.",
+    'script': "❌ Failed to generate script.",
+    'voiceover': "❌ Failed to generate voiceover.",
+    'clips': "❌ No video clips were generated.",
+    'video': "❌ An error occurred during video assembly.",
+}
+
+@st.cache_resource
+def get_job_runner():
+    # One runner (and worker pool) per server process, shared by every session
+    return JobRunner(max_workers=MAX_CONCURRENT_JOBS, preview=True)
+
+def show_job(runner, job):
+    """
+    Shows a job's progress and every artifact it has produced so far.
+    """
+    artifacts = job['artifacts']
+    with st.container(border=True):
+        st.markdown(f"**{job['user_prompt']}**")
+
+        if job['status'] == 'queued':
+            st.info(f"⏳ Waiting for a free worker ({runner.queue_position(job['id'])} jobs ahead)...")
+        elif job['status'] == 'running':
+            st.info(f"{' | '.join(job['running_stages']) or 'Working'}...")
+        elif job['status'] == 'failed':
+            if job['error']:
+                st.error(f"An unexpected error occurred: {job['error']}")
+            else:
+                st.error(FAILURE_MESSAGES.get(job['failed_stage'], "❌ Video generation failed."))
+
+        if 'category' in artifacts:
+            st.success(f"✅ Found a relevant category ID: {artifacts['category']}")
+        if 'topic' in artifacts:
+            st.success(f"✅ Found trending topic: '{artifacts['topic']}'")
+        if 'script' in artifacts:
+            with st.expander("✅ Script and keywords generated."):
+                st.write(artifacts['script']['text'])
+                st.caption(", ".join(artifacts['script']['keywords']))
+        if 'voiceover' in artifacts:
+            st.audio(artifacts['voiceover'], format="audio/mpeg")
+        if artifacts['clips']:
+            columns = st.columns(max(4, len(artifacts['clips'])))
+            for column, index in zip(columns, sorted(artifacts['clips'])):
+                thumbnail = artifacts['clips'][index]
+                if thumbnail:
+                    column.image(thumbnail, caption=f"Clip {index + 1}")
+        if 'video' in artifacts:
+            st.video(artifacts['video'])
+            st.markdown("### 🎉 Your video is ready!")
+        elif 'preview' in artifacts:
+            # The low-resolution preview stands in until the full-quality video replaces it
+            st.video(artifacts['preview'])
+            st.caption("Preview: the full-quality video is still rendering...")
+
+def show_jobs():
+    """
+    Shows this session's jobs, newest first. While any of them is unfinished this runs as a
+    fragment that polls every POLL_SECONDS, so only this part of the page is redrawn.
+    """
+    runner = get_job_runner()
+    jobs = [job.snapshot() for job in map(runner.get, st.session_state.job_ids) if job]
+    unfinished = {job['id'] for job in jobs if job['status'] in ('queued', 'running')}
+
+    for job in reversed(jobs):
+        show_job(runner, job)
+
+    # Once the last job finishes, rerun the whole page so the polling stops
+    if st.session_state.unfinished_jobs and not unfinished:
+        st.session_state.unfinished_jobs = unfinished
+        st.rerun()
+    st.session_state.unfinished_jobs = unfinished
 
 # Main Streamlit UI
 st.set_page_config(page_title="AI Viral Video Maker", layout="wide")
@@ -18,6 +88,10 @@ st.title("📹 AI Viral Video Maker")
 st.subheader("Turn your ideas into videos using AI")
 st.markdown("---")
 
+st.session_state.setdefault('job_ids', [])
+st.session_state.setdefault('unfinished_jobs', set())
+st.session_state.setdefault('celebrated_jobs', set())
+
 # User input prompt
 user_prompt = st.text_input(
     "What kind of video do you want to make?",
@@ -25,62 +99,20 @@ user_prompt = st.text_input(
     key="user_prompt_input"
 )
 
-# Start button
+# Start button: the job runs in the background, so more videos can be queued right away
 if st.button("Generate Video!", key="generate_button"):
     if not user_prompt:
         st.error("Please enter a video idea to get started.")
-        st.stop()
-    
-    # Use a Streamlit placeholder to display status updates
-    status_placeholder = st.empty()
-
-    try:
-        status_placeholder.info("1. Identifying the best YouTube category for your idea...")
-        
-        # New function call to get the dynamic category ID
-        category_id = get_category_id_from_prompt(user_prompt)
-        if not category_id:
-            st.error("❌ Failed to identify a suitable YouTube category. Please try a different prompt.")
-            st.stop()
-        
-        status_placeholder.info(f"2. Found a relevant category ID: {category_id}. Scraping trending videos...")
-        trending_topic = get_trending_topic(category_id=category_id)
-        if not trending_topic:
-            st.error("❌ Failed to find a trending topic.")
-            st.stop()
-        status_placeholder.success(f"✅ Found trending topic: '{trending_topic}'")
-
-        status_placeholder.info("3. Generating video script and visual keywords with OpenAI...")
-        script_text, keywords = generate_video_script(trending_topic)
-        if not script_text or not keywords:
-            st.error("❌ Failed to generate script.")
-            st.stop()
-        status_placeholder.success(f"✅ Script and keywords generated.")
-
-        status_placeholder.info("4. Generating voiceover with ElevenLabs...")
-        audio_path = generate_voiceover(script_text)
-        if not audio_path:
-            st.error("❌ Failed to generate voiceover.")
-            st.stop()
-        status_placeholder.success(f"✅ Voiceover saved to '{audio_path}'")
-        
-        status_placeholder.info("5. Generating video clips from keywords with Runway ML...")
-        video_paths = generate_runway_clips(keywords)
-        if not video_paths:
-            st.error("❌ No video clips were generated.")
-            st.stop()
-        status_placeholder.success(f"✅ Generated {len(video_paths)} clips.")
-
-        status_placeholder.info("6. Assembling final video with FFmpeg...")
-        final_video_path = assemble_video(video_paths, audio_path, "script.txt")
-        
-        if final_video_path:
-            status_placeholder.success("✅ Final video assembly complete!")
-            st.video(final_video_path)
-            st.balloons()
-            st.markdown(f"### 🎉 Your video is ready!")
-        else:
-            st.error("❌ An error occurred during video assembly.")
-
-    except Exception as e:
-        st.error(f"An unexpected error occurred: {e}")
\ No newline at end of file
+    else:
+        job_id = get_job_runner().submit(user_prompt)
+        st.session_state.job_ids.append(job_id)
+        st.session_state.unfinished_jobs = st.session_state.unfinished_jobs | {job_id}
+
+# Celebrate each finished video once
+for job_id in st.session_state.job_ids:
+    job = get_job_runner().get(job_id)
+    if job and job.status == 'done' and job_id not in st.session_state.celebrated_jobs:
+        st.session_state.celebrated_jobs.add(job_id)
+        st.balloons()
+
+st.fragment(show_jobs, run_every=POLL_SECONDS if st.session_state.unfinished_jobs else None)()
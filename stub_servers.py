@@ -0,0 +1,781 @@
+# stub_servers.py
+import os
+import re
+import glob
+import json
+import time
+import random
+import shutil
+import hashlib
+import argparse
+import tempfile
+import itertools
+import functools
+import threading
+from urllib.parse import urlsplit, parse_qs, unquote
+from http.server import BaseHTTPRequestHandler, SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Size of the pieces sent while answering a Range request
+CHUNK_SIZE = 1024 * 1024
+
+# What the OpenAI stand-in answers with: the committed script, and keywords in the shape the real prompt asks for
+STUB_KEYWORDS = [
+    "a futuristic cityscape with flying cars and neon lights",
+    "a diverse group of people celebrating in slow motion",
+    "a close-up shot of a cat's paws playing with a ball of yarn",
+    "a drone shot over a misty mountain lake at sunrise",
+    "a chef plating a colorful dish in a busy kitchen",
+]
+# The OpenAI stand-in counts this many characters of its answers as one token
+STUB_CHARACTERS_PER_TOKEN = 4
+# The ElevenLabs stand-in speaks this many characters per second of audio
+STUB_CHARACTERS_PER_SECOND = 15
+
+# The Runway stand-in serves this all-black clip for the share of tasks set by runway_black_clip_rate
+STUB_BLACK_CLIP_NAME = "stub_black_clip.mp4"
+
+STUB_TRENDING_TITLES = [
+    "I Tried Every Viral Gadget So You Don't Have To",
+    "Dogs Meeting Their Owners After A Year",
+    "The Fastest Way To Learn Anything",
+    "Building A Tiny House In 48 Hours",
+]
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """
+    Static file handler that also answers single-range `Range: bytes=N-M` requests (honouring
+    If-Range), which http.server does not do on its own. Used to exercise resumable downloads locally.
+    """
+
+    def send_head(self):
+        range_header = self.headers.get("Range")
+        path = self.translate_path(self.path)
+        if not range_header or not range_header.startswith("bytes=") or not os.path.isfile(path):
+            return super().send_head()
+        last_modified = self.date_time_string(int(os.path.getmtime(path)))
+        if self.headers.get("If-Range", last_modified) != last_modified:
+            # The file changed since the client's copy, so it gets the whole file
+            return super().send_head()
+
+        size = os.path.getsize(path)
+        first, _, last = range_header[len("bytes="):].partition("-")
+        first = int(first) if first else 0
+        last = min(int(last), size - 1) if last else size - 1
+        if first >= size:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return None
+
+        f = open(path, "rb")
+        f.seek(first)
+        self._range_remaining = last - first + 1
+        self.send_response(206)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Range", f"bytes {first}-{last}/{size}")
+        self.send_header("Content-Length", str(self._range_remaining))
+        self.send_header("Last-Modified", last_modified)
+        self.end_headers()
+        return f
+
+    def copyfile(self, source, outputfile):
+        remaining = getattr(self, "_range_remaining", None)
+        if remaining is None:
+            return super().copyfile(source, outputfile)
+        self._range_remaining = None
+        while remaining > 0:
+            data = source.read(min(CHUNK_SIZE, remaining))
+            if not data:
+                break
+            outputfile.write(data)
+            remaining -= len(data)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve_directory(directory, host="127.0.0.1", port=0):
+    """
+    Serves `directory` over HTTP (with Range support) from a background thread.
+
+    Returns:
+        tuple: The server, to shut down when done, and its base URL.
+    """
+    handler = functools.partial(RangeRequestHandler, directory=directory)
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+class ProviderBehavior:
+    """
+    How one stand-in provider behaves under load: a delay before every response, a share of
+    requests that fail with a 503, and an optional token-bucket rate limit that answers 429
+    with a Retry-After header once `rate_limit` requests per second (bursts of `burst`) are used up.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, rate_limit=None, burst=None, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.burst = burst or max(1, int(rate_limit or 1))
+        self.random = random.Random(seed)
+        self.tokens = float(self.burst)
+        self.refilled_at = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def admit(self):
+        """
+        Applies the behavior to one request.
+
+        Returns:
+            tuple: (status, retry_after) for a request that must be refused, or None to answer it.
+        """
+        with self._lock:
+            self.requests += 1
+            if self.rate_limit:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.refilled_at) * self.rate_limit)
+                self.refilled_at = now
+                if self.tokens < 1:
+                    self.throttled += 1
+                    return 429, (1 - self.tokens) / self.rate_limit
+                self.tokens -= 1
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            failed = self.random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        time.sleep(delay)
+        return (503, None) if failed else None
+
+    def stats(self):
+        with self._lock:
+            return {'requests': self.requests, 'errors': self.errors, 'throttled': self.throttled}
+
+def youtube_discovery_document(root_url):
+    """
+    A discovery document for just the part of the YouTube Data API v3 the pipeline uses
+    (videos.list), pointing at `root_url`. googleapiclient builds a working service from it.
+    """
+    query = {'type': 'string', 'location': 'query'}
+    return {
+        'kind': 'discovery#restDescription',
+        'discoveryVersion': 'v1',
+        'id': 'youtube:v3',
+        'name': 'youtube',
+        'version': 'v3',
+        'protocol': 'rest',
+        'rootUrl': root_url,
+        'servicePath': 'youtube/v3/',
+        'baseUrl': f"{root_url}youtube/v3/",
+        'batchPath': 'batch',
+        'parameters': {'key': query, 'alt': {**query, 'default': 'json'}},
+        'schemas': {'VideoListResponse': {'id': 'VideoListResponse', 'type': 'object'}},
+        'resources': {
+            'videos': {
+                'methods': {
+                    'list': {
+                        'id': 'youtube.videos.list',
+                        'path': 'videos',
+                        'flatPath': 'videos',
+                        'httpMethod': 'GET',
+                        'parameters': {
+                            'part': {**query, 'required': True, 'repeated': True},
+                            'chart': query,
+                            'regionCode': query,
+                            'videoCategoryId': query,
+                            'maxResults': {'type': 'integer', 'location': 'query'},
+                        },
+                        'parameterOrder': ['part'],
+                        'response': {'$ref': 'VideoListResponse'},
+                    }
+                }
+            }
+        },
+    }
+
+class ProviderRequestHandler(RangeRequestHandler):
+    """
+    Answers the provider endpoints the pipeline calls, under one prefix per provider:
+
+        POST /openai/v1/chat/completions   (also streamed as server-sent events)
+        POST /elevenlabs/v1/text-to-speech/<voice_id>[/stream]
+        POST /runway/v1/image_to_video, GET /runway/v1/tasks/<id>
+        GET  /youtube/youtube/v3/videos, GET /youtube/discovery/v1/apis/youtube/v3/rest
+        GET  /files/<name>   (the payloads, with Range support)
+    """
+
+    def translate_path(self, path):
+        # Only /files/ maps onto the payload directory, apart from the generated black clip
+        if not path.startswith("/files/"):
+            return os.path.join(self.directory, ".no-such-file")
+        if urlsplit(path).path == f"/files/{STUB_BLACK_CLIP_NAME}" and self.server.stubs.black_clip_path:
+            return self.server.stubs.black_clip_path
+        return super().translate_path(path[len("/files"):])
+
+    def _send_json(self, body, status=200, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _admit(self, provider):
+        refused = self.server.stubs.behaviors[provider].admit()
+        if refused is None:
+            return True
+        status, retry_after = refused
+        headers = {"Retry-After": f"{retry_after:.3f}"} if retry_after is not None else {}
+        self._send_json({"error": {"message": f"stub {provider} refused the request", "code": status}},
+                        status=status, headers=headers)
+        return False
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        stubs = self.server.stubs
+        if path.startswith("/files/"):
+            return super().do_GET()
+        if path == "/youtube/discovery/v1/apis/youtube/v3/rest":
+            return self._send_json(youtube_discovery_document(f"{stubs.base_url}/youtube/"))
+        if path == "/youtube/youtube/v3/videos":
+            if self._admit('youtube'):
+                self._send_json(stubs.trending_videos(parse_qs(urlsplit(self.path).query)))
+            return
+        match = re.fullmatch(r"/runway/v1/tasks/([\w-]+)", path)
+        if match:
+            if self._admit('runway'):
+                task = stubs.runway_task(match.group(1))
+                self._send_json(task or {"error": "Task not found"}, status=200 if task else 404)
+            return
+        self._send_json({"error": f"No stub for GET {path}"}, status=404)
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        stubs = self.server.stubs
+        body = self._read_json()
+        if path == "/openai/v1/chat/completions":
+            if self._admit('openai'):
+                if body.get('stream'):
+                    self._stream_chat_completion(body)
+                else:
+                    completion = stubs.chat_completion(body)
+                    time.sleep(stubs.generation_seconds(completion['choices'][0]['message']['content']))
+                    self._send_json(completion)
+            return
+        if re.fullmatch(r"/elevenlabs/v1/text-to-speech/[\w-]+(/stream)?", path):
+            if self._admit('elevenlabs'):
+                output_format = parse_qs(urlsplit(self.path).query).get('output_format', ['mp3_44100_128'])[0]
+                self._stream_speech(body.get('text', ''), output_format)
+            return
+        if path == "/runway/v1/image_to_video":
+            if self._admit('runway'):
+                self._send_json({"id": stubs.create_runway_task()})
+            return
+        self._send_json({"error": f"No stub for POST {path}"}, status=404)
+
+    def _stream_chat_completion(self, body):
+        """
+        Sends the completion as `chat.completion.chunk` server-sent events of one token each,
+        paced at openai_tokens_per_second, then the usage (if asked for) and [DONE].
+        """
+        stubs = self.server.stubs
+        completion = stubs.chat_completion(body)
+        content = completion['choices'][0]['message']['content']
+        header = {key: completion[key] for key in ('id', 'created', 'model')}
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        def send(data):
+            self.wfile.write(f"data: {data}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        pieces = [content[k:k + STUB_CHARACTERS_PER_TOKEN] for k in range(0, len(content), STUB_CHARACTERS_PER_TOKEN)]
+        for number, piece in enumerate(pieces):
+            time.sleep(stubs.generation_seconds(piece))
+            delta = {'role': 'assistant', 'content': piece} if number == 0 else {'content': piece}
+            send(json.dumps({**header, 'object': 'chat.completion.chunk',
+                             'choices': [{'index': 0, 'delta': delta, 'finish_reason': None}]}))
+        send(json.dumps({**header, 'object': 'chat.completion.chunk',
+                         'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]}))
+        if (body.get('stream_options') or {}).get('include_usage'):
+            send(json.dumps({**header, 'object': 'chat.completion.chunk', 'choices': [], 'usage': completion['usage']}))
+        send("[DONE]")
+
+    def _stream_speech(self, text, output_format):
+        """
+        Streams speech for `text`: the committed voiceover.mp3 as it is, or for pcm_<rate>
+        formats, raw PCM as long as the text takes to say, cut from the decoded voiceover.
+        With tts_realtime_factor set, the stream is paced as if it were being synthesized.
+        """
+        stubs = self.server.stubs
+        speech_seconds = max(0.5, len(text) / STUB_CHARACTERS_PER_SECOND)
+        if output_format.startswith("pcm_"):
+            audio = stubs.speech_pcm(int(output_format.split("_")[1]), speech_seconds)
+            content_type = "audio/pcm"
+        else:
+            with open(stubs.voiceover_path, "rb") as f:
+                audio = f.read()
+            content_type = "audio/mpeg"
+
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(audio)))
+        self.end_headers()
+        seconds_per_byte = speech_seconds * stubs.tts_realtime_factor / max(1, len(audio))
+        for offset in range(0, len(audio), stubs.tts_chunk_size):
+            piece = audio[offset:offset + stubs.tts_chunk_size]
+            time.sleep(len(piece) * seconds_per_byte)
+            self.wfile.write(piece)
+            self.wfile.flush()
+
+class StubProviders:
+    """
+    Local stand-ins for OpenAI, ElevenLabs, Runway and the YouTube Data API on one HTTP server,
+    so the pipeline can be benchmarked and load-tested without spending money.
+
+    They answer with the committed payloads: script.txt (with a per-request suffix, so every
+    video has its own voiceover and clips and the asset cache does not short-circuit a
+    benchmark), voiceover.mp3 and runway_clip_*.mp4. Point the clients at them with
+    environment():
+
+        with StubProviders(runway=ProviderBehavior(error_rate=0.1)) as stubs:
+            os.environ.update(stubs.environment())
+            ...
+    """
+
+    def __init__(self, payload_dir=REPO_DIR, openai=None, elevenlabs=None, runway=None, youtube=None,
+                 runway_queue_seconds=1.0, runway_generation_seconds=4.0, runway_failure_rate=0.0, runway_black_clip_rate=0.0,
+                 tts_chunk_size=16 * 1024, tts_realtime_factor=0.0, openai_tokens_per_second=None, category_id='24',
+                 host="127.0.0.1", port=0, seed=None):
+        """
+        Args:
+            payload_dir (str): Where script.txt, voiceover.mp3 and runway_clip_*.mp4 are read from.
+            openai, elevenlabs, runway, youtube (ProviderBehavior): Latency, errors and rate limit of
+                each provider. Default: answer at once.
+            runway_queue_seconds (float): How long a Runway task stays PENDING.
+            runway_generation_seconds (float): How long it then stays RUNNING.
+            runway_failure_rate (float): Share of Runway tasks that end FAILED instead of SUCCEEDED.
+            runway_black_clip_rate (float): Share of Runway tasks that succeed with an all-black clip,
+                for exercising the clip quality gate.
+            tts_chunk_size (int): Bytes per chunk of the streamed voiceover.
+            tts_realtime_factor (float): Seconds the ElevenLabs stand-in takes to stream each
+                second of speech, to mimic synthesis time (e.g. 0.3).
+            openai_tokens_per_second (float): How fast the OpenAI stand-in writes its answers, streamed
+                or not (e.g. 60). Default: at once.
+            category_id (str): The YouTube category the OpenAI stand-in picks.
+            seed (int): Seed for the random latency, errors and task failures.
+        """
+        self.voiceover_path = os.path.join(payload_dir, "voiceover.mp3")
+        with open(os.path.join(payload_dir, "script.txt")) as f:
+            self.script_text = f.read().strip()
+        self.clip_names = sorted(os.path.basename(p) for p in glob.glob(os.path.join(payload_dir, "runway_clip_*.mp4")))
+
+        self.behaviors = {}
+        for offset, (name, behavior) in enumerate(
+                (('openai', openai), ('elevenlabs', elevenlabs), ('runway', runway), ('youtube', youtube))):
+            behavior = behavior or ProviderBehavior()
+            if seed is not None:
+                behavior.random.seed(seed + offset)
+            self.behaviors[name] = behavior
+
+        self.runway_queue_seconds = runway_queue_seconds
+        self.runway_generation_seconds = runway_generation_seconds
+        self.runway_failure_rate = runway_failure_rate
+        self.runway_black_clip_rate = runway_black_clip_rate
+        self.black_clip_path = self._make_black_clip() if runway_black_clip_rate else None
+        self.tts_chunk_size = tts_chunk_size
+        self.tts_realtime_factor = tts_realtime_factor
+        self.openai_tokens_per_second = openai_tokens_per_second
+        self._decoded_voiceover = {}  # sample rate -> PCM of voiceover.mp3
+        self.category_id = category_id
+        self.random = random.Random(seed)
+
+        self._requests = itertools.count(1)
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+        handler = functools.partial(ProviderRequestHandler, directory=payload_dir)
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.server.stubs = self
+        self.base_url = f"http://{host}:{self.server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.black_clip_path:
+            shutil.rmtree(os.path.dirname(self.black_clip_path), ignore_errors=True)
+
+    @staticmethod
+    def _make_black_clip(seconds=5):
+        import ffmpeg
+        path = os.path.join(tempfile.mkdtemp(prefix="stub-clips-"), STUB_BLACK_CLIP_NAME)
+        (
+            ffmpeg
+            .input(f"color=black:s=768x1280:r=24:d={seconds}", f='lavfi')
+            .output(path, vcodec='libx264', pix_fmt='yuv420p')
+            .run(capture_stdout=True, capture_stderr=True)
+        )
+        return path
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def environment(self):
+        """
+        Returns the environment variables that point clients.py at the stand-ins.
+        """
+        return {
+            'OPENAI_API_KEY': 'stub', 'OPENAI_BASE_URL': f"{self.base_url}/openai/v1",
+            'ELEVENLABS_API_KEY': 'stub', 'ELEVENLABS_BASE_URL': f"{self.base_url}/elevenlabs",
+            'RUNWAYML_API_SECRET': 'stub', 'RUNWAYML_BASE_URL': f"{self.base_url}/runway",
+            'YOUTUBE_API_KEY': 'stub', 'YOUTUBE_API_URL': f"{self.base_url}/youtube",
+        }
+
+    def stats(self):
+        """
+        Returns the request, error and 429 counts of every provider.
+        """
+        return {name: behavior.stats() for name, behavior in self.behaviors.items()}
+
+    def chat_completion(self, body):
+        number = next(self._requests)
+        messages = body.get('messages', [])
+        if any('category' in message.get('content', '') for message in messages if message.get('role') == 'system'):
+            content = self.category_id
+        else:
+            # Keywords first, in the order the script prompt asks for
+            content = json.dumps({
+                'keywords': ", ".join(f"{keywords} (take {number})" for keywords in STUB_KEYWORDS),
+                'script': f"{self.script_text} Thanks for watching video number {number}!",
+            })
+        return {
+            'id': f"chatcmpl-stub-{number}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'stub'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': len(content) // 4, 'total_tokens': len(content) // 4},
+        }
+
+    def generation_seconds(self, content):
+        """
+        Returns how long the OpenAI stand-in takes to write `content`.
+        """
+        if not self.openai_tokens_per_second:
+            return 0.0
+        return len(content) / STUB_CHARACTERS_PER_TOKEN / self.openai_tokens_per_second
+
+    def speech_pcm(self, sample_rate, seconds):
+        """
+        Returns `seconds` of 16-bit mono PCM at `sample_rate`, looping the decoded voiceover.
+        """
+        with self._lock:
+            pcm = self._decoded_voiceover.get(sample_rate)
+            if pcm is None:
+                import ffmpeg
+                pcm, _ = (
+                    ffmpeg
+                    .input(self.voiceover_path)
+                    .output('pipe:', format='s16le', acodec='pcm_s16le', ac=1, ar=sample_rate)
+                    .run(capture_stdout=True, capture_stderr=True)
+                )
+                self._decoded_voiceover[sample_rate] = pcm
+        length = int(seconds * sample_rate) * 2
+        return (pcm * (length // len(pcm) + 1))[:length]
+
+    def trending_videos(self, query):
+        count = min(int(query.get('maxResults', ['50'])[0]), len(STUB_TRENDING_TITLES))
+        return {
+            'kind': 'youtube#videoListResponse',
+            'items': [
+                {'id': f"stub-video-{k}", 'snippet': {'title': title}, 'statistics': {'viewCount': str(1000 * (k + 1))}}
+                for k, title in enumerate(STUB_TRENDING_TITLES[:count])
+            ],
+        }
+
+    def create_runway_task(self):
+        with self._lock:
+            task_id = f"stub-task-{len(self._tasks) + 1}"
+            self._tasks[task_id] = {
+                'created': time.monotonic(),
+                'clip': (STUB_BLACK_CLIP_NAME if self.random.random() < self.runway_black_clip_rate
+                         else self.clip_names[len(self._tasks) % len(self.clip_names)]),
+                'fails': self.random.random() < self.runway_failure_rate,
+            }
+        return task_id
+
+    def runway_task(self, task_id):
+        with self._lock:
+            task = self._tasks.get(task_id)
+        if task is None:
+            return None
+        elapsed = time.monotonic() - task['created']
+        response = {'id': task_id, 'createdAt': '2024-01-01T00:00:00Z'}
+        if elapsed < self.runway_queue_seconds:
+            return {**response, 'status': 'PENDING'}
+        if elapsed < self.runway_queue_seconds + self.runway_generation_seconds:
+            progress = (elapsed - self.runway_queue_seconds) / self.runway_generation_seconds
+            return {**response, 'status': 'RUNNING', 'progress': round(progress, 2)}
+        if task['fails']:
+            return {**response, 'status': 'FAILED', 'failure': 'Stub failure', 'failureCode': 'INTERNAL.STUB'}
+        return {**response, 'status': 'SUCCEEDED', 'output': [f"{self.base_url}/files/{task['clip']}"]}
+
+class S3RequestHandler(BaseHTTPRequestHandler):
+    """
+    Answers the S3 calls an upload makes, with path-style URLs (/<bucket>/<key>): PutObject,
+    HeadObject, GetObject and the multipart upload calls. Object metadata is kept from the
+    x-amz-meta-* headers. Bodies sent with aws-chunked encoding (boto3's default, with a
+    trailing checksum) are decoded.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _send_xml(self, root, body, status=200):
+        xml = f'<?xml version="1.0" encoding="UTF-8"?><{root}>{body}</{root}>'.encode("utf-8")
+        self._send(status, xml, {"Content-Type": "application/xml"})
+
+    def _send_error(self, status, code):
+        self._send_xml("Error", f"<Code>{code}</Code><Message>{code}</Message>", status=status)
+
+    def _read_body(self):
+        stubs = self.server.stubs
+        if "chunked" in self.headers.get("Transfer-Encoding", ""):
+            raw = b""
+            while True:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                if size == 0:
+                    while self.rfile.readline() not in (b"\r\n", b""):
+                        pass
+                    break
+                raw += self.rfile.read(size)
+                self.rfile.readline()
+        else:
+            raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        # Mimic a link of `bandwidth` bytes per second per connection
+        if stubs.bandwidth:
+            time.sleep(len(raw) / stubs.bandwidth)
+
+        if "aws-chunked" not in self.headers.get("Content-Encoding", ""):
+            return raw
+        body, offset = b"", 0
+        while True:
+            line_end = raw.index(b"\r\n", offset)
+            size = int(raw[offset:line_end].split(b";")[0], 16)
+            if size == 0:
+                return body
+            body += raw[line_end + 2:line_end + 2 + size]
+            offset = line_end + 2 + size + 2
+
+    def _object_key(self):
+        bucket, _, key = unquote(urlsplit(self.path).path).lstrip("/").partition("/")
+        return bucket, key
+
+    def _admit(self):
+        refused = self.server.stubs.behavior.admit()
+        if refused is None:
+            return True
+        status, retry_after = refused
+        self._send_error(status, "SlowDown" if status in (429, 503) else "InternalError")
+        return False
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        if not self._admit():
+            return
+        stored = self.server.stubs.objects.get(self._object_key())
+        if stored is None:
+            return self._send_error(404, "NoSuchKey")
+        headers = {"ETag": stored['etag'], "Content-Type": "binary/octet-stream",
+                   "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}
+        headers.update({f"x-amz-meta-{name}": value for name, value in stored['metadata'].items()})
+        self._send(200, stored['data'], headers)
+
+    def do_PUT(self):
+        stubs = self.server.stubs
+        query = parse_qs(urlsplit(self.path).query)
+        body = self._read_body()
+        if not self._admit():
+            return
+        if 'uploadId' in query:
+            upload = stubs.uploads.get(query['uploadId'][0])
+            if upload is None:
+                return self._send_error(404, "NoSuchUpload")
+            etag = f'"{hashlib.md5(body).hexdigest()}"'
+            upload['parts'][int(query['partNumber'][0])] = body
+            return self._send(200, headers={"ETag": etag})
+        stubs.put_object(self._object_key(), body, self._metadata())
+        self._send(200, headers={"ETag": stubs.objects[self._object_key()]['etag']})
+
+    def do_POST(self):
+        stubs = self.server.stubs
+        query = parse_qs(urlsplit(self.path).query, keep_blank_values=True)
+        self._read_body()
+        if not self._admit():
+            return
+        bucket, key = self._object_key()
+        if 'uploads' in query:
+            upload_id = stubs.create_upload((bucket, key), self._metadata())
+            return self._send_xml(
+                "InitiateMultipartUploadResult",
+                f"<Bucket>{bucket}</Bucket><Key>{key}</Key><UploadId>{upload_id}</UploadId>"
+            )
+        if 'uploadId' in query:
+            etag = stubs.complete_upload(query['uploadId'][0])
+            if etag is None:
+                return self._send_error(404, "NoSuchUpload")
+            return self._send_xml(
+                "CompleteMultipartUploadResult",
+                f"<Bucket>{bucket}</Bucket><Key>{key}</Key><ETag>{etag}</ETag>"
+            )
+        self._send_error(400, "InvalidRequest")
+
+    def do_DELETE(self):
+        query = parse_qs(urlsplit(self.path).query)
+        if 'uploadId' in query:
+            self.server.stubs.uploads.pop(query['uploadId'][0], None)
+        else:
+            self.server.stubs.objects.pop(self._object_key(), None)
+        self._send(204)
+
+    def _metadata(self):
+        return {name[len("x-amz-meta-"):].lower(): value for name, value in self.headers.items()
+                if name.lower().startswith("x-amz-meta-")}
+
+class StubS3:
+    """
+    A local S3-compatible stand-in holding objects in memory, for testing and benchmarking
+    uploads without AWS. Point get_s3_client() at it with environment():
+
+        with StubS3(bandwidth=20e6) as s3:
+            os.environ.update(s3.environment())
+            ...
+    """
+
+    def __init__(self, behavior=None, bandwidth=None, host="127.0.0.1", port=0):
+        """
+        Args:
+            behavior (ProviderBehavior): Latency, errors and rate limit of the requests.
+            bandwidth (float): Bytes per second each connection can send, to make parallel
+                uploads matter the way they do over a real network. Default: unlimited.
+        """
+        self.behavior = behavior or ProviderBehavior()
+        self.bandwidth = bandwidth
+        self.objects = {}  # (bucket, key) -> {'data', 'metadata', 'etag'}
+        self.uploads = {}  # upload id -> {'object', 'metadata', 'parts'}
+        self._upload_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+        self.server = ThreadingHTTPServer((host, port), S3RequestHandler)
+        self.server.daemon_threads = True
+        self.server.stubs = self
+        self.endpoint_url = f"http://{host}:{self.server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def environment(self, bucket="stub-bucket"):
+        """
+        Returns the environment variables that point clients.py and uploader.py at the stand-in.
+        """
+        return {
+            'S3_ENDPOINT_URL': self.endpoint_url, 'S3_BUCKET_NAME': bucket, 'AWS_REGION': 'us-east-1',
+            'AWS_ACCESS_KEY_ID': 'stub', 'AWS_SECRET_ACCESS_KEY': 'stub',
+        }
+
+    def put_object(self, object_key, data, metadata):
+        with self._lock:
+            self.objects[object_key] = {'data': data, 'metadata': metadata,
+                                        'etag': f'"{hashlib.md5(data).hexdigest()}"'}
+
+    def create_upload(self, object_key, metadata):
+        with self._lock:
+            upload_id = f"stub-upload-{next(self._upload_ids)}"
+            self.uploads[upload_id] = {'object': object_key, 'metadata': metadata, 'parts': {}}
+        return upload_id
+
+    def complete_upload(self, upload_id):
+        """
+        Joins the parts of a multipart upload into its object and returns the object's ETag.
+        """
+        with self._lock:
+            upload = self.uploads.pop(upload_id, None)
+        if upload is None:
+            return None
+        parts = [upload['parts'][number] for number in sorted(upload['parts'])]
+        digest = hashlib.md5(b"".join(hashlib.md5(part).digest() for part in parts)).hexdigest()
+        with self._lock:
+            self.objects[upload['object']] = {'data': b"".join(parts), 'metadata': upload['metadata'],
+                                              'etag': f'"{digest}-{len(parts)}"'}
+        return self.objects[upload['object']]['etag']
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve local stand-ins for the provider APIs.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before every API response.")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Extra random latency, up to this many seconds.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of API requests answered with 503.")
+    parser.add_argument("--rate-limit", type=float, default=None, help="Requests per second per provider before 429s.")
+    parser.add_argument("--runway-seconds", type=float, default=5.0, help="Queue plus generation time of a clip.")
+    args = parser.parse_args()
+
+    def behavior():
+        return ProviderBehavior(args.latency, args.jitter, args.error_rate, args.rate_limit)
+
+    stubs = StubProviders(openai=behavior(), elevenlabs=behavior(), runway=behavior(), youtube=behavior(),
+                          runway_queue_seconds=args.runway_seconds / 5,
+                          runway_generation_seconds=args.runway_seconds * 4 / 5, port=args.port)
+    print("Stub providers running. Point the pipeline at them with:")
+    for name, value in stubs.environment().items():
+        print(f"  export {name}={value}")
+    try:
+        stubs.server.serve_forever()
+    except KeyboardInterrupt:
+        stubs.server.server_close()
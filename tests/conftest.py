@@ -0,0 +1,24 @@
+# tests/conftest.py
+import pytest
+
+import asset_cache
+import clients
+import resilience
+from stub_servers import StubProviders
+
+@pytest.fixture
+def stub_providers(tmp_path, monkeypatch):
+    """
+    Local stand-ins for the providers, with the clients pointed at them, an empty asset cache
+    and fresh rate limiters and circuit breakers.
+    """
+    with StubProviders(runway_queue_seconds=0.2, runway_generation_seconds=0.6) as stubs:
+        for name, value in stubs.environment().items():
+            monkeypatch.setenv(name, value)
+        monkeypatch.setattr(asset_cache, 'CACHE_DIR', str(tmp_path / "asset_cache"))
+        # The shared clients are built from the environment on first use
+        clients._clients.clear()
+        resilience.reset()
+        yield stubs
+        clients._clients.clear()
+        resilience.reset()
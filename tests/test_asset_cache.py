@@ -0,0 +1,76 @@
+# tests/test_asset_cache.py
+import os
+import shutil
+import time
+
+import pytest
+
+import asset_cache
+from asset_cache import asset_key, fetch_asset, store_asset
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / "cache")
+
+def make_file(path, size, fill=b'x'):
+    path.write_bytes(fill * size)
+    return str(path)
+
+def entry_names(cache_dir):
+    return sorted(name for _, _, files in os.walk(cache_dir) for name in files)
+
+def age(entry_path, seconds):
+    then = time.time() - seconds
+    os.utime(entry_path, (then, then))
+
+def test_store_is_atomic(tmp_path, cache_dir, monkeypatch):
+    key = asset_key('runway_clip', prompt="a dog on a beach")
+    entry_path = store_asset(key, make_file(tmp_path / "first.mp4", 1000, b'1'), cache_dir=cache_dir)
+    assert open(entry_path, 'rb').read() == b'1' * 1000
+
+    # A copy that fails midway leaves the old entry as it was and no temporary file behind
+    def fail_midway(source, dest, length):
+        dest.write(source.read(100))
+        raise OSError("No space left on device")
+    monkeypatch.setattr(shutil, 'copyfileobj', fail_midway)
+    assert store_asset(key, make_file(tmp_path / "second.mp4", 1000, b'2'), cache_dir=cache_dir) is None
+    assert entry_names(cache_dir) == [key]
+    assert open(entry_path, 'rb').read() == b'1' * 1000
+
+def test_a_hit_refreshes_the_entry(tmp_path, cache_dir):
+    entry_path = store_asset("ab" * 32, make_file(tmp_path / "clip.mp4", 100), cache_dir=cache_dir)
+    age(entry_path, 3600)
+
+    dest_path = str(tmp_path / "fetched.mp4")
+    assert fetch_asset("ab" * 32, dest_path, cache_dir=cache_dir) == dest_path
+    assert open(dest_path, 'rb').read() == b'x' * 100
+    assert time.time() - os.path.getmtime(entry_path) < 60
+    assert fetch_asset("cd" * 32, dest_path, cache_dir=cache_dir) is None
+
+def test_least_recently_used_entries_are_evicted_first(tmp_path, cache_dir):
+    source_path = make_file(tmp_path / "clip.mp4", 100)
+    keys = [asset_key('runway_clip', prompt=prompt) for prompt in ("oldest", "older", "old")]
+    for seconds, key in zip((300, 200, 100), keys):
+        age(store_asset(key, source_path, cache_dir=cache_dir, max_bytes=1000), seconds)
+
+    # Using the oldest entry makes it the most recently used one
+    fetch_asset(keys[0], str(tmp_path / "fetched.mp4"), cache_dir=cache_dir)
+    store_asset("ff" * 32, source_path, cache_dir=cache_dir, max_bytes=250)
+    assert entry_names(cache_dir) == sorted([keys[0], "ff" * 32])
+
+def test_stores_under_the_limit_do_not_walk_the_cache(tmp_path, cache_dir, monkeypatch):
+    walks = []
+    walk = os.walk
+    monkeypatch.setattr(os, 'walk', lambda top: walks.append(top) or walk(top))
+
+    source_path = make_file(tmp_path / "clip.mp4", 100)
+    for k in range(5):
+        store_asset(f"{k:02d}" * 32, source_path, cache_dir=cache_dir, max_bytes=500)
+    # One walk to size up the cache the first time
+    assert len(walks) == 1
+
+    # The store that takes it past the limit walks it again and evicts
+    store_asset("ff" * 32, source_path, cache_dir=cache_dir, max_bytes=500)
+    assert len(walks) == 2
+    assert len(entry_names(cache_dir)) == 5
+    assert asset_cache._cache_bytes[os.path.abspath(cache_dir)] == 500
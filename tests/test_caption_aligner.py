@@ -0,0 +1,117 @@
+# tests/test_caption_aligner.py
+import os
+
+import numpy as np
+import pytest
+
+from caption_aligner import (SAMPLE_RATE, FRAME_SECONDS, decode_audio, frame_energy, detect_speech_regions,
+                             align_captions, align_captions_to_samples, _split_sentences)
+from video_editor import build_caption_blocks, _spread_words
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_AUDIO = os.path.join(REPO_DIR, "voiceover.mp3")
+SAMPLE_SCRIPT = os.path.join(REPO_DIR, "script.txt")
+
+@pytest.fixture(scope="module")
+def script_text():
+    with open(SAMPLE_SCRIPT) as f:
+        return f.read()
+
+@pytest.fixture(scope="module")
+def samples():
+    return decode_audio(SAMPLE_AUDIO)
+
+@pytest.fixture(scope="module")
+def regions(samples):
+    return detect_speech_regions(frame_energy(samples))
+
+@pytest.fixture(scope="module")
+def caption_blocks(script_text):
+    return align_captions(script_text, SAMPLE_AUDIO)
+
+def in_pause(time, regions):
+    """
+    True if `time` falls strictly inside a gap between two speech regions.
+    """
+    return bool(np.any((regions[:-1, 1] < time - 1e-6) & (time + 1e-6 < regions[1:, 0])))
+
+def sentence_of_each_block(script_text, caption_blocks):
+    """
+    Returns the index of the sentence every block's words come from, or None for a block that
+    spans two sentences.
+    """
+    word_sentence = [k for k, sentence in enumerate(_split_sentences(script_text)) for _ in sentence.split()]
+    owners, position = [], 0
+    for _, _, text in caption_blocks:
+        count = len(text.split())
+        sentences = set(word_sentence[position:position + count])
+        owners.append(sentences.pop() if len(sentences) == 1 else None)
+        position += count
+    assert position == len(word_sentence), "the blocks must hold every word of the script once"
+    return owners
+
+def test_speech_regions_are_found_in_order(samples, regions):
+    duration = len(samples) / SAMPLE_RATE
+    assert len(regions) >= 5
+    assert np.all(regions[:, 0] < regions[:, 1])
+    # Ordered and not overlapping
+    assert np.all(regions[1:, 0] >= regions[:-1, 1])
+    assert regions[0, 0] >= 0 and regions[-1, 1] <= duration + FRAME_SECONDS
+    # Every gap that is kept is a real pause
+    assert np.all(regions[1:, 0] - regions[:-1, 1] >= 0.2 - 1e-9)
+
+def test_blocks_never_cross_a_sentence(script_text, caption_blocks):
+    owners = sentence_of_each_block(script_text, caption_blocks)
+    assert None not in owners
+    assert owners == sorted(owners)
+
+def test_blocks_are_timed_in_order(caption_blocks, samples):
+    starts = [start for start, _, _ in caption_blocks]
+    ends = [end for _, end, _ in caption_blocks]
+    assert all(start < end for start, end in zip(starts, ends))
+    assert all(end <= next_start + 1e-9 for end, next_start in zip(ends, starts[1:]))
+    assert ends[-1] <= len(samples) / SAMPLE_RATE
+
+def test_block_boundaries_never_fall_inside_a_pause(caption_blocks, regions):
+    for start, end, text in caption_blocks:
+        assert not in_pause(start, regions), f"{text!r} starts in a pause"
+        assert not in_pause(end, regions), f"{text!r} ends in a pause"
+
+def test_sentence_boundaries_snap_to_pauses(script_text, caption_blocks, regions):
+    owners = sentence_of_each_block(script_text, caption_blocks)
+    boundaries = [(caption_blocks[k][1], caption_blocks[k + 1][0])
+                  for k in range(len(caption_blocks) - 1) if owners[k] != owners[k + 1]]
+    # The sentence ends on a region end and the next one starts on the following region start
+    at_pauses = [end for end, next_start in boundaries
+                 if np.any(np.isclose(regions[:-1, 1], end) & np.isclose(regions[1:, 0], next_start))]
+    # In the sample, all but "INT." and "...BBQ? Hey sisters!" are spoken with a pause after them
+    assert len(at_pauses) >= len(boundaries) - 2
+
+def test_every_sentence_ends_in_its_pause():
+    sentences = ["One two three.", "Four five six seven eight.", "Nine ten."]
+    script = " ".join(sentences)
+    silence = np.zeros(int(0.5 * SAMPLE_RATE), dtype=np.float32)
+    pieces, expected = [silence], []
+    time = 0.5
+    for sentence in sentences:
+        # Speech time in proportion to the sentence's characters, as the aligner assumes
+        seconds = 0.1 * sum(len(word) + 1 for word in sentence.split())
+        t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+        pieces += [(0.5 * np.sin(2 * np.pi * 220 * t)).astype(np.float32), silence]
+        expected.append((time, time + seconds))
+        time += seconds + 0.5
+
+    blocks = align_captions_to_samples(script, np.concatenate(pieces), words_per_block=2)
+    owners = sentence_of_each_block(script, blocks)
+    for k, (start, end) in enumerate(expected):
+        sentence_blocks = [block for block, owner in zip(blocks, owners) if owner == k]
+        assert sentence_blocks[0][0] == pytest.approx(start, abs=FRAME_SECONDS)
+        assert sentence_blocks[-1][1] == pytest.approx(end, abs=FRAME_SECONDS)
+
+@pytest.mark.parametrize("audio_name", ["missing.mp3", "corrupt.mp3"])
+def test_falls_back_to_uniform_timing_when_decoding_fails(tmp_path, script_text, audio_name):
+    audio_path = tmp_path / audio_name
+    if audio_name == "corrupt.mp3":
+        audio_path.write_bytes(b"not audio" * 100)
+    blocks = build_caption_blocks(script_text, 15.0, audio_path=str(audio_path))
+    assert blocks == _spread_words(script_text, 0.0, 15.0, 5)
@@ -0,0 +1,74 @@
+# tests/test_category_selector.py
+import json
+
+import pytest
+
+import category_selector
+from category_selector import CONFIDENCE_THRESHOLD, get_category_id_from_prompt, get_classifier
+
+# Nothing in it matches any category description, so the local classifier cannot decide
+UNKNOWN_PROMPT = "zorblax quinterfeld wubbernaut"
+
+@pytest.fixture
+def examples_path(tmp_path, monkeypatch):
+    path = tmp_path / "category_examples.jsonl"
+    monkeypatch.setattr(category_selector, 'CATEGORY_EXAMPLES_PATH', str(path))
+    forget_classifier(monkeypatch)
+    return path
+
+def forget_classifier(monkeypatch):
+    """
+    Drops the in-memory model and examples, as a new process would start.
+    """
+    monkeypatch.setattr(category_selector, '_classifier', None)
+    monkeypatch.setattr(category_selector, '_examples', [])
+
+def openai_requests(stubs):
+    return stubs.stats()['openai']['requests']
+
+def test_confident_prompt_is_answered_locally(examples_path, stub_providers):
+    category_id, confidence = get_classifier().classify("Cute puppies and kittens playing with a ball of yarn")
+    assert category_id == '15' and confidence >= CONFIDENCE_THRESHOLD
+
+    assert get_category_id_from_prompt("Cute puppies and kittens playing with a ball of yarn") == '15'
+    assert openai_requests(stub_providers) == 0
+
+def test_uncertain_prompt_asks_openai_and_is_labeled(examples_path, stub_providers):
+    assert get_classifier().classify(UNKNOWN_PROMPT)[1] < CONFIDENCE_THRESHOLD
+
+    assert get_category_id_from_prompt(UNKNOWN_PROMPT) == stub_providers.category_id
+    assert openai_requests(stub_providers) == 1
+    with open(examples_path) as f:
+        assert [json.loads(line) for line in f] == [{'prompt': UNKNOWN_PROMPT,
+                                                     'category_id': stub_providers.category_id}]
+
+def test_labels_are_reused_without_a_rebuild(examples_path, stub_providers):
+    classifier = get_classifier()
+    get_category_id_from_prompt(UNKNOWN_PROMPT)
+
+    # Folded into the model that is already loaded...
+    assert get_classifier() is classifier
+    assert get_category_id_from_prompt(UNKNOWN_PROMPT) == stub_providers.category_id
+    assert openai_requests(stub_providers) == 1
+
+def test_labels_are_persisted_and_reused_by_a_new_process(examples_path, stub_providers, monkeypatch):
+    get_category_id_from_prompt(UNKNOWN_PROMPT)
+
+    forget_classifier(monkeypatch)
+    category_id, confidence = get_classifier().classify(UNKNOWN_PROMPT)
+    assert category_id == stub_providers.category_id and confidence >= CONFIDENCE_THRESHOLD
+    assert get_category_id_from_prompt(UNKNOWN_PROMPT) == stub_providers.category_id
+    assert openai_requests(stub_providers) == 1
+
+def test_model_is_rebuilt_after_enough_labels(examples_path, monkeypatch):
+    monkeypatch.setattr(category_selector, 'REBUILD_EVERY', 3)
+    classifier = get_classifier()
+    for k in range(2):
+        category_selector.add_labeled_prompt(f"{UNKNOWN_PROMPT} {k}", '24')
+    assert get_classifier() is classifier
+
+    category_selector.add_labeled_prompt(f"{UNKNOWN_PROMPT} 2", '24')
+    rebuilt = get_classifier()
+    assert rebuilt is not classifier
+    # The incremental updates and the rebuild agree on the answer
+    assert rebuilt.classify(UNKNOWN_PROMPT)[0] == classifier.classify(UNKNOWN_PROMPT)[0] == '24'
@@ -0,0 +1,58 @@
+# tests/test_clip_library.py
+import pytest
+
+from clip_library import ClipLibrary, prompt_similarity, SIMILARITY_THRESHOLD
+
+SETTINGS = "gen3a_turbo|5s|1280:768"
+PROMPT = "a drone shot over a misty mountain lake at sunrise"
+
+@pytest.fixture
+def library_path(tmp_path):
+    return str(tmp_path / "clip_library.jsonl")
+
+def test_paraphrase_is_found(library_path):
+    library = ClipLibrary(library_path)
+    library.add(PROMPT, "key-lake", SETTINGS)
+    library.add("a chef plating a colorful dish in a busy kitchen", "key-chef", SETTINGS)
+
+    paraphrase = "drone footage of a misty lake in the mountains at sunrise"
+    assert prompt_similarity(PROMPT, paraphrase) >= SIMILARITY_THRESHOLD
+    matches = library.find(paraphrase, SETTINGS)
+    assert [match['key'] for match in matches] == ["key-lake"]
+    assert matches[0]['prompt'] == PROMPT and matches[0]['similarity'] >= SIMILARITY_THRESHOLD
+
+def test_same_setting_different_subject_is_rejected(library_path):
+    # The example from the comment on SIMILARITY_THRESHOLD
+    library = ClipLibrary(library_path)
+    library.add("people celebrating in slow motion", "key-celebrating", SETTINGS)
+
+    assert prompt_similarity("people celebrating in slow motion", "people running in slow motion") == \
+        pytest.approx(0.75, abs=0.02)
+    assert library.find("people running in slow motion", SETTINGS) == []
+
+def test_clips_are_only_reused_for_the_same_settings(library_path):
+    library = ClipLibrary(library_path)
+    library.add(PROMPT, "key-turbo", SETTINGS)
+    library.add(PROMPT, "key-alpha", "gen3a|10s|1280:768")
+
+    assert [match['key'] for match in library.find(PROMPT, SETTINGS)] == ["key-turbo"]
+    assert [match['key'] for match in library.find(PROMPT, "gen3a|10s|1280:768")] == ["key-alpha"]
+    assert library.find(PROMPT, "gen4|5s|1280:768") == []
+
+def test_removal_by_another_instance_is_seen_on_the_next_call(library_path):
+    first, second = ClipLibrary(library_path), ClipLibrary(library_path)
+    first.add(PROMPT, "key-lake", SETTINGS)
+    assert [match['key'] for match in second.find(PROMPT, SETTINGS)] == ["key-lake"]
+
+    second.remove("key-lake")
+    assert first.find(PROMPT, SETTINGS) == [] and len(first) == 0
+    # The first instance knows it is gone, so does not record the removal again
+    first.remove("key-lake")
+    with open(library_path) as f:
+        assert sum('"removed"' in line for line in f) == 1
+    assert len(ClipLibrary(library_path)) == 0
+
+    # The clip can be generated and recorded again
+    assert first.add(PROMPT, "key-lake", SETTINGS)
+    assert [match['key'] for match in second.find(PROMPT, SETTINGS)] == ["key-lake"]
+    assert len(ClipLibrary(library_path)) == 1
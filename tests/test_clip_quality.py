@@ -0,0 +1,15 @@
+# tests/test_clip_quality.py
+import os
+import glob
+
+from clip_quality import ClipQualityGate
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_CLIPS = sorted(glob.glob(os.path.join(REPO_DIR, "runway_clip_*.mp4")))[:2]
+
+def test_duplicates_skips_clips_that_cannot_be_decoded(tmp_path):
+    corrupt = tmp_path / "corrupt.mp4"
+    corrupt.write_bytes(b"not a video" * 100)
+    first, second = SAMPLE_CLIPS
+    clip_paths = [first, str(corrupt), str(tmp_path / "missing.mp4"), second, first]
+    assert ClipQualityGate().duplicates(clip_paths) == [first]
@@ -0,0 +1,67 @@
+# tests/test_downloader.py
+import os
+import json
+
+import pytest
+
+from downloader import download_file
+from stub_servers import serve_directory
+
+CONTENT = bytes(range(256)) * 400
+
+@pytest.fixture
+def served(tmp_path):
+    directory = tmp_path / "served"
+    directory.mkdir()
+    (directory / "clip.mp4").write_bytes(CONTENT)
+    (directory / "other.mp4").write_bytes(CONTENT[::-1])
+    server, base_url = serve_directory(str(directory))
+    yield directory, base_url
+    server.shutdown()
+
+def leave_partial(file_path, data, url, validator=None):
+    with open(f"{file_path}.part", "wb") as f:
+        f.write(data)
+    with open(f"{file_path}.part.json", "w") as f:
+        json.dump({"url": url, "validator": validator}, f)
+
+def test_resumes_a_partial_file_of_the_same_resource(tmp_path, served):
+    _, base_url = served
+    file_path = str(tmp_path / "clip.mp4")
+    leave_partial(file_path, CONTENT[:1000], f"{base_url}/clip.mp4")
+
+    result = download_file(f"{base_url}/clip.mp4", file_path, backoff=0)
+    assert result["bytes"] == len(CONTENT) - 1000
+    assert open(file_path, "rb").read() == CONTENT
+    assert not os.path.exists(f"{file_path}.part.json")
+
+@pytest.mark.parametrize("origin", ["other URL", "unknown"])
+def test_discards_a_partial_file_of_another_resource(tmp_path, served, origin):
+    _, base_url = served
+    file_path = str(tmp_path / "clip.mp4")
+    leave_partial(file_path, CONTENT[::-1][:1000], f"{base_url}/other.mp4")
+    if origin == "unknown":
+        os.remove(f"{file_path}.part.json")
+
+    result = download_file(f"{base_url}/clip.mp4", file_path, backoff=0)
+    assert result["bytes"] == len(CONTENT)
+    assert open(file_path, "rb").read() == CONTENT
+
+def test_discards_a_partial_file_of_an_older_version(tmp_path, served):
+    _, base_url = served
+    file_path = str(tmp_path / "clip.mp4")
+    leave_partial(file_path, b"x" * 1000, f"{base_url}/clip.mp4", validator="Thu, 01 Jan 2015 00:00:00 GMT")
+
+    result = download_file(f"{base_url}/clip.mp4", file_path, backoff=0)
+    assert result["bytes"] == len(CONTENT)
+    assert open(file_path, "rb").read() == CONTENT
+
+@pytest.mark.parametrize("size", [len(CONTENT), len(CONTENT) + 10])
+def test_range_past_the_end_is_complete_only_at_the_resource_size(tmp_path, served, size):
+    _, base_url = served
+    file_path = str(tmp_path / "clip.mp4")
+    leave_partial(file_path, (CONTENT + b"x" * 10)[:size], f"{base_url}/clip.mp4")
+
+    result = download_file(f"{base_url}/clip.mp4", file_path, backoff=0)
+    assert result["bytes"] == (0 if size == len(CONTENT) else len(CONTENT))
+    assert open(file_path, "rb").read() == CONTENT
@@ -0,0 +1,69 @@
+# tests/test_elevenlabs_api.py
+import os
+
+import pytest
+
+import clients
+import media_info
+import resilience
+from elevenlabs_api import (split_into_chunks, generate_voiceover_chunked, load_chunk_timings, _synthesize_chunk,
+                            PCM_SAMPLE_RATE)
+
+SCRIPT = ("Did you know octopuses have three hearts? Two pump blood to the gills. The third keeps the rest "
+          "of the body going! And when they swim, that third heart stops. That is why they would rather crawl. "
+          "Their blood is blue, too. It carries copper instead of iron. Follow for more ocean facts!")
+
+def leftovers(directory):
+    return [name for name in os.listdir(directory) if name.endswith(('.pcm', '.tmp'))]
+
+def test_chunks_end_at_sentences_and_keep_every_word():
+    chunks = split_into_chunks(SCRIPT, max_chunk_chars=80)
+    assert len(chunks) > 1
+    assert all(chunk[-1] in ".!?" for chunk in chunks)
+    # Every sentence of SCRIPT fits in a chunk
+    assert all(len(chunk) <= 80 for chunk in chunks)
+    assert " ".join(chunks).split() == SCRIPT.split()
+
+def test_sentence_longer_than_a_chunk_is_a_chunk_of_its_own():
+    long_sentence = "This sentence goes on " + "and on " * 30 + "until it ends."
+    assert split_into_chunks(f"Short one. {long_sentence} Short two.", max_chunk_chars=50) == \
+        ["Short one.", long_sentence, "Short two."]
+
+def test_chunks_are_joined_and_timed(tmp_path, stub_providers):
+    audio_path = generate_voiceover_chunked(SCRIPT, output_dir=str(tmp_path), max_chunk_chars=80)
+    assert audio_path == str(tmp_path / "voiceover.mp3")
+    assert leftovers(tmp_path) == []
+
+    timings = load_chunk_timings(audio_path)
+    assert [text for _, _, text in timings] == split_into_chunks(SCRIPT, max_chunk_chars=80)
+    assert timings[0][0] == 0.0
+    assert all(end == next_start for (_, end, _), (next_start, _, _) in zip(timings, timings[1:]))
+
+    info = media_info.probe(audio_path)
+    assert info['audio']['sample_rate'] == PCM_SAMPLE_RATE
+    # MPEG-2 layer III frames hold 576 samples
+    assert timings[-1][1] == pytest.approx(info['duration'], abs=576 / PCM_SAMPLE_RATE)
+
+def test_failing_provider_leaves_no_chunk_behind(tmp_path, stub_providers):
+    resilience.configure('elevenlabs', attempts=1)
+    stub_providers.behaviors['elevenlabs'].error_rate = 1.0
+    assert generate_voiceover_chunked(SCRIPT, output_dir=str(tmp_path), max_chunk_chars=80) is None
+    assert leftovers(tmp_path) == []
+
+def test_chunk_cut_off_midway_leaves_no_partial_file(tmp_path, stub_providers):
+    resilience.configure('elevenlabs', attempts=1)
+    client = clients.get_elevenlabs_client()
+    convert = client.text_to_speech.convert
+
+    def dropped_midway(**kwargs):
+        audio = convert(**kwargs)
+        yield next(iter(audio))
+        raise ConnectionResetError("connection dropped")
+    chunks = split_into_chunks(SCRIPT, max_chunk_chars=80)
+    client.text_to_speech.convert = dropped_midway
+    try:
+        result = _synthesize_chunk(client, chunks, 1, "stub-voice", "stub-model", str(tmp_path))
+    finally:
+        client.text_to_speech.convert = convert
+    assert result is None
+    assert leftovers(tmp_path) == []
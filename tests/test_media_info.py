@@ -0,0 +1,71 @@
+# tests/test_media_info.py
+import os
+import glob
+import subprocess
+from fractions import Fraction
+
+import pytest
+
+import media_info
+from video_editor import _probe_clips
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_AUDIO = os.path.join(REPO_DIR, "voiceover.mp3")
+SAMPLE_CLIPS = sorted(glob.glob(os.path.join(REPO_DIR, "runway_clip_*.mp4")))
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    media_info.clear_cache()
+    yield
+    media_info.clear_cache()
+
+def test_mp3_matches_ffprobe():
+    info, reference = media_info.probe(SAMPLE_AUDIO), media_info._ffprobe(SAMPLE_AUDIO)
+    assert info['parser'] == 'mp3'
+    audio = info['audio']
+    # Within one MP3 frame (ffprobe rounds to 10 ms here)
+    assert info['duration'] == pytest.approx(reference['duration'], abs=1152 / audio['sample_rate'])
+    assert audio['sample_rate'] == reference['audio']['sample_rate']
+    if reference['audio']['channels'] is not None:
+        assert audio['channels'] == reference['audio']['channels']
+
+@pytest.mark.parametrize("clip_path", SAMPLE_CLIPS, ids=os.path.basename)
+def test_mp4_matches_ffprobe(clip_path):
+    info, reference = media_info.probe(clip_path), media_info._ffprobe(clip_path)
+    assert info['parser'] == 'mp4'
+    video = info['video']
+    assert info['duration'] == pytest.approx(reference['duration'], abs=1 / video['fps'])
+    assert video['duration'] == pytest.approx(reference['video']['duration'], abs=1 / video['fps'])
+    assert (video['width'], video['height']) == (reference['video']['width'], reference['video']['height'])
+    assert video['fps'] == reference['video']['fps']
+
+def test_fragmented_mp4_goes_to_ffprobe(tmp_path):
+    path = str(tmp_path / "fragmented.mp4")
+    subprocess.run(["ffmpeg", "-v", "error", "-i", SAMPLE_CLIPS[0], "-c", "copy",
+                    "-movflags", "frag_keyframe+empty_moov", path], check=True)
+    with pytest.raises(media_info.UnsupportedMedia):
+        media_info._parse(path)
+
+    info = media_info.probe(path)
+    assert info['parser'] == 'ffprobe'
+    assert info['duration'] == pytest.approx(media_info.probe(SAMPLE_CLIPS[0])['duration'], abs=0.05)
+    assert info['video']['fps'] == 24
+
+@pytest.mark.parametrize("stream, fps", [
+    ({'avg_frame_rate': '0/0', 'r_frame_rate': '30000/1001'}, Fraction(30000, 1001)),
+    ({'avg_frame_rate': '0/0', 'r_frame_rate': '0/0', 'nb_frames': '120', 'duration': '5.0'}, Fraction(24)),
+    ({'avg_frame_rate': '0/0', 'r_frame_rate': '0/0'}, None),
+])
+def test_ffprobe_falls_back_to_other_frame_rates(monkeypatch, stream, fps):
+    import ffmpeg
+
+    probe = {'format': {'duration': '5.0'},
+             'streams': [{'codec_type': 'video', 'codec_name': 'h264', 'width': 8, 'height': 8, **stream}]}
+    monkeypatch.setattr(ffmpeg, 'probe', lambda path: probe)
+    assert media_info._ffprobe("clip.mp4")['video']['fps'] == fps
+
+def test_clips_without_a_frame_rate_keep_their_duration(monkeypatch):
+    infos = {"a.mp4": {'duration': 5.01, 'video': {'fps': Fraction(24), 'duration': 5.01}},
+             "b.mp4": {'duration': 4.33, 'video': {'fps': None, 'duration': 4.33}}}
+    monkeypatch.setattr(media_info, 'probe', infos.get)
+    assert _probe_clips(["b.mp4", "a.mp4"]) == ([4.33, 5.0], Fraction(24))
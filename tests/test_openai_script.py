@@ -0,0 +1,113 @@
+# tests/test_openai_script.py
+import itertools
+import json
+import queue
+
+import pytest
+
+import openai_script
+import stub_servers
+from openai_script import StreamingJSONObjectParser, ScriptStream, generate_video_script, clean_script_text
+
+TOPIC = "A sibling vacation"
+# Escaped quotes and backslashes, and characters that json.dumps() writes as \u escapes,
+# one of them a surrogate pair
+TRICKY_SCRIPT = 'She said "wait \\ for it" at the café \U0001F389 and left.\nThe end.'
+
+def parse(pieces):
+    """
+    Feeds `pieces` to a parser and returns the decoded text of each key, the events in order
+    and whether the object was complete.
+    """
+    parser = StreamingJSONObjectParser()
+    events = [event for piece in pieces for event in parser.feed(piece)]
+    texts = {}
+    for event, key, value in events:
+        if event == 'text':
+            texts[key] = texts.get(key, '') + value
+    return texts, events, parser.done
+
+def test_parser_fed_one_character_at_a_time_matches_json_loads():
+    content = json.dumps({'keywords': "a cat, a dog", 'script': TRICKY_SCRIPT})
+    assert '\\"' in content and '\\u00e9' in content and '\\ud83c\\udf89' in content
+
+    texts, events, done = parse(content)
+    assert done
+    assert texts == json.loads(content)
+    # The keywords are complete before any of the script arrives
+    assert events.index(('end', 'keywords', None)) < min(
+        k for k, (event, key, _) in enumerate(events) if key == 'script')
+
+def test_escapes_split_across_two_pieces():
+    content = json.dumps({'script': TRICKY_SCRIPT})
+    for split in range(1, len(content)):
+        texts, _, done = parse([content[:split], content[split:]])
+        assert done and texts == {'script': TRICKY_SCRIPT}, split
+
+def test_arrays_are_handed_out_item_by_item_and_other_values_skipped():
+    content = json.dumps({'title': {'a': ["}"]}, 'keywords': ["a \"cat\"", "a dog"], 'count': 2, 'script': "Hi."})
+    texts, events, done = parse(content)
+    assert done and texts == {'script': "Hi."}
+    assert [(event, key, value) for event, key, value in events if key != 'script'] == [
+        ('end', 'title', None),
+        ('item', 'keywords', 'a "cat"'), ('item', 'keywords', 'a dog'), ('end', 'keywords', None),
+        ('end', 'count', None),
+    ]
+
+@pytest.fixture
+def one_character_per_chunk(stub_providers, monkeypatch):
+    """
+    Makes the OpenAI stand-in stream its answer one character per chunk, with TRICKY_SCRIPT
+    in place of the committed script.
+    """
+    monkeypatch.setattr(stub_servers, 'STUB_CHARACTERS_PER_TOKEN', 1)
+    monkeypatch.setattr(stub_providers, 'script_text', TRICKY_SCRIPT)
+    return stub_providers
+
+def test_script_stream_matches_the_non_streamed_script(tmp_path, one_character_per_chunk, monkeypatch):
+    stubs = one_character_per_chunk
+    (tmp_path / "streamed").mkdir()
+    (tmp_path / "whole").mkdir()
+
+    # Counts the characters the streaming parser has been fed
+    parsers = []
+    class CountingParser(StreamingJSONObjectParser):
+        fed = 0
+        def feed(self, text):
+            if not parsers:
+                parsers.append(self)
+            self.fed += len(text)
+            return super().feed(text)
+    monkeypatch.setattr(openai_script, 'StreamingJSONObjectParser', CountingParser)
+
+    # Notes how far the response had been read when each keyword was handed out
+    handed_out = []
+    class RecordingQueue(queue.Queue):
+        def put(self, item, *args, **kwargs):
+            if item is not None:
+                handed_out.append((item, parsers[0].fed))
+            super().put(item, *args, **kwargs)
+
+    stream = ScriptStream(TOPIC, output_dir=str(tmp_path / "streamed"))
+    stream._keywords = RecordingQueue()
+    stream.start()
+    assert list(stream.keywords()) == [phrase for phrase, _ in handed_out]
+    streamed = stream.result()
+
+    # The stand-in numbers its answers, so the non-streamed one gets the same number
+    stubs._requests = itertools.count(1)
+    whole = generate_video_script(TOPIC, output_dir=str(tmp_path / "whole"))
+    assert streamed == whole
+    assert (tmp_path / "streamed" / "script.txt").read_text() == streamed[0]
+
+    stubs._requests = itertools.count(1)
+    content = stubs.chat_completion({'messages': []})['choices'][0]['message']['content']
+    assert streamed[0] == clean_script_text(json.loads(content)['script'])
+    assert '"wait \\ for it"' in streamed[0] and 'café' in streamed[0]
+
+    # Each keyword is handed out as soon as the comma or quote after it has arrived
+    value_start = content.index('"keywords": "') + len('"keywords": "')
+    value = json.loads(content)['keywords']
+    ends = [value_start + k + 1 for k, char in enumerate(value) if char == ',']
+    ends.append(value_start + len(value) + 1)
+    assert handed_out == list(zip(whole[1], ends))
@@ -0,0 +1,178 @@
+# tests/test_resilience.py
+import time
+
+import pytest
+
+import resilience
+
+RESET_SECONDS = 0.05
+
+class ProviderError(Exception):
+    """
+    Stands in for an SDK error with an HTTP status, like openai.APIStatusError.
+    """
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.headers = headers or {}
+
+def fail_with(error):
+    def request():
+        raise error
+    return request
+
+def succeed():
+    return "ok"
+
+@pytest.fixture
+def provider():
+    resilience.reset()
+    yield resilience.configure('test', attempts=1, failures=1, reset_seconds=RESET_SECONDS)
+    resilience.reset()
+
+def open_circuit(provider):
+    with pytest.raises(ProviderError):
+        resilience.call(provider, fail_with(ProviderError(503)))
+    assert provider.breaker.state == 'open'
+    with pytest.raises(resilience.CircuitOpenError):
+        resilience.call(provider, succeed)
+    time.sleep(RESET_SECONDS * 1.5)
+
+def test_successful_trial_closes_the_circuit(provider):
+    open_circuit(provider)
+    assert resilience.call(provider, succeed) == "ok"
+    assert provider.breaker.state == 'closed'
+
+def test_failed_trial_opens_the_circuit_again(provider):
+    open_circuit(provider)
+    with pytest.raises(ProviderError):
+        resilience.call(provider, fail_with(ProviderError(500)))
+    assert provider.breaker.state == 'open'
+
+def test_throttled_trial_does_not_leave_the_circuit_half_open(provider):
+    open_circuit(provider)
+    with pytest.raises(ProviderError):
+        resilience.call(provider, fail_with(ProviderError(429, {'retry-after': '0'})))
+    assert provider.breaker.state == 'open'
+
+    # The next trial goes through once reset_seconds have passed again
+    time.sleep(RESET_SECONDS * 1.5)
+    assert resilience.call(provider, succeed) == "ok"
+    assert provider.breaker.state == 'closed'
+
+def test_client_error_in_a_trial_closes_the_circuit(provider):
+    open_circuit(provider)
+    with pytest.raises(ProviderError):
+        resilience.call(provider, fail_with(ProviderError(400)))
+    assert provider.breaker.state == 'closed'
+    assert resilience.call(provider, succeed) == "ok"
+
+def test_error_without_a_status_in_a_trial_opens_the_circuit_again(provider):
+    open_circuit(provider)
+    with pytest.raises(ValueError):
+        resilience.call(provider, fail_with(ValueError("unreadable response")))
+    assert provider.breaker.state == 'open'
+    time.sleep(RESET_SECONDS * 1.5)
+    assert resilience.call(provider, succeed) == "ok"
+
+def test_trial_that_never_reports_back_is_replaced():
+    breaker = resilience.CircuitBreaker(failures=1, reset_seconds=RESET_SECONDS)
+    breaker.record_failure()
+    time.sleep(RESET_SECONDS * 1.5)
+    breaker.before_call('test')
+    assert breaker.state == 'half_open'
+
+    # Other calls are turned away while the trial runs...
+    with pytest.raises(resilience.CircuitOpenError):
+        breaker.before_call('test')
+    # ...but not forever
+    time.sleep(RESET_SECONDS * 1.5)
+    breaker.before_call('test')
+    assert breaker.state == 'half_open'
+
+def test_retry_after_beyond_the_cap_gives_up_instead_of_retrying_early(monkeypatch):
+    provider = resilience.configure('test', attempts=3)
+    attempts = []
+    monkeypatch.setattr(resilience.time, 'sleep', attempts.append)
+
+    def throttled():
+        raise ProviderError(429, {'retry-after': str(resilience.RETRY_MAX_SECONDS * 4)})
+    with pytest.raises(ProviderError):
+        resilience.call(provider, throttled)
+    assert provider.counts['attempts'] == 1 and provider.counts['failed'] == 1
+    assert attempts == []
+    resilience.reset()
+
+def test_retry_after_within_the_cap_is_waited_in_full(monkeypatch):
+    provider = resilience.configure('test', attempts=2)
+    slept = []
+    monkeypatch.setattr(resilience.time, 'sleep', slept.append)
+    responses = iter([ProviderError(429, {'retry-after': '20'}), None])
+
+    def throttled_once():
+        error = next(responses)
+        if error:
+            raise error
+        return "ok"
+    assert resilience.call(provider, throttled_once) == "ok"
+    assert slept and slept[0] >= 20
+    resilience.reset()
+
+class ConnectError(Exception):
+    """
+    Named like httpx.ConnectError: the connection could not be set up.
+    """
+
+class APIConnectionError(Exception):
+    """
+    Stands in for an SDK's connection error, raised from the underlying one.
+    """
+
+class ReadTimeout(Exception):
+    """
+    Named like httpx.ReadTimeout: the request was sent, the response never came.
+    """
+
+def attempts_until_success(provider, errors, **options):
+    """
+    Calls a function that raises each of `errors` in turn, then succeeds, and returns how many
+    times it was called.
+    """
+    pending = list(errors)
+    calls = []
+
+    def request():
+        calls.append(1)
+        if pending:
+            raise pending.pop(0)
+        return "ok"
+    try:
+        resilience.call(provider, request, **options)
+    except Exception:
+        pass
+    return len(calls)
+
+def connect_error():
+    try:
+        raise ConnectError("connection refused")
+    except ConnectError as cause:
+        try:
+            raise APIConnectionError("Connection error.") from cause
+        except APIConnectionError as error:
+            return error
+
+@pytest.mark.parametrize("error, retried", [
+    (ProviderError(429, {'retry-after': '0'}), True),
+    (connect_error(), True),
+    (ProviderError(503), False),
+    (ProviderError(500), False),
+    (ReadTimeout("timed out"), False),
+])
+def test_non_idempotent_calls_are_only_retried_when_never_accepted(monkeypatch, error, retried):
+    monkeypatch.setattr(resilience.time, 'sleep', lambda seconds: None)
+    provider = resilience.configure('test', attempts=3)
+    assert attempts_until_success(provider, [error], idempotent=False) == (2 if retried else 1)
+    # Idempotent calls retry all of them
+    assert attempts_until_success(provider, [error]) == 2
+    resilience.reset()
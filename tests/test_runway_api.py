@@ -0,0 +1,22 @@
+# tests/test_runway_api.py
+import os
+
+import pytest
+
+from runway_api import generate_runway_clips
+
+KEYWORDS = ["city skyline at night", "a dog on a beach", "rain on a window"]
+
+def test_tasks_run_concurrently_by_default(tmp_path, stub_providers):
+    clip_paths = generate_runway_clips(KEYWORDS, poll_interval=0.05, output_dir=str(tmp_path))
+    assert [os.path.basename(path) for path in clip_paths] == [f"runway_clip_{i}.mp4" for i in (1, 2, 3)]
+
+    # All three tasks were created before the first one could finish
+    created = sorted(task['created'] for task in stub_providers._tasks.values())
+    assert len(created) == 3
+    assert created[-1] - created[0] < stub_providers.runway_queue_seconds + stub_providers.runway_generation_seconds
+
+@pytest.mark.parametrize("max_in_flight", [0, -1])
+def test_max_in_flight_below_one_is_refused(tmp_path, max_in_flight):
+    with pytest.raises(ValueError):
+        generate_runway_clips(KEYWORDS, max_in_flight=max_in_flight, output_dir=str(tmp_path))
@@ -0,0 +1,94 @@
+# tests/test_tracing.py
+import json
+import threading
+
+import pytest
+
+import tracing
+from tracing import span, METRIC_PREFIX
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    tracing.reset()
+    yield
+    tracing.reset()
+
+def render(barrier, fail):
+    """
+    One video's spans: a render holding two encodes, the second of which fails if `fail`.
+    """
+    with span('video.render', topic="test"):
+        barrier.wait()
+        with span('ffmpeg.encode', fps=30.0) as current:
+            current.add('bytes', 1000)
+            barrier.wait()
+        try:
+            with span('ffmpeg.encode', fps=25.0) as current:
+                current.add('bytes', 500).add('retries')
+                if fail:
+                    raise RuntimeError("encoder crashed")
+        except RuntimeError:
+            pass
+
+def run_two_threads():
+    # The barrier keeps both threads inside their spans at the same time
+    barrier = threading.Barrier(2)
+    threads = [threading.Thread(target=render, args=(barrier, fail), name=f"render-{fail}") for fail in (False, True)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def metric_values(text):
+    values = {}
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            name, value = line.rsplit(' ', 1)
+            values[name] = float(value)
+    return values
+
+def test_trace_has_one_row_of_nested_spans_per_thread(tmp_path):
+    run_two_threads()
+    with open(tracing.write_chrome_trace(str(tmp_path / "trace.json"))) as f:
+        trace = json.load(f)
+
+    events = trace['traceEvents']
+    lanes = {event['tid']: event['args']['name'] for event in events if event['ph'] == 'M'}
+    assert sorted(lanes.values()) == ["render-False", "render-True"]
+
+    for tid in lanes:
+        lane_events = sorted((event for event in events if event['ph'] == 'X' and event['tid'] == tid),
+                             key=lambda event: event['ts'])
+        assert [event['name'] for event in lane_events] == ['video.render', 'ffmpeg.encode', 'ffmpeg.encode']
+        render_event, *encodes = lane_events
+        # Each encode lies inside the render and after the one before it
+        for event in encodes:
+            assert render_event['ts'] <= event['ts']
+            assert event['ts'] + event['dur'] <= render_event['ts'] + render_event['dur'] + 1
+        assert encodes[0]['ts'] + encodes[0]['dur'] <= encodes[1]['ts'] + 1
+        assert encodes[0]['args'] == {'fps': 30.0, 'bytes': 1000}
+
+    errors = [event for event in events if 'error' in event.get('args', {})]
+    assert len(errors) == 1 and lanes[errors[0]['tid']] == "render-True"
+    assert errors[0]['args']['error'] == "RuntimeError: encoder crashed"
+
+def test_prometheus_counts_every_span_by_name(tmp_path):
+    run_two_threads()
+    with span('odd "name"\\'):
+        pass
+    with open(tracing.write_prometheus(str(tmp_path / "metrics.prom"))) as f:
+        values = metric_values(f.read())
+
+    def value(metric, span_name):
+        return values[f'{METRIC_PREFIX}_{metric}{{span="{span_name}"}}']
+
+    assert value('spans_total', 'video.render') == 2
+    assert value('spans_total', 'ffmpeg.encode') == 4
+    assert value('span_errors_total', 'video.render') == 0
+    assert value('span_errors_total', 'ffmpeg.encode') == 1
+    assert value('span_bytes_total', 'ffmpeg.encode') == 3000
+    assert value('span_retries_total', 'ffmpeg.encode') == 2
+    assert value('span_seconds_total', 'video.render') >= value('span_seconds_total', 'ffmpeg.encode') > 0
+    assert value('spans_total', 'odd \\"name\\"\\\\') == 1
+    # The second encode of either thread was the last to finish
+    assert value('ffmpeg_encode_fps', 'ffmpeg.encode') == 25.0
@@ -0,0 +1,59 @@
+# tests/test_uploader.py
+import os
+
+import pytest
+
+import clients
+from stub_servers import StubS3
+from uploader import upload_file, DIGEST_METADATA_KEY
+from asset_cache import file_digest
+
+BUCKET = "stub-bucket"
+# boto3 sends parts of at least 5 MiB, whatever the configured size
+PART_SIZE = 5 * 1024 * 1024
+
+@pytest.fixture
+def s3(monkeypatch):
+    with StubS3() as stub:
+        for name, value in stub.environment(BUCKET).items():
+            monkeypatch.setenv(name, value)
+        # The shared client is built from the environment on first use
+        clients._clients.pop('s3', None)
+        yield stub
+        clients._clients.pop('s3', None)
+
+@pytest.fixture
+def large_file(tmp_path):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(os.urandom(2 * PART_SIZE + 1024))
+    return str(path)
+
+def test_large_file_goes_up_in_parts_as_one_object(s3, large_file):
+    result = upload_file(large_file, "clips/clip.mp4", bucket=BUCKET, part_size=PART_SIZE, max_concurrency=3)
+    assert not result['skipped'] and result['bytes'] == os.path.getsize(large_file)
+
+    stored = s3.objects[(BUCKET, "clips/clip.mp4")]
+    assert stored['etag'].strip('"').endswith("-3")
+    with open(large_file, 'rb') as f:
+        assert stored['data'] == f.read()
+    assert stored['metadata'][DIGEST_METADATA_KEY] == file_digest(large_file)
+
+def test_unchanged_file_is_skipped(s3, large_file):
+    upload_file(large_file, "clips/clip.mp4", bucket=BUCKET, part_size=PART_SIZE)
+    etag = s3.objects[(BUCKET, "clips/clip.mp4")]['etag']
+
+    result = upload_file(large_file, "clips/clip.mp4", bucket=BUCKET, part_size=PART_SIZE)
+    assert result['skipped'] and result['bytes'] == 0
+    assert s3.objects[(BUCKET, "clips/clip.mp4")]['etag'] == etag
+
+def test_changed_file_is_uploaded_again(s3, tmp_path):
+    path = tmp_path / "voiceover.mp3"
+    path.write_bytes(b"first take" * 1000)
+    upload_file(str(path), "audio/voiceover.mp3", bucket=BUCKET)
+
+    path.write_bytes(b"second take" * 1000)
+    result = upload_file(str(path), "audio/voiceover.mp3", bucket=BUCKET)
+    assert not result['skipped']
+    stored = s3.objects[(BUCKET, "audio/voiceover.mp3")]
+    assert stored['data'] == path.read_bytes()
+    assert stored['metadata'][DIGEST_METADATA_KEY] == file_digest(str(path))
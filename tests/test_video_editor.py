@@ -0,0 +1,55 @@
+# tests/test_video_editor.py
+import os
+import re
+import glob
+import subprocess
+from fractions import Fraction
+
+import pytest
+
+from video_editor import assemble_video, render_preview, _proxy_profile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_CLIPS = sorted(glob.glob(os.path.join(REPO_DIR, "runway_clip_*.mp4")))[:2]
+
+def display_aspect_ratio(video_path):
+    """
+    Returns a video's display aspect ratio, from its size and sample aspect ratio as ffmpeg reports them.
+    """
+    stderr = subprocess.run(["ffmpeg", "-hide_banner", "-i", video_path], capture_output=True, text=True).stderr
+    width, height, sar = re.search(r"Video: .*?, (\d+)x(\d+)(?: \[SAR (\d+:\d+))?", stderr).groups()
+    sar = Fraction(*map(int, sar.split(':'))) if sar and not sar.startswith('0:') else Fraction(1)
+    return Fraction(int(width), int(height)) * sar
+
+@pytest.fixture
+def short_voiceover(tmp_path):
+    path = str(tmp_path / "voiceover.mp3")
+    subprocess.run(["ffmpeg", "-v", "error", "-f", "lavfi", "-i", "sine=f=220:d=2", "-ac", "1", path], check=True)
+    return path
+
+@pytest.mark.parametrize("final_profile, size", [(None, (306, 510)), ('720p', (288, 512)), ('master', (288, 512))])
+def test_proxy_profile_takes_the_final_shape(final_profile, size):
+    profile = _proxy_profile(SAMPLE_CLIPS, final_profile)
+    assert (profile['width'], profile['height']) == size
+    assert profile['width'] % 2 == 0 and profile['height'] % 2 == 0
+
+@pytest.mark.parametrize("final_profile", [None, '720p'])
+def test_preview_matches_the_final_display_aspect_ratio(tmp_path, short_voiceover, final_profile):
+    final_path = assemble_video(SAMPLE_CLIPS, short_voiceover, None, output_path=str(tmp_path / "final.mp4"),
+                                script_text="A short test.", profiles=[final_profile] if final_profile else None)
+    preview_path = render_preview(SAMPLE_CLIPS, short_voiceover, None, output_path=str(tmp_path / "preview.mp4"),
+                                  final_profile=final_profile, script_text="A short test.")
+    assert final_path and preview_path
+    assert display_aspect_ratio(preview_path) == display_aspect_ratio(final_path)
+
+def test_profiles_letterbox_instead_of_stretching(tmp_path, short_voiceover):
+    output_path = assemble_video(SAMPLE_CLIPS, short_voiceover, None, output_path=str(tmp_path / "final.mp4"),
+                                 script_text="A short test.", profiles=['preview'])
+    assert display_aspect_ratio(output_path) == Fraction(9, 16)
+
+    # The 3:5 clips fill 360x600 of the 360x640 frame, with a 20-pixel bar above (captions may cover the one below)
+    stderr = subprocess.run(["ffmpeg", "-hide_banner", "-i", output_path, "-vf", "cropdetect=limit=16:round=2",
+                             "-frames:v", "10", "-f", "null", "-"], capture_output=True, text=True).stderr
+    width, _, _, top = map(int, re.findall(r"crop=(\d+):(\d+):(\d+):(\d+)", stderr)[-1])
+    assert width == 360
+    assert 14 <= top <= 22
@@ -0,0 +1,238 @@
+# tracing.py
+import os
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# At most this many finished spans are kept for the trace file; the metrics cover every span
+MAX_SPANS = 100000
+
+# Every metric name in the Prometheus export starts with this
+METRIC_PREFIX = 'viral_video_maker'
+
+# Long-running processes (the Streamlit app) rewrite their metrics here after every video, if set
+METRICS_PATH = os.getenv('METRICS_PATH')
+
+_lock = threading.Lock()
+_spans = deque(maxlen=MAX_SPANS)
+_totals = {}  # span name -> {'count', 'errors', 'seconds', 'bytes', 'retries'}
+_gauges = {}  # (metric, span name) -> last value, for the ffmpeg encode fps and speed
+
+class Span:
+    """
+    One timed operation. Times come from time.perf_counter(), which on Linux is the
+    system-wide monotonic clock, so spans recorded in worker processes line up too.
+
+    `attributes` holds anything worth keeping in the trace. Three of them also feed the
+    metrics: 'bytes' (bytes moved), 'retries' and, for ffmpeg runs, 'fps' and 'speed'.
+    """
+
+    def __init__(self, name, lane=None, start=None, **attributes):
+        self.name = name
+        # Spans on the same lane share a row in the trace viewer, so they must not overlap
+        self.lane = lane or threading.current_thread().name
+        self.pid = os.getpid()
+        self.start = time.perf_counter() if start is None else start
+        self.end_time = None
+        self.error = None
+        self.attributes = attributes
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+        return self
+
+    def add(self, name, amount=1):
+        """
+        Adds to a numeric attribute, e.g. span.add('bytes', len(chunk)) or span.add('retries').
+        """
+        self.attributes[name] = self.attributes.get(name, 0) + amount
+        return self
+
+    @property
+    def seconds(self):
+        return (self.end_time or time.perf_counter()) - self.start
+
+    def end(self, error=None, end_time=None):
+        """
+        Finishes the span and records it. Ending a span twice has no effect.
+        """
+        if self.end_time is not None:
+            return self
+        self.end_time = time.perf_counter() if end_time is None else end_time
+        self.error = str(error) if error else self.error
+        _record(self)
+        return self
+
+def _record(span):
+    with _lock:
+        _spans.append(span)
+        totals = _totals.setdefault(span.name, {'count': 0, 'errors': 0, 'seconds': 0.0, 'bytes': 0, 'retries': 0})
+        totals['count'] += 1
+        totals['errors'] += 1 if span.error else 0
+        totals['seconds'] += span.seconds
+        totals['bytes'] += span.attributes.get('bytes', 0)
+        totals['retries'] += span.attributes.get('retries', 0)
+        for gauge in ('fps', 'speed'):
+            if span.attributes.get(gauge) is not None:
+                _gauges[(gauge, span.name)] = span.attributes[gauge]
+
+def start_span(name, lane=None, **attributes):
+    """
+    Starts a span that the caller ends with span.end(), for operations that do not fit in
+    one block, such as Runway tasks followed across a polling loop.
+    """
+    return Span(name, lane=lane, **attributes)
+
+@contextmanager
+def span(name, lane=None, **attributes):
+    """
+    Times the body as a span named `name`. An exception marks the span as failed and is re-raised.
+    """
+    current = Span(name, lane=lane, **attributes)
+    try:
+        yield current
+    except BaseException as e:
+        current.end(error=f"{type(e).__name__}: {e}")
+        raise
+    current.end()
+
+def record_span(name, start, end, lane=None, error=None, **attributes):
+    """
+    Records a span that was timed elsewhere, e.g. in a worker process.
+    """
+    return Span(name, lane=lane, start=start, **attributes).end(error=error, end_time=end)
+
+def reset():
+    """
+    Forgets every span and metric.
+    """
+    with _lock:
+        _spans.clear()
+        _totals.clear()
+        _gauges.clear()
+
+def finished_spans():
+    with _lock:
+        return list(_spans)
+
+def chrome_trace(spans=None):
+    """
+    Returns spans in the Chrome trace event format, which chrome://tracing and Perfetto open.
+    Each lane becomes its own named row.
+    """
+    spans = finished_spans() if spans is None else spans
+    origin = min((s.start for s in spans), default=0.0)
+    lanes = {}
+    events = []
+    for s in spans:
+        tid = lanes.setdefault((s.pid, s.lane), len(lanes) + 1)
+        args = dict(s.attributes)
+        if s.error:
+            args['error'] = s.error
+        events.append({
+            'name': s.name,
+            'cat': s.name.split('.')[0],
+            'ph': 'X',
+            'ts': round((s.start - origin) * 1e6),
+            'dur': round(s.seconds * 1e6),
+            'pid': s.pid,
+            'tid': tid,
+            'args': args,
+        })
+    for (pid, lane), tid in lanes.items():
+        events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': lane}})
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+def write_chrome_trace(path, spans=None):
+    """
+    Writes the spans to `path` as a Chrome trace JSON file.
+    """
+    _write_atomically(path, json.dumps(chrome_trace(spans)))
+    return path
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def prometheus_text():
+    """
+    Returns the metrics of every span recorded so far in the Prometheus text exposition format.
+    """
+    with _lock:
+        totals = {name: dict(values) for name, values in _totals.items()}
+        gauges = dict(_gauges)
+
+    counters = [
+        ('span_seconds_total', 'seconds', 'Wall time spent in spans, by span name.'),
+        ('spans_total', 'count', 'Spans finished, by span name.'),
+        ('span_errors_total', 'errors', 'Spans that ended with an error, by span name.'),
+        ('span_bytes_total', 'bytes', 'Bytes moved inside spans, by span name.'),
+        ('span_retries_total', 'retries', 'Retries made inside spans, by span name.'),
+    ]
+    lines = []
+    for metric, field, help_text in counters:
+        lines.append(f"# HELP {METRIC_PREFIX}_{metric} {help_text}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_{metric} counter")
+        for name in sorted(totals):
+            lines.append(f'{METRIC_PREFIX}_{metric}{{span="{_label(name)}"}} {totals[name][field]}')
+
+    for gauge, help_text in (('fps', 'Average encode frame rate of the last ffmpeg run.'),
+                             ('speed', 'Encode speed of the last ffmpeg run, as a multiple of real time.')):
+        metric = f"{METRIC_PREFIX}_ffmpeg_encode_{gauge}"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} gauge")
+        for (name, span_name), value in sorted(gauges.items()):
+            if name == gauge:
+                lines.append(f'{metric}{{span="{_label(span_name)}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+def write_prometheus(path):
+    """
+    Writes the metrics to `path`, e.g. for node_exporter's textfile collector.
+    """
+    _write_atomically(path, prometheus_text())
+    return path
+
+def export_metrics():
+    """
+    Writes the metrics to METRICS_PATH, if it is set.
+    """
+    if METRICS_PATH:
+        write_prometheus(METRICS_PATH)
+
+def _write_atomically(path, text):
+    # Scrapers and viewers must never see a half-written file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def parse_ffmpeg_progress(lines):
+    """
+    Reads the key=value blocks that `ffmpeg -progress` writes and returns the final values.
+
+    Returns:
+        dict: 'frames', 'fps', 'speed' (multiple of real time), 'bytes' (output size) and
+        'out_seconds', each present only if ffmpeg reported it.
+    """
+    progress = {}
+    for line in lines:
+        key, _, value = line.strip().partition('=')
+        value = value.strip()
+        if not value or value == 'N/A':
+            continue
+        try:
+            if key == 'frame':
+                progress['frames'] = int(value)
+            elif key == 'fps':
+                progress['fps'] = float(value)
+            elif key == 'speed':
+                progress['speed'] = float(value.rstrip('x'))
+            elif key == 'total_size':
+                progress['bytes'] = int(value)
+            elif key == 'out_time_us':
+                progress['out_seconds'] = int(value) / 1e6
+        except ValueError:
+            continue
+    return progress
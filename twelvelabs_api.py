@@ -1,108 +1,306 @@
-from twelvelabs import TwelveLabs
-from twelvelabs.indexes import IndexesCreateRequestModelsItem
-from twelvelabs.tasks import TasksRetrieveResponse
-
+# twelvelabs_api.py
 import os
-import boto3
-from dotenv import load_dotenv
-
-from glob import glob
-
-
-load_dotenv()
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import resilience
+from asset_cache import file_digest
+from clients import get_twelvelabs_client
+from tracing import span
+from uploader import upload_file
+
+# Index ids, and the videos already indexed in each (by content hash), are kept here across runs
+REGISTRY_PATH = os.getenv(
+    'TWELVELABS_REGISTRY_PATH',
+    os.path.join(os.path.expanduser('~'), '.cache', 'viral_video_maker', 'twelvelabs_registry.json')
+)
 
+# Pending indexing tasks are polled together: every POLL_INITIAL_SECONDS at first, backing off by
+# POLL_BACKOFF whenever a round brings no news, up to POLL_MAX_SECONDS
+POLL_INITIAL_SECONDS = float(os.getenv('TWELVELABS_POLL_INTERVAL', 2.0))
+POLL_MAX_SECONDS = 30.0
+POLL_BACKOFF = 1.5
+# Tasks still not finished this many seconds after polling starts are given up on
+WAIT_TIMEOUT_SECONDS = float(os.getenv('TWELVELABS_WAIT_TIMEOUT', 3600))
 
-# S3 config from environment
-AWS_REGION = os.getenv("AWS_REGION")
-S3_BUCKET = os.getenv("S3_BUCKET_NAME")
-AWS_ACCESS_KEY = os.getenv("AWS_ACCESS_KEY_ID")
-AWS_SECRET_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
+# Task statuses after which Twelve Labs does no more work
+FINISHED_STATUSES = ('ready', 'failed')
 
-s3_client = boto3.client(
-    "s3",
-    region_name=AWS_REGION,
-    aws_access_key_id=AWS_ACCESS_KEY,
-    aws_secret_access_key=AWS_SECRET_KEY
-)
+_registry_lock = threading.Lock()
 
 def upload_video_to_s3(local_file_path, s3_key):
     """
-    Upload a local video file to S3 and return the public URL
+    Upload a local video file to S3 and return the public URL. The upload is skipped if
+    the object already holds the same file.
     """
     try:
-        # Upload the file to S3
-        s3_client.upload_file(local_file_path, S3_BUCKET, s3_key)
-        
-        # Generate the public URL
-        s3_url = f"https://{S3_BUCKET}.s3.{AWS_REGION}.amazonaws.com/{s3_key}"
-        
-        print(f"Successfully uploaded {local_file_path} to S3")
+        s3_url = upload_file(local_file_path, s3_key)['url']
         print(f"S3 URL: {s3_url}")
-        
         return s3_url
-        
+
     except Exception as e:
         print(f"Error uploading to S3: {e}")
         raise e
 
-
-
-client = TwelveLabs(api_key=os.getenv("TWELVE_LABS_API_KEY"))
-
-index = client.indexes.create(
-    index_name="ddddyur",
-    models=[
-        IndexesCreateRequestModelsItem(
-            model_name="marengo2.7",
-            model_options=["visual", "audio"]
-        )
-    ]
-)
-if index.id is None:
-    raise RuntimeError("Failed to create an index.")
-print(f"Created index: id={index.id}")
-
-
-video_path = os.path.join(os.path.dirname(__file__), "videos_twelve/test.MP4")
-with open(video_path, "rb") as video_file:
-    task = client.tasks.create(index_id=index.id, video_file=video_file)
-
-
-
-def on_task_update(task: TasksRetrieveResponse):
-    print(f"  Status={task.status}")
-task = client.tasks.wait_for_done(task_id=task.id, callback=on_task_update)
-if task.status != "ready":
-    raise RuntimeError(f"Indexing failed with status {task.status}")
-print(
-    f"Upload complete. The unique identifier of your video is {task.video_id}.")
-
-search_pager = client.search.query(
-    index_id=index.id, query_text="look for black screens", search_options=["visual", "audio"],)
-print("Search results:")
-for clip in search_pager:
-    print(
-        f" video_id {clip.video_id} score={clip.score} start={clip.start} end={clip.end} confidence={clip.confidence}"
+def create_index(index_name):
+    """
+    Creates a Twelve Labs index with visual and audio search and returns its id.
+    """
+    from twelvelabs.indexes import IndexesCreateRequestModelsItem
+
+    index = get_twelvelabs_client().indexes.create(
+        index_name=index_name,
+        models=[
+            IndexesCreateRequestModelsItem(
+                model_name="marengo2.7",
+                model_options=["visual", "audio"]
+            )
+        ]
     )
+    if index.id is None:
+        raise RuntimeError("Failed to create an index.")
+    print(f"Created index: id={index.id}")
+    return index.id
 
+def _load_registry():
+    try:
+        with open(REGISTRY_PATH) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'indexes': {}}
+    except (OSError, ValueError) as e:
+        print(f"Error reading the Twelve Labs registry, starting a new one: {e}")
+        return {'indexes': {}}
+
+def _update_registry(update):
+    """
+    Applies `update` to the registry on disk under a lock and writes it back atomically.
 
+    Args:
+        update (callable): Takes the registry dict and changes it in place.
+    """
+    with _registry_lock:
+        registry = _load_registry()
+        update(registry)
+        os.makedirs(os.path.dirname(REGISTRY_PATH), exist_ok=True)
+        tmp_path = f"{REGISTRY_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(registry, f, indent=2)
+        os.replace(tmp_path, REGISTRY_PATH)
+
+def get_or_create_index(index_name):
+    """
+    Returns the id of the index called `index_name`, creating it only if neither the registry
+    nor the Twelve Labs account has one yet. The id is recorded in the registry, so later
+    runs make no API call at all.
+    """
+    with _registry_lock:
+        entry = _load_registry()['indexes'].get(index_name)
+    if entry:
+        return entry['id']
+
+    existing = [index for index in get_twelvelabs_client().indexes.list(index_name=index_name)
+                if index.index_name == index_name]
+    if existing:
+        index_id = existing[0].id
+        print(f"Reusing index: id={index_id}")
+    else:
+        index_id = create_index(index_name)
+
+    def record(registry):
+        registry['indexes'].setdefault(index_name, {'id': index_id, 'videos': {}})
+    _update_registry(record)
+    return index_id
+
+def _indexed_videos(index_id):
+    """
+    Returns the registry's {content hash: video id} map for an index.
+    """
+    with _registry_lock:
+        for entry in _load_registry()['indexes'].values():
+            if entry['id'] == index_id:
+                return dict(entry['videos'])
+    return {}
+
+def _record_video(index_id, digest, video_id):
+    def record(registry):
+        for entry in registry['indexes'].values():
+            if entry['id'] == index_id:
+                entry['videos'][digest] = video_id
+                return
+        registry['indexes'][index_id] = {'id': index_id, 'videos': {digest: video_id}}
+    _update_registry(record)
+
+def _wait_for_tasks(tasks, on_task_update=None, timeout=WAIT_TIMEOUT_SECONDS):
+    """
+    Polls every pending indexing task until each one is finished, from a single loop. The
+    interval grows while no task changes status and drops back as soon as one does. A task
+    that cannot be retrieved is reported and polled again in the next round; tasks still
+    pending after `timeout` seconds are reported and left out.
+
+    Args:
+        tasks (dict): Task id -> the video's (path, content hash).
+        on_task_update (callable): Called with each task whose status changed.
+        timeout (float): The seconds to wait for all the tasks at most.
+
+    Returns:
+        dict: Task id -> the finished task, for the tasks that finished in time.
+    """
+    client = get_twelvelabs_client()
+    statuses = {task_id: None for task_id in tasks}
+    finished = {}
+    interval = POLL_INITIAL_SECONDS
+    deadline = time.monotonic() + timeout
+
+    def retrieve(task_id):
+        try:
+            return resilience.call('twelvelabs', client.tasks.retrieve, task_id)
+        except Exception as e:
+            print(f"  - Error checking indexing task {task_id} of {tasks[task_id][0]}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(8, len(tasks)) or 1) as pool:
+        while len(finished) < len(tasks):
+            pending = [task_id for task_id in tasks if task_id not in finished]
+            changed = False
+            for task_id, task in zip(pending, pool.map(retrieve, pending)):
+                if task is None:
+                    continue
+                if task.status != statuses[task_id]:
+                    statuses[task_id] = task.status
+                    changed = True
+                    if on_task_update:
+                        on_task_update(task)
+                if task.status in FINISHED_STATUSES:
+                    finished[task_id] = task
+            if len(finished) == len(tasks):
+                break
+            interval = POLL_INITIAL_SECONDS if changed else min(interval * POLL_BACKOFF, POLL_MAX_SECONDS)
+            if time.monotonic() + interval > deadline:
+                for task_id in tasks:
+                    if task_id not in finished:
+                        print(f"  - Gave up waiting for indexing task {task_id} of {tasks[task_id][0]} "
+                              f"after {timeout:.0f}s (status={statuses[task_id]})")
+                break
+            time.sleep(interval)
+    return finished
+
+def index_videos(index_id, video_paths, max_workers=4):
+    """
+    Indexes several videos at once. Videos whose content was already indexed into this index
+    (according to the registry) are not uploaded again. The rest are uploaded in parallel,
+    then all their tasks are awaited together.
 
+    Args:
+        index_id (str): The index.
+        video_paths (list): The local video files.
+        max_workers (int): The maximum number of uploads at once.
 
+    Returns:
+        dict: Video path -> video id, or None for a video that failed to index.
+    """
+    client = get_twelvelabs_client()
+    with span('twelvelabs.index', videos=len(video_paths)) as current:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            digests = list(pool.map(file_digest, video_paths))
+
+        known = _indexed_videos(index_id)
+        video_ids = {path: known[digest] for path, digest in zip(video_paths, digests) if digest in known}
+        # Identical files in the batch are uploaded once
+        to_index = {}
+        for path, digest in zip(video_paths, digests):
+            if digest not in known:
+                to_index.setdefault(digest, path)
+        print(f"Indexing {len(to_index)} videos; {len(video_ids)} already indexed, "
+              f"{len(video_paths) - len(video_ids) - len(to_index)} duplicated in the batch")
+
+        def create_task(path):
+            def upload():
+                # A retry sends the file again from its start
+                with open(path, "rb") as video_file:
+                    return client.tasks.create(index_id=index_id, video_file=video_file)
+            return resilience.call('twelvelabs', upload, idempotent=False).id
+
+        tasks = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {digest: pool.submit(create_task, path) for digest, path in to_index.items()}
+            for digest, future in futures.items():
+                try:
+                    tasks[future.result()] = (to_index[digest], digest)
+                except Exception as e:
+                    print(f"  - Error uploading {to_index[digest]} for indexing: {e}")
+
+        def on_task_update(task):
+            print(f"  - {os.path.basename(tasks[task.id][0])}: status={task.status}")
+        finished = _wait_for_tasks(tasks, on_task_update) if tasks else {}
+
+        indexed = {}
+        for task_id, (path, digest) in tasks.items():
+            task = finished.get(task_id)
+            if task is None:
+                continue
+            if task.status == 'ready':
+                indexed[digest] = task.video_id
+                _record_video(index_id, digest, task.video_id)
+            else:
+                print(f"  - Indexing {path} failed with status {task.status}")
+
+        for path, digest in zip(video_paths, digests):
+            video_ids.setdefault(path, indexed.get(digest))
+        current.set(uploaded=len(tasks), skipped=len(video_paths) - len(to_index),
+                    failed=sum(1 for video_id in video_ids.values() if video_id is None))
+    return video_ids
+
+def index_video(index_id, video_path):
+    """
+    Indexes one video, unless it was indexed before, and returns its video id.
+    """
+    video_id = index_videos(index_id, [video_path])[video_path]
+    if video_id is None:
+        raise RuntimeError(f"Indexing {video_path} failed")
+    print(f"Upload complete. The unique identifier of your video is {video_id}.")
+    return video_id
 
-"""
-curl -X GET "https://api.twelvelabs.io/v1.3/indexes" \
-  -H "x-api-key: tlk_0FH0KA318Q2K4E2K19T172AF4VS2"
-
-
-
-{"data":[],"page_info":{"page":1,"limit_per_page":10,"total_page":0,"total_results":0}}
-(base) hamzabenaggoun@Hamzas-MacBook-Pro ~ % 
-"""
-
-
-
-
-
-
+def search_index(index_id, query_text):
+    """
+    Runs a visual and audio search over an index and returns the matching clips.
+    """
+    def search():
+        # The pager fetches its pages lazily, so they are read inside the call that is retried
+        return list(get_twelvelabs_client().search.query(
+            index_id=index_id, query_text=query_text, search_options=["visual", "audio"],))
+    return resilience.call('twelvelabs', search)
 
+def search_many(index_id, queries, max_workers=4):
+    """
+    Runs several searches over an index in parallel.
 
+    Returns:
+        dict: Query -> its matching clips, or None if that search failed.
+    """
+    def search(query_text):
+        try:
+            return search_index(index_id, query_text)
+        except Exception as e:
+            print(f"  - Error searching for {query_text!r}: {e}")
+            return None
+
+    with span('twelvelabs.search', queries=len(queries)):
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return dict(zip(queries, pool.map(search, queries)))
+
+if __name__ == '__main__':
+    import sys
+
+    index_id = get_or_create_index("ddddyur")
+    video_paths = sys.argv[1:] or [os.path.join(os.path.dirname(__file__), "videos_twelve/test.MP4")]
+    index_videos(index_id, video_paths)
+
+    print("Search results:")
+    for query_text, clips in search_many(index_id, ["look for black screens"]).items():
+        for clip in clips or []:
+            print(
+                f" video_id {clip.video_id} score={clip.score} start={clip.start} end={clip.end} confidence={clip.confidence}"
+            )
@@ -0,0 +1,140 @@
+# uploader.py
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asset_cache import file_digest
+from clients import get_s3_client
+from tracing import start_span
+
+# S3 config from environment
+S3_BUCKET = os.getenv("S3_BUCKET_NAME")
+
+# Files larger than one part are sent as a multipart upload, with this many parts in flight at once
+PART_SIZE = int(os.getenv('S3_PART_SIZE', 8 * 1024 * 1024))
+MAX_CONCURRENCY = int(os.getenv('S3_MAX_CONCURRENCY', 8))
+
+# Object metadata key holding the SHA-256 of the uploaded file, used to skip identical uploads
+DIGEST_METADATA_KEY = 'sha256'
+
+def object_url(bucket, key):
+    """
+    Returns the URL of an object: on the S3_ENDPOINT_URL service if it is set, otherwise on AWS.
+    """
+    endpoint_url = os.getenv('S3_ENDPOINT_URL')
+    if endpoint_url:
+        return f"{endpoint_url.rstrip('/')}/{bucket}/{key}"
+    return f"https://{bucket}.s3.{os.getenv('AWS_REGION')}.amazonaws.com/{key}"
+
+def _stored_digest(s3_client, bucket, key):
+    """
+    Returns the SHA-256 recorded on an existing object, or None if there is no such object.
+    """
+    from botocore.exceptions import ClientError
+
+    try:
+        response = s3_client.head_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+            return None
+        raise
+    return response.get('Metadata', {}).get(DIGEST_METADATA_KEY)
+
+def upload_file(file_path, key, bucket=None, part_size=PART_SIZE, max_concurrency=MAX_CONCURRENCY, s3_client=None):
+    """
+    Uploads a file to S3, unless the object at `key` already holds the same bytes.
+
+    The file's SHA-256 is stored in the object's metadata. Before uploading, a HEAD request
+    compares it with the one on the existing object, so a file that was uploaded before is
+    not sent again. Files larger than `part_size` go up as multipart uploads with up to
+    `max_concurrency` parts in flight.
+
+    Args:
+        file_path (str): The file to upload.
+        key (str): The object key.
+        bucket (str): The bucket. Defaults to S3_BUCKET_NAME.
+        part_size (int): Bytes per part, and the size from which multipart uploads are used.
+        max_concurrency (int): Parts uploaded at once.
+        s3_client: The boto3 S3 client to use. Defaults to the shared one.
+
+    Returns:
+        dict: 'bucket', 'key', 'url', 'bytes', 'seconds', 'throughput' (bytes per second) and
+        'skipped' (True if the object was already there).
+    """
+    from boto3.s3.transfer import TransferConfig
+
+    s3_client = s3_client or get_s3_client()
+    bucket = bucket or S3_BUCKET
+    size = os.path.getsize(file_path)
+    trace = start_span('upload', file=os.path.basename(file_path), key=key)
+    start_time = time.perf_counter()
+
+    try:
+        digest = file_digest(file_path)
+        skipped = _stored_digest(s3_client, bucket, key) == digest
+        if not skipped:
+            config = TransferConfig(
+                multipart_threshold=part_size, multipart_chunksize=part_size,
+                max_concurrency=max_concurrency, use_threads=max_concurrency > 1
+            )
+            s3_client.upload_file(
+                file_path, bucket, key,
+                ExtraArgs={'Metadata': {DIGEST_METADATA_KEY: digest}}, Config=config
+            )
+    except Exception as e:
+        trace.end(error=e)
+        raise
+
+    elapsed = time.perf_counter() - start_time
+    bytes_sent = 0 if skipped else size
+    stats = {
+        "bucket": bucket,
+        "key": key,
+        "url": object_url(bucket, key),
+        "bytes": bytes_sent,
+        "seconds": elapsed,
+        "throughput": bytes_sent / elapsed if elapsed > 0 else 0.0,
+        "skipped": skipped,
+    }
+    if skipped:
+        print(f"  - s3://{bucket}/{key} already holds {os.path.basename(file_path)}, skipped the upload")
+    else:
+        print(f"  - Uploaded {file_path} to s3://{bucket}/{key} "
+              f"({size / 1e6:.2f} MB in {elapsed:.2f}s, {stats['throughput'] / 1e6:.2f} MB/s)")
+    trace.set(bytes=bytes_sent, skipped=skipped).end()
+    return stats
+
+def upload_files(uploads, max_workers=4, **kwargs):
+    """
+    Uploads several files at once over the shared client.
+
+    Args:
+        uploads (list): (file_path, key) pairs.
+        max_workers (int): The maximum number of files uploading at once.
+        **kwargs: Passed on to upload_file().
+
+    Returns:
+        list: The upload_file() result for each pair, in the same order (None for failures).
+    """
+    if not uploads:
+        return []
+
+    def upload(file_path, key):
+        try:
+            return upload_file(file_path, key, **kwargs)
+        except Exception as e:
+            print(f"  - Error uploading {file_path}: {e}")
+            return None
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(lambda upload_pair: upload(*upload_pair), uploads))
+    elapsed = time.perf_counter() - start_time
+
+    uploaded = [result for result in results if result and not result['skipped']]
+    skipped = sum(1 for result in results if result and result['skipped'])
+    total_bytes = sum(result['bytes'] for result in uploaded)
+    print(f"Uploaded {len(uploaded)} files ({total_bytes / 1e6:.2f} MB) in {elapsed:.2f}s, "
+          f"{total_bytes / elapsed / 1e6 if elapsed > 0 else 0.0:.2f} MB/s; "
+          f"{skipped} already uploaded, {results.count(None)} failed")
+    return results
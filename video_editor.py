@@ -1,36 +1,97 @@
-import ffmpeg
 import os
 import json
+import time
+import tempfile
 
-def create_srt_from_script(script_text, audio_duration_seconds, srt_output_path="captions.srt"):
+import media_info
+from tracing import span, record_span, parse_ffmpeg_progress
+
+# ffmpeg-python, NumPy (caption alignment), multiprocessing and the mezzanine step are imported
+# where they are used, so importing this module stays cheap for the CLI and Streamlit entry points.
+
+def _format_srt_time(seconds):
+    time_ms = int(seconds * 1000)
+    return f"{time_ms // 3600000:02d}:{time_ms % 3600000 // 60000:02d}:{time_ms % 60000 // 1000:02d},{time_ms % 1000:03d}"
+
+def _spread_words(text, start_seconds, end_seconds, words_per_block):
+    words = text.split()
+    total_words = len(words)
+    words_per_second = total_words / (end_seconds - start_seconds)
+
+    caption_blocks = []
+    for i in range(0, total_words, words_per_block):
+        caption_block_start_sec = start_seconds + i / words_per_second
+        caption_block_end_sec = start_seconds + (i + words_per_block) / words_per_second
+        caption_blocks.append((caption_block_start_sec, caption_block_end_sec, " ".join(words[i:i+words_per_block])))
+    return caption_blocks
+
+def build_caption_blocks(script_text, audio_duration_seconds, words_per_block=5, audio_path=None, anchors=None):
     """
-    Creates a basic .srt subtitle file by estimating timings from audio duration.
-    This is a simplified approach for demonstration purposes.
+    Splits the script into caption blocks and times them.
+
+    With `audio_path`, the blocks are aligned to the speech detected in the audio (see
+    caption_aligner.py). Otherwise, or if alignment fails, the words are spread evenly over
+    the audio duration.
+
+    `anchors` are the exact (start_seconds, end_seconds, text) times of the chunks of a
+    chunked voiceover. With them, every chunk is timed on its own: aligned to its slice of
+    the audio, or with its words spread evenly between its start and end.
+
+    Returns:
+        list: (start_seconds, end_seconds, text) tuples in playback order.
     """
-    try:
-        words = script_text.split()
-        total_words = len(words)
-        words_per_second = total_words / audio_duration_seconds
+    if audio_path:
+        try:
+            from caption_aligner import align_captions, align_captions_with_anchors
+            if anchors:
+                return align_captions_with_anchors(anchors, audio_path, words_per_block)
+            return align_captions(script_text, audio_path, words_per_block)
+        except Exception as e:
+            print(f"Caption alignment failed, falling back to uniform timing: {e}")
 
-        with open(srt_output_path, 'w') as f:
-            current_word_index = 0
-            for i in range(0, total_words, 5):  # Create a new caption block every 5 words
-                caption_block_start_sec = current_word_index / words_per_second
-                caption_block_end_sec = (current_word_index + 5) / words_per_second
+    if anchors:
+        caption_blocks = []
+        for start, end, text in anchors:
+            caption_blocks.extend(_spread_words(text, start, end, words_per_block))
+        return caption_blocks
+    return _spread_words(script_text, 0.0, audio_duration_seconds, words_per_block)
 
-                start_time_ms = int(caption_block_start_sec * 1000)
-                end_time_ms = int(caption_block_end_sec * 1000)
+def write_srt(caption_blocks, srt_output_path, start_seconds=0.0, end_seconds=None):
+    """
+    Writes caption blocks to an .srt file.
 
-                start_time_str = f"{start_time_ms // 3600000:02d}:{start_time_ms % 3600000 // 60000:02d}:{start_time_ms % 60000 // 1000:02d},{start_time_ms % 1000:03d}"
-                end_time_str = f"{end_time_ms // 3600000:02d}:{end_time_ms % 3600000 // 60000:02d}:{end_time_ms % 60000 // 1000:02d},{end_time_ms % 1000:03d}"
+    Only the blocks that overlap [start_seconds, end_seconds) are written, with their timings
+    shifted so that `start_seconds` becomes 0. This gives each segment of a parallel render
+    its own slice of the captions.
+    """
+    with open(srt_output_path, 'w') as f:
+        index = 1
+        for block_start, block_end, caption_text in caption_blocks:
+            if block_end <= start_seconds or (end_seconds is not None and block_start >= end_seconds):
+                continue
+            block_start = max(block_start, start_seconds) - start_seconds
+            block_end = block_end - start_seconds
+            if end_seconds is not None:
+                block_end = min(block_end, end_seconds - start_seconds)
 
-                caption_text = " ".join(words[i:i+5])
-                
-                f.write(f"{i // 5 + 1}\n")
-                f.write(f"{start_time_str} --> {end_time_str}\n")
-                f.write(f"{caption_text}\n\n")
+            f.write(f"{index}\n")
+            f.write(f"{_format_srt_time(block_start)} --> {_format_srt_time(block_end)}\n")
+            f.write(f"{caption_text}\n\n")
+            index += 1
+    return srt_output_path
 
-                current_word_index += 5
+def create_srt_from_script(script_text, audio_duration_seconds, srt_output_path="captions.srt", audio_path=None,
+                           anchors=None):
+    """
+    Creates a .srt subtitle file with a caption block every 5 words.
+    The blocks are aligned to the voiceover when `audio_path` is given, and otherwise
+    timed by spreading the words evenly over the audio duration. With the chunk `anchors`
+    of a chunked voiceover, each chunk is timed within its exact start and end.
+    """
+    try:
+        caption_blocks = build_caption_blocks(script_text, audio_duration_seconds, audio_path=audio_path,
+                                              anchors=anchors)
+        write_srt(caption_blocks, srt_output_path)
 
         print(f"SRT file created at {srt_output_path}")
         return srt_output_path
@@ -39,56 +100,429 @@ def create_srt_from_script(script_text, audio_duration_seconds, srt_output_path=
         print(f"Error creating SRT file: {e}")
         return None
 
-def assemble_video(video_clip_paths, audio_file_path, script_file_path, output_path="final_video.mp4"):
+# Renditions assemble_video() can write from a single decode of the timeline. Sizes are for the
+# vertical 9:16 output, and clips of another shape are letterboxed into them rather than
+# stretched; each profile sets either a constant quality (crf) or a target bitrate
+OUTPUT_PROFILES = {
+    'master': {'width': 1080, 'height': 1920, 'crf': 18, 'preset': 'medium', 'audio_bitrate': '192k'},
+    '720p': {'width': 720, 'height': 1280, 'crf': 23, 'preset': 'veryfast', 'audio_bitrate': '128k'},
+    'preview': {'width': 360, 'height': 640, 'video_bitrate': '400k', 'preset': 'veryfast', 'audio_bitrate': '64k'},
+    # A throwaway render to watch while the real one encodes; render_preview() gives it the final
+    # render's shape
+    'proxy': {'width': 288, 'height': 512, 'crf': 30, 'preset': 'ultrafast', 'audio_bitrate': '64k'},
+}
+
+def rendition_path(output_path, name):
     """
-    Concatenates video clips, adds an audio track, and overlays captions.
+    Returns where assemble_video() writes the rendition called `name` next to `output_path`.
     """
-    print("Starting video assembly with FFmpeg...")
+    stem, extension = os.path.splitext(output_path)
+    return f"{stem}_{name}{extension or '.mp4'}"
 
-    try:
-        # Get audio duration using ffmpeg.probe()
-        probe = ffmpeg.probe(audio_file_path)
-        audio_duration = float(probe['format']['duration'])
-        
-        # Create the .srt file for captions
-        srt_file_path = create_srt_from_script(
-            open(script_file_path).read(),
-            audio_duration
+def _resolve_renditions(profiles, output_path):
+    """
+    Returns (path, settings) for every rendition to write: the first profile goes to
+    `output_path` and the others next to it (see rendition_path). Profiles are names from
+    OUTPUT_PROFILES or dicts with a 'name'. Without profiles, the one output keeps the clips' size.
+    """
+    if not profiles:
+        return [(output_path, {})]
+    renditions = []
+    for k, profile in enumerate(profiles):
+        settings = OUTPUT_PROFILES[profile] if isinstance(profile, str) else profile
+        name = profile if isinstance(profile, str) else profile['name']
+        renditions.append((output_path if k == 0 else rendition_path(output_path, name), settings))
+    return renditions
+
+def _video_options(settings):
+    options = {'vcodec': 'libx264'}
+    for key in ('crf', 'preset', 'video_bitrate'):
+        if settings.get(key) is not None:
+            options[key] = settings[key]
+    return options
+
+def _audio_options(settings):
+    options = {'acodec': 'aac'}
+    if settings.get('audio_bitrate'):
+        options['audio_bitrate'] = settings['audio_bitrate']
+    return options
+
+def _fit(video_stream, width, height):
+    """
+    Scales a video stream to fit in width x height without changing its aspect ratio, pads the
+    rest with black and marks its pixels square, like the mezzanine encode does.
+    """
+    return (
+        video_stream
+        .filter('scale', width, height, force_original_aspect_ratio='decrease', flags='lanczos')
+        .filter('pad', width, height, '(ow-iw)/2', '(oh-ih)/2')
+        .filter('setsar', 1)
+    )
+
+def _caption_and_split(video_stream, srt_file_path, renditions):
+    """
+    Burns the captions into the timeline once and fans it out to every rendition with the
+    split filter. The captions are drawn at the largest rendition's size, so they stay sharp
+    there, and the other branches are scaled down from it. Every size is reached with _fit(),
+    so the picture is never stretched.
+
+    Returns:
+        list: One video stream per rendition, in order.
+    """
+    def size(settings):
+        return (settings['width'], settings['height']) if settings.get('width') else None
+
+    sizes = [size(settings) for _, settings in renditions]
+    largest = max((s for s in sizes if s), key=lambda s: s[0] * s[1], default=None)
+    if largest:
+        video_stream = _fit(video_stream, *largest)
+    video_stream = video_stream.filter('subtitles', filename=srt_file_path)
+    if len(renditions) == 1:
+        return [video_stream]
+
+    branches = video_stream.filter_multi_output('split', len(renditions))
+    streams = []
+    for k, rendition_size in enumerate(sizes):
+        branch = branches.stream(k)
+        if rendition_size and rendition_size != largest:
+            branch = _fit(branch, *rendition_size)
+        streams.append(branch)
+    return streams
+
+def _run_ffmpeg(stream, span_name, capture_output=False, **attributes):
+    """
+    Runs an ffmpeg-python graph like ffmpeg.run(), inside a span that records the encode
+    fps, speed, frame count and output size that ffmpeg reports through `-progress`.
+
+    Without `capture_output`, ffmpeg's log goes to the console as with ffmpeg.run().
+
+    Returns:
+        dict: The final progress values (see tracing.parse_ffmpeg_progress).
+
+    Raises:
+        ffmpeg.Error: If ffmpeg exits with an error.
+    """
+    import ffmpeg
+
+    with span(span_name, **attributes) as current:
+        process = (
+            stream
+            .global_args('-progress', 'pipe:1')
+            .run_async(pipe_stdout=True, pipe_stderr=capture_output)
         )
-        if not srt_file_path:
-            return None
-
-        # Step 1: Create input streams for all video clips
-        video_streams = [ffmpeg.input(clip) for clip in video_clip_paths]
-
-        # Step 2: Concatenate the video clips
-        concatenated_video_stream = ffmpeg.concat(*video_streams, v=1, a=0).node
-        
-        # Step 3: Apply the subtitles filter to the concatenated video stream
-        subtitled_video_stream = ffmpeg.filter(concatenated_video_stream[0], 'subtitles', filename=srt_file_path).node
-
-        # Step 4: Add the audio input and combine with the subtitled video
-        audio_stream = ffmpeg.input(audio_file_path)
-        
-        # We need to set the duration of the final video to match the audio
-        final_video = (
+        out, err = process.communicate()
+        progress = parse_ffmpeg_progress(out.decode('utf8', errors='replace').splitlines())
+        current.set(**progress)
+        if process.returncode:
+            raise ffmpeg.Error('ffmpeg', out, err)
+    return progress
+
+def _probe_clips(video_clip_paths):
+    """
+    Returns the duration of every clip, rounded to whole frames, and the frame rate of the first
+    clip that has one. A clip without a known frame rate keeps its duration as it is.
+    """
+    durations = []
+    fps = None
+    for clip in video_clip_paths:
+        info = media_info.probe(clip)
+        clip_fps = info['video']['fps']
+        fps = fps or clip_fps
+        duration = info['video']['duration'] or info['duration']
+        durations.append(round(duration * clip_fps) / clip_fps if clip_fps else duration)
+    return durations, fps
+
+def plan_segments(clip_durations, total_duration, segment_count, fps):
+    """
+    Splits the output timeline into `segment_count` segments of roughly equal length.
+
+    Segment boundaries fall on frame boundaries so that the segments add up to exactly the
+    frames a single-pass render would produce.
+
+    Returns:
+        list: One dict per segment with its 'start' and 'end' on the output timeline (seconds)
+        and its 'pieces': (clip index, in-point, duration) ranges taken from the source clips.
+    """
+    total_frames = round(min(sum(clip_durations), total_duration) * fps)
+    boundaries = [round(total_frames * k / segment_count) for k in range(segment_count + 1)]
+
+    segments = []
+    for first_frame, last_frame in zip(boundaries, boundaries[1:]):
+        if last_frame <= first_frame:
+            continue
+        start, end = float(first_frame / fps), float(last_frame / fps)
+        pieces = []
+        clip_start = 0.0
+        for clip_index, clip_duration in enumerate(clip_durations):
+            clip_end = clip_start + float(clip_duration)
+            overlap_start, overlap_end = max(start, clip_start), min(end, clip_end)
+            if overlap_end > overlap_start:
+                pieces.append((clip_index, overlap_start - clip_start, overlap_end - overlap_start))
+            clip_start = clip_end
+        segments.append({'start': start, 'end': end, 'pieces': pieces})
+    return segments
+
+def _render_segment(clip_pieces, srt_file_path, renditions, duration, threads):
+    """
+    Encodes one segment of the timeline (video only, captions burned in) for every
+    (segment path, settings) in `renditions`, from one decode.
+    Runs in a worker process, so it only takes plain arguments. Spans recorded here stay in
+    the worker, so the timing and progress are returned for the parent to record.
+
+    Returns:
+        tuple: The segment paths, the start and end time (time.perf_counter()) and the ffmpeg progress.
+    """
+    import ffmpeg
+
+    start_time = time.perf_counter()
+
+    video_streams = [ffmpeg.input(clip, ss=inpoint, t=length) for clip, inpoint, length in clip_pieces]
+    concatenated_video_stream = ffmpeg.concat(*video_streams, v=1, a=0).node[0]
+    outputs = [
+        ffmpeg.output(stream, path, t=duration, threads=threads, **_video_options(settings)).overwrite_output()
+        for stream, (path, settings) in zip(_caption_and_split(concatenated_video_stream, srt_file_path, renditions),
+                                            renditions)
+    ]
+    progress = _run_ffmpeg(ffmpeg.merge_outputs(*outputs), 'ffmpeg.segment', capture_output=True)
+    return [path for path, _ in renditions], start_time, time.perf_counter(), progress
+
+def _assemble_video_parallel(video_clip_paths, audio_file_path, caption_blocks, audio_duration, renditions,
+                             segment_count, max_workers):
+    """
+    Renders the timeline as `segment_count` independent segments in a process pool, then joins
+    them with the concat demuxer (stream copy) and muxes the audio in the same step. Every
+    segment writes all the renditions, and each rendition is joined on its own.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    import ffmpeg
+
+    clip_durations, fps = _probe_clips(video_clip_paths)
+    segments = plan_segments(clip_durations, audio_duration, segment_count, fps)
+    max_workers = max_workers or min(len(segments), os.cpu_count() or 1)
+    # Share the cores between the encoders instead of letting each one use all of them
+    threads = max(1, (os.cpu_count() or 1) // max_workers)
+
+    # Segments are written next to the output, so they share the run's workspace
+    output_dir = os.path.dirname(os.path.abspath(renditions[0][0]))
+    with tempfile.TemporaryDirectory(prefix='segments-', dir=output_dir) as tmp_dir:
+        jobs = []
+        for k, segment in enumerate(segments):
+            srt_file_path = write_srt(caption_blocks, os.path.join(tmp_dir, f"segment_{k:03d}.srt"),
+                                      segment['start'], segment['end'])
+            clip_pieces = [(video_clip_paths[i], inpoint, length) for i, inpoint, length in segment['pieces']]
+            segment_renditions = [(os.path.join(tmp_dir, f"segment_{k:03d}_{r}.mp4"), settings)
+                                  for r, (_, settings) in enumerate(renditions)]
+            jobs.append((clip_pieces, srt_file_path, segment_renditions, segment['end'] - segment['start'], threads))
+
+        print(f"Rendering {len(jobs)} segments with {max_workers} worker processes...")
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            segment_paths = []
+            for k, (paths, start_time, end_time, progress) in enumerate(pool.map(_render_segment, *zip(*jobs))):
+                record_span('ffmpeg.segment', start_time, end_time, lane=f"render segment {k}", **progress)
+                segment_paths.append(paths)
+
+        for r, (output_path, settings) in enumerate(renditions):
+            concat_list_path = os.path.join(tmp_dir, f"segments_{r}.txt")
+            with open(concat_list_path, 'w') as f:
+                for paths in segment_paths:
+                    f.write(f"file '{paths[r]}'\n")
+
+            joined_video = ffmpeg.input(concat_list_path, format='concat', safe=0)
+            audio_stream = ffmpeg.input(audio_file_path)
+            final_video = (
+                ffmpeg
+                .output(joined_video, audio_stream, output_path, vcodec='copy', t=audio_duration,
+                        **_audio_options(settings))
+                .overwrite_output()
+            )
+            _run_ffmpeg(final_video, 'ffmpeg.join_segments')
+    return renditions[0][0]
+
+def _concat_demuxer_input(video_clip_paths, work_dir):
+    """
+    Reads clips that share one format through the concat demuxer, which joins them
+    without decoding and re-encoding each clip separately.
+    """
+    import ffmpeg
+
+    concat_list_path = os.path.join(work_dir, "clips.txt")
+    with open(concat_list_path, 'w') as f:
+        for clip in video_clip_paths:
+            f.write(f"file '{os.path.abspath(clip)}'\n")
+    return ffmpeg.input(concat_list_path, format='concat', safe=0).video
+
+def extract_thumbnail(video_path, at_seconds=0.5, width=240):
+    """
+    Grabs one frame of a video, scaled to `width` pixels wide.
+
+    Returns:
+        bytes: The frame as a JPEG image, or None if it could not be read.
+    """
+    import ffmpeg
+
+    try:
+        jpeg, _ = (
             ffmpeg
-            .output(subtitled_video_stream[0], audio_stream, output_path, vcodec='libx264', acodec='aac', t=audio_duration)
-            .overwrite_output()
+            .input(video_path, ss=at_seconds)
+            .filter('scale', width, -2)
+            .output('pipe:', vframes=1, format='image2', vcodec='mjpeg')
+            .run(capture_stdout=True, capture_stderr=True)
         )
-        
-        ffmpeg.run(final_video)
+    except ffmpeg.Error:
+        return None
+    return jpeg or None
+
+def assemble_video(video_clip_paths, audio_file_path, script_file_path, output_path="final_video.mp4", script_text=None,
+                   parallel_segments=None, max_workers=None, normalize=False, caption_anchors=None, profiles=None,
+                   threads=None):
+    """
+    Concatenates video clips, adds an audio track, and overlays captions.
+    The captions come from `script_text` when it is given, otherwise from the file at `script_file_path`.
+    `caption_anchors` are the chunk timings of a chunked voiceover (see build_caption_blocks).
+
+    With `parallel_segments` set to N > 1, the timeline is split into N segments that are
+    encoded in parallel by up to `max_workers` processes (default: one per core) and joined
+    without re-encoding. The result matches the single-pass render up to encoder differences
+    at the segment boundaries.
+
+    With `normalize`, every clip is first converted to the mezzanine format (see mezzanine.py),
+    which is cached by clip contents, and the clips are joined with the concat demuxer. A render
+    that reuses clips then only pays for the caption overlay encode and the audio mux.
+
+    With `profiles` (names from OUTPUT_PROFILES, or dicts with a 'name' and the same settings),
+    one ffmpeg process writes a rendition for each: the first to `output_path`, the others to
+    rendition_path(output_path, name). The clips are decoded and the captions drawn once, and
+    the split filter feeds the result to every encoder.
+
+    `threads` caps the threads of each encoder in the single-pass render, for callers that run
+    several renders at once (default: x264 picks, which is more than one per core).
+
+    Returns:
+        str: `output_path`, or None if the assembly failed.
+    """
+    import ffmpeg
+
+    print("Starting video assembly with FFmpeg...")
+
+    try:
+        audio_duration = media_info.get_duration(audio_file_path)
+
+        if script_text is None:
+            with open(script_file_path) as f:
+                script_text = f.read()
+
+        output_dir = os.path.dirname(os.path.abspath(output_path))
+        renditions = _resolve_renditions(profiles, output_path)
+        with tempfile.TemporaryDirectory(prefix='assemble-', dir=output_dir) as work_dir:
+            if normalize:
+                from mezzanine import normalize_clips
+                video_clip_paths = normalize_clips(video_clip_paths, work_dir, max_workers)
+                if not video_clip_paths:
+                    return None
+
+            if parallel_segments and parallel_segments > 1:
+                caption_blocks = build_caption_blocks(script_text, audio_duration, audio_path=audio_file_path,
+                                                      anchors=caption_anchors)
+                _assemble_video_parallel(video_clip_paths, audio_file_path, caption_blocks, audio_duration,
+                                         renditions, parallel_segments, max_workers)
+                print(f"Video assembly successful! Final video saved to {output_path}")
+                return output_path
+
+            # Create the .srt file for captions in this render's own directory, since the preview
+            # and the full render of a video run at the same time in the same workspace
+            srt_file_path = create_srt_from_script(
+                script_text, audio_duration,
+                os.path.join(work_dir, "captions.srt"),
+                audio_path=audio_file_path,
+                anchors=caption_anchors
+            )
+            if not srt_file_path:
+                return None
+
+            if normalize:
+                # Steps 1 and 2: the normalized clips are joined as they are
+                concatenated_video_stream = _concat_demuxer_input(video_clip_paths, work_dir)
+            else:
+                # Step 1: Create input streams for all video clips
+                video_streams = [ffmpeg.input(clip) for clip in video_clip_paths]
+
+                # Step 2: Concatenate the video clips
+                concatenated_video_stream = ffmpeg.concat(*video_streams, v=1, a=0)
+
+            # Step 3: Apply the subtitles filter to the concatenated video stream, once for every rendition
+            subtitled_video_streams = _caption_and_split(concatenated_video_stream, srt_file_path, renditions)
+
+            # Step 4: Add the audio input and combine with the subtitled video
+            audio_stream = ffmpeg.input(audio_file_path)
+
+            thread_options = {'threads': threads} if threads else {}
+            # We need to set the duration of the final video to match the audio
+            final_video = ffmpeg.merge_outputs(*(
+                ffmpeg
+                .output(video_stream, audio_stream, path, t=audio_duration,
+                        **_video_options(settings), **_audio_options(settings), **thread_options)
+                .overwrite_output()
+                for video_stream, (path, settings) in zip(subtitled_video_streams, renditions)
+            ))
+
+            _run_ffmpeg(final_video, 'ffmpeg.assemble', clips=len(video_clip_paths), renditions=len(renditions))
         print(f"Video assembly successful! Final video saved to {output_path}")
         return output_path
     
     except ffmpeg.Error as e:
         print("FFmpeg Error during video assembly:")
-        print(e.stderr.decode('utf8'))
+        print((e.stderr or b'').decode('utf8'))
         return None
     except Exception as e:
         print(f"An unexpected error occurred during video assembly: {e}")
         return None
 
+def _proxy_profile(video_clip_paths, final_profile=None):
+    """
+    Returns the 'proxy' profile with its size changed to the shape of the final render: the
+    size of `final_profile` or, without one, of the first clip. The size is the largest even
+    multiple of that aspect ratio within the proxy's longer side, so the display aspect ratio
+    is the same exactly.
+    """
+    from fractions import Fraction
+
+    proxy = OUTPUT_PROFILES['proxy']
+    settings = OUTPUT_PROFILES[final_profile] if isinstance(final_profile, str) else (final_profile or {})
+    if settings.get('width'):
+        width, height = settings['width'], settings['height']
+    else:
+        video = media_info.probe(video_clip_paths[0])['video']
+        width, height = video['width'], video['height']
+
+    aspect = Fraction(width, height).limit_denominator(64)
+    scale = max(2, max(proxy['width'], proxy['height']) // max(aspect.numerator, aspect.denominator) // 2 * 2)
+    return {**proxy, 'name': 'proxy', 'width': aspect.numerator * scale, 'height': aspect.denominator * scale}
+
+def render_preview(video_clip_paths, audio_file_path, script_file_path, output_path="preview_video.mp4",
+                   final_profile=None, **kwargs):
+    """
+    Renders a low-resolution proxy of the video with the ultrafast preset, captions included,
+    to show while the full-quality render runs. It takes a few seconds instead of the full
+    encode's minute or so.
+
+    Args:
+        final_profile (str or dict): The profile of the full-quality render (the first of
+            assemble_video()'s `profiles`, None for the clips' own size). The preview gets the
+            same display aspect ratio.
+        **kwargs: Passed on to assemble_video(), e.g. script_text or caption_anchors.
+
+    Returns:
+        str: `output_path`, or None if the render failed.
+    """
+    try:
+        profile = _proxy_profile(video_clip_paths, final_profile)
+    except Exception as e:
+        print(f"Error reading the clips for the preview: {e}")
+        return None
+    return assemble_video(video_clip_paths, audio_file_path, script_file_path, output_path=output_path,
+                          profiles=[profile], **kwargs)
+
 if __name__ == '__main__':
     # You would use this script with your generated files
     test_videos = ["runway_clip_1.mp4", "runway_clip_2.mp4", "runway_clip_3.mp4", "runway_clip_4.mp4", "runway_clip_5.mp4"]
@@ -0,0 +1,135 @@
+# workflow.py
+import os
+
+from pipeline import Pipeline
+
+# Import all our custom modules
+from category_selector import get_category_id_from_prompt
+from youtube_scraper import get_trending_topic
+from openai_script import generate_video_script, stream_video_script
+from elevenlabs_api import generate_voiceover, generate_voiceover_chunked, load_chunk_timings
+from runway_api import generate_runway_clips
+from video_editor import assemble_video, render_preview
+from clip_quality import ClipQualityGate
+from clip_library import get_clip_library
+
+def _script_artifact(script_text, keywords):
+    if not script_text or not keywords:
+        return None
+    return {'text': script_text, 'keywords': keywords}
+
+def _generate_script(topic, output_dir):
+    return _script_artifact(*generate_video_script(topic, output_dir=output_dir))
+
+def build_video_pipeline(use_category=False, max_in_flight=3, parallel_segments=None, normalize=False,
+                         output_dir=".", assemble=True, on_clip_ready=None, chunked_tts=False, stream_script=False,
+                         check_clip_quality=True, output_profiles=None, preview=False, reuse_similar_clips=True):
+    """
+    Declares the Viral Video Maker workflow as a DAG:
+
+        [category] -> topic -> script -> voiceover --\\
+                                      \\-> clips -----+-> video
+
+    The voiceover and the clips only depend on the script, so they are generated concurrently.
+    With stream_script, the clips do not even wait for the script: a 'script_stream' stage
+    starts the OpenAI response and the clips stage submits each keyword phrase as it arrives.
+    Passing `topic=...` to run() skips the topic stage and uses that topic instead.
+
+    Args:
+        use_category (bool): Start from a `user_prompt` run input and pick the YouTube category
+            for it first. Otherwise trending topics are taken from all categories.
+        max_in_flight (int): The maximum number of Runway tasks running at once.
+        parallel_segments (int): Render the final video as this many segments in parallel processes.
+        normalize (bool): Convert clips to the cached mezzanine format before assembly.
+        output_dir (str or Workspace): The directory every artifact of the run is written to.
+        assemble (bool): Include the final 'video' stage. Batch runs leave it out and schedule
+            the CPU-bound assembly themselves.
+        on_clip_ready (callable): Passed to generate_runway_clips(), to follow clips as they arrive.
+        chunked_tts (bool): Synthesize the voiceover sentence by sentence in parallel, and time
+            the captions against the exact chunk boundaries.
+        stream_script (bool): Stream the script response and start generating clips from its
+            keywords before the rest of it has arrived.
+        check_clip_quality (bool): Check every new clip locally for black or frozen frames and
+            generate it again if needed, and drop near-duplicate clips (see clip_quality.py).
+        output_profiles (list): Write these renditions of the final video in one render (see
+            video_editor.OUTPUT_PROFILES). The first one is the 'video' artifact.
+        preview (bool): Render a low-resolution proxy first, as the 'preview' stage, so there is
+            something to watch while the full-quality video encodes. A failed preview does not
+            fail the run; its artifact is then {'path': None}.
+        reuse_similar_clips (bool): Reuse a clip generated earlier from a similar prompt instead of
+            generating a new one (see clip_library.py).
+
+    Returns:
+        Pipeline: The pipeline, ready to run. Pass `user_prompt=...` to run() when use_category is set.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    pipeline = Pipeline()
+    quality_gate = ClipQualityGate() if check_clip_quality else None
+    clip_library = get_clip_library() if reuse_similar_clips else None
+
+    if use_category:
+        pipeline.add_stage(
+            'category', lambda user_prompt: get_category_id_from_prompt(user_prompt),
+            depends_on=['user_prompt'], description="Identifying the best YouTube category"
+        )
+        pipeline.add_stage(
+            'topic', lambda category: get_trending_topic(category_id=category),
+            depends_on=['category'], description="Scraping trending videos"
+        )
+    else:
+        pipeline.add_stage('topic', get_trending_topic, description="Finding a trending topic")
+
+    if stream_script:
+        pipeline.add_stage(
+            'script_stream', lambda topic: stream_video_script(topic, output_dir=output_dir),
+            depends_on=['topic'], description="Starting the video script"
+        )
+        pipeline.add_stage(
+            'script', lambda script_stream: _script_artifact(*script_stream.result()),
+            depends_on=['script_stream'], description="Generating video script and keywords"
+        )
+        pipeline.add_stage(
+            'clips', lambda script_stream: generate_runway_clips(
+                script_stream.keywords(), max_in_flight=max_in_flight, output_dir=output_dir,
+                on_clip_ready=on_clip_ready, quality_gate=quality_gate, clip_library=clip_library
+            ),
+            depends_on=['script_stream'], description="Generating video clips from keywords"
+        )
+    else:
+        pipeline.add_stage(
+            'script', lambda topic: _generate_script(topic, output_dir),
+            depends_on=['topic'], description="Generating video script and keywords"
+        )
+        pipeline.add_stage(
+            'clips', lambda script: generate_runway_clips(
+                script['keywords'], max_in_flight=max_in_flight, output_dir=output_dir, on_clip_ready=on_clip_ready,
+                quality_gate=quality_gate, clip_library=clip_library
+            ),
+            depends_on=['script'], description="Generating video clips from keywords"
+        )
+    synthesize = generate_voiceover_chunked if chunked_tts else generate_voiceover
+    pipeline.add_stage(
+        'voiceover', lambda script: synthesize(script['text'], output_dir=output_dir),
+        depends_on=['script'], description="Generating voiceover"
+    )
+    if assemble and preview:
+        pipeline.add_stage(
+            'preview', lambda script, voiceover, clips: {'path': render_preview(
+                clips, voiceover, None, output_path=os.path.join(output_dir, "preview_video.mp4"),
+                final_profile=output_profiles[0] if output_profiles else None, script_text=script['text'],
+                caption_anchors=load_chunk_timings(voiceover) if chunked_tts else None
+            )},
+            depends_on=['script', 'voiceover', 'clips'], description="Rendering a quick preview"
+        )
+    if assemble:
+        # With a preview, the full render waits for it, so the preview has the CPU to itself
+        pipeline.add_stage(
+            'video', lambda script, voiceover, clips, **_: assemble_video(
+                clips, voiceover, None, output_path=os.path.join(output_dir, "final_video.mp4"),
+                script_text=script['text'], parallel_segments=parallel_segments, normalize=normalize,
+                caption_anchors=load_chunk_timings(voiceover) if chunked_tts else None, profiles=output_profiles
+            ),
+            depends_on=['script', 'voiceover', 'clips'] + (['preview'] if preview else []),
+            description="Assembling final video"
+        )
+    return pipeline
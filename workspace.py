@@ -0,0 +1,97 @@
+# workspace.py
+import os
+import time
+import uuid
+import shutil
+import tempfile
+
+# Where finished runs are kept, and the RAM-backed filesystem used for scratch files when asked for
+RUNS_DIR = os.getenv('RUNS_DIR', 'runs')
+TMPFS_DIR = '/dev/shm'
+
+class Workspace:
+    """
+    An isolated directory for the files of one pipeline run, so that concurrent runs
+    never write to the same voiceover.mp3, script.txt, runway_clip_N.mp4, ... files.
+
+    Lifecycle:
+      1. Creating a workspace creates `output_dir` (RUNS_DIR/<run_id>) and the scratch
+         directory every intermediate file is written to. The scratch directory is the
+         output directory itself, or a private directory on tmpfs with use_tmpfs=True.
+      2. Modules write into the scratch directory. A Workspace can be passed anywhere a
+         module takes an `output_dir`, since it behaves like a path (os.fspath).
+      3. promote() moves a finished output (e.g. final_video.mp4) into `output_dir`.
+      4. cleanup() deletes every file that was not promoted. Using the workspace as a
+         context manager calls it on exit.
+    """
+
+    def __init__(self, run_id=None, root=None, use_tmpfs=False, keep_intermediates=False):
+        """
+        Args:
+            run_id (str): Name of the run directory. Defaults to a timestamp plus a random suffix.
+            root (str): The directory runs are kept in. Defaults to RUNS_DIR.
+            use_tmpfs (bool): Put the intermediate files on tmpfs when it is available.
+            keep_intermediates (bool): Make cleanup() a no-op, to inspect a run afterwards.
+        """
+        self.run_id = run_id or f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.output_dir = os.path.join(root or RUNS_DIR, self.run_id)
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        if use_tmpfs and os.path.isdir(TMPFS_DIR):
+            self.scratch_dir = tempfile.mkdtemp(prefix=f"vvm-{self.run_id}-", dir=TMPFS_DIR)
+        else:
+            self.scratch_dir = self.output_dir
+
+        self.keep_intermediates = keep_intermediates
+        self._promoted = set()
+
+    def __fspath__(self):
+        return self.scratch_dir
+
+    def __repr__(self):
+        return f"Workspace({self.scratch_dir!r})"
+
+    def file(self, name):
+        """
+        Returns the path of a file in the scratch directory.
+        """
+        return os.path.join(self.scratch_dir, name)
+
+    def promote(self, path):
+        """
+        Moves a finished output into `output_dir` so that cleanup() keeps it.
+
+        Returns:
+            str: The new path of the file.
+        """
+        dest_path = os.path.join(self.output_dir, os.path.basename(path))
+        if os.path.abspath(path) != os.path.abspath(dest_path):
+            shutil.move(path, dest_path)
+        self._promoted.add(os.path.abspath(dest_path))
+        return dest_path
+
+    def cleanup(self):
+        """
+        Deletes the intermediate files, keeping only the promoted outputs.
+        """
+        if self.keep_intermediates:
+            return
+        if self.scratch_dir != self.output_dir:
+            shutil.rmtree(self.scratch_dir, ignore_errors=True)
+            return
+        for entry in os.scandir(self.output_dir):
+            if os.path.abspath(entry.path) in self._promoted:
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cleanup()
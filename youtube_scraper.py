@@ -1,15 +1,17 @@
 # youtube_scraper.py
 import os
 import random
-from googleapiclient.discovery import build
-from dotenv import load_dotenv
+
+import resilience
+from clients import get_youtube_client
+from tracing import span
 
 def get_trending_videos(api_key, country_code='US', category_id=None):
     """
     Fetches trending videos from YouTube Data API v3.
     """
     try:
-        youtube = build('youtube', 'v3', developerKey=api_key)
+        youtube = get_youtube_client(api_key)
 
         request = youtube.videos().list(
             part='snippet,statistics',
@@ -18,7 +20,9 @@ def get_trending_videos(api_key, country_code='US', category_id=None):
             videoCategoryId=category_id,
             maxResults=50
         )
-        response = request.execute()
+        with span('youtube.videos_list', category_id=category_id) as current:
+            response = resilience.call('youtube', request.execute, trace=current)
+            current.set(items=len(response.get('items', [])))
 
         trending_videos = []
         for item in response.get('items', []):
@@ -37,7 +41,6 @@ def get_trending_topic(category_id=None):
     Fetches trending videos and returns a random video title.
     Now accepts an optional category_id to filter results.
     """
-    load_dotenv()
     api_key = os.getenv('YOUTUBE_API_KEY')
     
     if not api_key: